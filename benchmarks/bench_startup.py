@@ -0,0 +1,85 @@
+"""
+Time-to-first-card for the app, from process launch to the first card on screen.
+
+    python benchmarks/bench_startup.py                              # python mainapp/flashcards.py
+    python benchmarks/bench_startup.py --exe dist/flashcards.exe    # frozen build
+    python benchmarks/bench_startup.py --exe dist/flashcards/flashcards.exe --label onedir
+
+Each run sets FLASHCARDS_STARTUP_PROBE; the app writes the time the first
+card was drawn (and which optional modules were loaded by then) and quits.
+Needs a display, like the app itself.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def measure(command, runs, timeout=60):
+    """Launch command `runs` times; returns (seconds per run, modules loaded)"""
+    samples, loaded = [], []
+    for _ in range(runs):
+        fd, probe = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        os.remove(probe)
+        env = dict(os.environ, FLASHCARDS_STARTUP_PROBE=probe)
+        start = time.time()
+        proc = subprocess.run(command, cwd=ROOT, env=env, timeout=timeout,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if not os.path.exists(probe):
+            raise RuntimeError(f"{' '.join(command)} exited ({proc.returncode}) without showing a card:\n"
+                               f"{proc.stderr.strip()}")
+        with open(probe, encoding='utf-8') as f:
+            result = json.load(f)
+        os.remove(probe)
+        samples.append(result["shown_at"] - start)
+        loaded = result["loaded"]
+    return samples, loaded
+
+
+def summary(samples):
+    return {
+        "runs": len(samples),
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time-to-first-card")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--exe", action="append", default=[], help="frozen build to time (repeatable)")
+    parser.add_argument("--label", action="append", default=[], help="name for each --exe, in order")
+    parser.add_argument("--skip-python", action="store_true", help="only time the --exe builds")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    targets = []
+    if not args.skip_python:
+        targets.append(("python", [sys.executable, os.path.join("mainapp", "flashcards.py")]))
+    for i, exe in enumerate(args.exe):
+        label = args.label[i] if i < len(args.label) else os.path.basename(os.path.dirname(os.path.abspath(exe))) or exe
+        targets.append((label, [os.path.abspath(exe)]))
+
+    report = {}
+    for label, command in targets:
+        samples, loaded = measure(command, args.runs)
+        report[label] = dict(summary(samples), loaded_at_first_card=loaded)
+        r = report[label]
+        print(f"{label:<10} median {r['median_ms']:7.0f} ms  (min {r['min_ms']:.0f}, max {r['max_ms']:.0f}, "
+              f"{r['runs']} runs)  loaded: {', '.join(loaded) or 'none'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
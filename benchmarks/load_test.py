@@ -0,0 +1,159 @@
+"""
+Load test for mainapp/server.py: many concurrent students, each asking for
+a card and answering it in a loop over one keep-alive connection.
+
+    python benchmarks/load_test.py --spawn --sessions 300 --duration 20
+    python benchmarks/load_test.py --url 127.0.0.1:8080 --sessions 100
+
+--spawn starts a server on a free port with a fresh database (and the
+synthetic deck size given by --deck-size, or mainapp/flashcards.json) and
+stops it afterwards. Reports requests per second and latency percentiles
+for the next-card and answer calls; each student's first request, which
+loads their profile from the database, is reported separately.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+from run_benchmarks import percentiles
+from synthetic import make_deck
+
+
+class Client:
+    """Minimal HTTP/1.1 keep-alive client for the JSON API"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(data).encode('utf-8') if data is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode('latin-1').split("\r\n")
+        status = int(lines[0].split()[1])
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length)
+        return status, json.loads(payload) if payload else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def student(host, port, name, deadline, samples, errors, category):
+    client = Client(host, port)
+    rng = random.Random(name)
+    path = f"/api/students/{name}"
+    first = True
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, question = await client.request("GET", f"{path}/next?category={category}")
+            # The first request also loads the student's profile; keep it apart
+            samples["first" if first else "next"].append(time.perf_counter() - start)
+            first = False
+            if status != 200:
+                errors.append(status)
+                continue
+            options = question["options"] or [""]
+            start = time.perf_counter()
+            status, _ = await client.request("POST", f"{path}/answer",
+                                             {"card": question["card"], "choice": rng.choice(options)})
+            samples["answer"].append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        client.close()
+
+
+async def run(host, port, sessions, duration, category):
+    samples = {"first": [], "next": [], "answer": []}
+    errors = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(student(host, port, f"load{i}", deadline, samples, errors, category)
+                           for i in range(sessions)))
+    return samples, errors, time.perf_counter() - start
+
+
+def spawn_server(deck_size, workdir):
+    deck = os.path.join(ROOT, "mainapp", "flashcards.json")
+    if deck_size:
+        deck = os.path.join(workdir, "deck.json")
+        with open(deck, 'w', encoding='utf-8') as f:
+            json.dump(make_deck(deck_size), f)
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "mainapp", "server.py"), "--port", "0",
+                             "--deck", deck, "--db", os.path.join(workdir, "load.db")],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith("Serving on"):
+        proc.kill()
+        raise RuntimeError("server did not start")
+    host, port = line.strip().rsplit("/", 1)[-1].rsplit(":", 1)
+    return proc, host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the study server")
+    parser.add_argument("--url", default="127.0.0.1:8080", help="host:port of a running server")
+    parser.add_argument("--spawn", action="store_true", help="start a throwaway server instead")
+    parser.add_argument("--deck-size", type=int, default=0, help="synthetic deck for --spawn (default: the real deck)")
+    parser.add_argument("--sessions", type=int, default=200, help="concurrent students")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--category", default="All")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    proc = None
+    workdir = tempfile.mkdtemp(prefix="flashcards-load-")
+    if args.spawn:
+        proc, host, port = spawn_server(args.deck_size, workdir)
+    else:
+        host, port = args.url.rsplit(":", 1)
+        port = int(port)
+    try:
+        samples, errors, wall = asyncio.run(run(host, port, args.sessions, args.duration, args.category))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    total = sum(len(s) for s in samples.values())
+    report = {"sessions": args.sessions, "seconds": wall, "requests": total,
+              "requests_per_second": total / wall, "errors": len(errors)}
+    print(f"{args.sessions} sessions, {total} requests in {wall:.1f} s: {total / wall:.0f} req/s, "
+          f"{len(errors)} errors")
+    for name, s in samples.items():
+        if s:
+            report[name] = percentiles(s)
+            r = report[name]
+            print(f"  {name:<7} p50 {r['p50_ms']:7.2f} ms   p90 {r['p90_ms']:7.2f} ms   p99 {r['p99_ms']:7.2f} ms   "
+                  f"(n={r['n']})")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Headless performance benchmarks over synthetic decks.
+
+    python benchmarks/run_benchmarks.py                      # 1k, 10k, 100k
+    python benchmarks/run_benchmarks.py --sizes 1000 1000000 -o results.json
+    python benchmarks/run_benchmarks.py --sizes 1000000 --check   # fail past BUDGETS_MS
+
+Times the engine paths behind FlashcardApp.load_next, quiz.run_quiz and
+check_answer plus JSON load/save, with no Tk window and no TTS. Results
+(percentiles in milliseconds per operation and deck size) are written as
+JSON so runs from different versions can be compared.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "mainapp"))
+
+from cards import compact
+from deckfile import load_deck, write_deck
+from deck_index import SearchIndex
+from deckio import export_cards, import_rows, read_rows
+from engine import StudySession
+from journal import ReviewJournal, card_id
+from scheduler import ScheduleColumns, get_scheduler, numpy, reschedule
+from storage import default_stats, load_json, save_json
+from synthetic import make_deck
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Most p50 milliseconds an operation may take on decks of up to a million cards (--check)
+BUDGETS_MS = {"reschedule_deck": 1000, "set_scheduler": 1000}
+
+
+def percentiles(samples):
+    """Summary of timings (seconds in, milliseconds out)"""
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pct(p):
+        return ordered[min(n - 1, int(p / 100 * n))] * 1000
+
+    return {
+        "n": n,
+        "mean_ms": sum(ordered) / n * 1000,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_size(size, repeat, workdir, seed=0):
+    """All operations for one deck size; returns {operation: percentiles}"""
+    rng = random.Random(seed)
+    cards_path = os.path.join(workdir, f"deck{size}.json")
+    stats_path = os.path.join(workdir, f"stats{size}.json")
+    journal_path = os.path.join(workdir, f"reviews{size}.jsonl")
+    save_json(cards_path, make_deck(size, seed))
+    save_json(stats_path, default_stats())
+
+    # Whole-file operations are slow on big decks; a few runs are enough
+    slow_repeat = max(3, min(repeat, 200000 // max(size, 1)))
+    results = {}
+
+    results["load_json"] = percentiles(timed(lambda: load_json(cards_path, []), slow_repeat))
+    results["load_deck"] = percentiles(timed(lambda: compact(load_json(cards_path, [])), slow_repeat))
+    deck_path = os.path.join(workdir, f"deck{size}.fcdeck")
+    write_deck(deck_path, load_json(cards_path, []))
+    results["load_fcdeck"] = percentiles(timed(lambda: load_deck(deck_path), slow_repeat))
+
+    cards = compact(load_json(cards_path, []))
+    journal = ReviewJournal(journal_path, cards_path, stats_path, load_json, save_json, limit=float('inf'))
+    holder = {}
+
+    def build():
+        holder["session"] = StudySession(cards, default_stats(), record_review=journal.record)
+
+    results["session_build"] = percentiles(timed(build, slow_repeat))
+    session = holder["session"]
+    categories = ["All"] + session.categories
+
+    results["next_card"] = percentiles(timed(lambda: session.next_card(rng.choice(categories)), repeat))
+
+    picked = [session.next_card() for _ in range(repeat)]
+    it = iter(picked)
+    results["build_question"] = percentiles(timed(lambda: session.build_question(next(it)), repeat))
+    it = iter(picked)
+    results["build_question_hard"] = percentiles(
+        timed(lambda: session.build_question(next(it), prefer_category=True), repeat))
+
+    def answer():
+        card = session.next_card()
+        session.submit_answer(card, card['meaning'] if rng.random() < 0.7 else "wrong")
+
+    results["submit_answer"] = percentiles(timed(answer, repeat))
+    journal.close()
+
+    results["save_json_cards"] = percentiles(timed(lambda: save_json(cards_path, cards), slow_repeat))
+    results["save_json_stats"] = percentiles(timed(lambda: save_json(stats_path, session.stats), slow_repeat))
+
+    # Type-ahead search: the one-off index build, then 1-4 letter prefixes and single hanzi
+    results["search_build"] = percentiles(timed(lambda: SearchIndex(cards), slow_repeat))
+    session.search_index()
+    queries = []
+    for card in picked:
+        queries += [card['pinyin'][:rng.randint(1, 4)], card['meaning'][:rng.randint(1, 4)], card['word'][:1]]
+    it = iter(queries)
+    results["search"] = percentiles(timed(lambda: session.search(next(it)), len(queries)))
+
+    # Re-importing the deck's own word list, as when a curriculum update ships
+    csv_path = os.path.join(workdir, f"deck{size}.csv")
+    export_cards(cards, csv_path)
+
+    def reimport():
+        with open(csv_path, encoding='utf-8', newline='') as f:
+            import_rows(cards, read_rows(f, "csv"))
+
+    results["import_csv"] = percentiles(timed(reimport, slow_repeat))
+
+    # Whole-deck rescheduling as after a change of algorithm, every card reviewed
+    counters = {card_id(card): {"attempts": 3, "lapses": rng.randint(0, 2), "streak": rng.randint(0, 6),
+                                "last_seen": "2025-06-01T10:00:00"} for card in cards}
+    fsrs = get_scheduler("fsrs")
+    np = numpy()
+    if np is not None:
+        # The array pass a session makes, its per-card columns already built
+        columns = ScheduleColumns(np, cards, counters, card_id)
+        results["reschedule_deck"] = percentiles(timed(lambda: columns.reschedule(cards, fsrs), slow_repeat))
+    else:
+        results["reschedule_deck"] = percentiles(
+            timed(lambda: reschedule(cards, counters, fsrs, card_id), slow_repeat))
+
+    # All of StudySession.set_scheduler, due index included; the first call builds its columns
+    session.stats["cards"].update(counters)
+    session.set_scheduler(get_scheduler("sm2"))
+    schedulers = itertools.cycle([fsrs, get_scheduler("classic"), get_scheduler("sm2")])
+    results["set_scheduler"] = percentiles(timed(lambda: session.set_scheduler(next(schedulers)), slow_repeat))
+    return results
+
+
+def over_budget(size, results):
+    """Operations slower than BUDGETS_MS, as messages"""
+    if size > 1000000:
+        return []
+    return [f"{op} at {size} cards: p50 {results[op]['p50_ms']:.0f} ms, budget {limit} ms"
+            for op, limit in BUDGETS_MS.items() if op in results and results[op]['p50_ms'] > limit]
+
+
+def deck_memory(size, seed=0):
+    """Megabytes held by a deck as parsed JSON dicts and as compact Cards"""
+    text = json.dumps(make_deck(size, seed))
+    tracemalloc.start()
+    try:
+        entries = json.loads(text)
+        as_dicts = tracemalloc.get_traced_memory()[0]
+        cards = compact(entries)
+        del entries
+        as_cards = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del cards
+    return {"dicts_mb": as_dicts / 1e6, "cards_mb": as_cards / 1e6}
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=HERE,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flashcard performance benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=1000, help="samples for per-card operations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--check", action="store_true", help="exit with an error if an operation is over budget")
+    args = parser.parse_args(argv)
+
+    report = {
+        "version": git_version(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="flashcards-bench-")
+    failures = []
+    try:
+        for size in args.sizes:
+            print(f"Deck of {size} cards")
+            results = bench_size(size, args.repeat, workdir, args.seed)
+            for op, r in results.items():
+                print(f"  {op:<20} p50 {r['p50_ms']:9.3f} ms   p99 {r['p99_ms']:9.3f} ms   (n={r['n']})")
+            memory = deck_memory(size, args.seed)
+            print(f"  {'deck memory':<20} dicts {memory['dicts_mb']:8.1f} MB   cards {memory['cards_mb']:8.1f} MB")
+            report["sizes"][str(size)] = results
+            failures += over_budget(size, results)
+            report.setdefault("memory", {})[str(size)] = memory
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.check and failures:
+        sys.exit("Over budget:\n  " + "\n  ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
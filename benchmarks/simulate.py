@@ -0,0 +1,196 @@
+"""
+Monte-Carlo learners for judging schedulers before they reach students.
+
+    python benchmarks/simulate.py                                    # classic, 8 learners, 90 days
+    python benchmarks/simulate.py --scheduler classic --scheduler sm2 --scheduler fsrs --learners 32
+    python benchmarks/simulate.py --scheduler fsrs --params '{"retention": 0.85}' -o sim.json
+    python benchmarks/simulate.py --scheduler sm2 --scheduler fsrs --params 'fsrs:{"retention": 0.85}'
+
+Parameters are given per scheduler as NAME:JSON (repeatable); schedulers
+without any use their defaults. A bare JSON object is only accepted when a
+single scheduler is simulated.
+
+Each learner studies a synthetic deck through a StudySession for a number
+of simulated days: new cards are introduced every day, then due cards are
+reviewed (up to a daily limit). Whether an answer is right is drawn from a
+hidden memory model: recall probability falls along a forgetting curve,
+R = 0.9 ** (days since last review / stability), and stability grows after
+each success (more so when recall was hard) and collapses after a lapse.
+Learners differ in how fast they learn. They run in parallel across a
+process pool.
+
+Reported per scheduler: reviews per simulated day (the workload), observed
+retention (share of reviews answered right, first showings included), end
+retention (average recall probability over every introduced card on the
+last day) and wall-clock throughput of the engine in reviews per second.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "mainapp"))
+
+from deck_index import ALL
+from engine import StudySession
+from scheduler import get_scheduler
+from synthetic import make_deck
+
+START = datetime(2025, 1, 6, 18, 0)    # every simulated study session starts at 18:00
+
+
+def recall_probability(memory, now_ts):
+    stability, last = memory
+    return 0.9 ** ((now_ts - last) / 86400 / stability)
+
+
+def simulate_learner(job):
+    """One learner over the whole run, in a worker process; returns a result dict"""
+    scheduler_name, params, seed, days, deck_size, new_per_day, max_reviews = job
+    rng = random.Random(seed)
+    skill = rng.uniform(1.5, 3.5)          # stability multiplier after an easy success
+    first_stability = rng.uniform(0.5, 2.0)
+
+    deck = make_deck(deck_size, seed, START)
+    session = StudySession([], scheduler=get_scheduler(scheduler_name, params))
+    memory = {}                            # id(card) -> [stability in days, last review timestamp]
+    daily, correct = [], 0
+    start = time.perf_counter()
+
+    for day in range(days):
+        now = START + timedelta(days=day)
+        now_ts = now.timestamp()
+        for entry in deck[day * new_per_day:(day + 1) * new_per_day]:
+            entry.update(ease=2, next_review=now.isoformat())
+            session.add_card(entry)
+
+        reviews = 0
+        while reviews < max_reviews:
+            card = session.index.due.pick(ALL, now_ts)
+            if card is None:
+                break
+            state = memory.get(id(card))
+            # A card never seen before can only be guessed (one of four choices)
+            p = recall_probability(state, now_ts) if state else 0.25
+            right = rng.random() < p
+            session.submit_answer(card, card['meaning'] if right else "", now=now)
+            if state is None:
+                memory[id(card)] = [first_stability, now_ts]
+            elif right:
+                state[0] *= 1 + (skill - 1) * (1 - p) * 2
+                state[1] = now_ts
+            else:
+                state[0] = max(0.25, state[0] * 0.2)
+                state[1] = now_ts
+            correct += right
+            reviews += 1
+        daily.append(reviews)
+
+    elapsed = time.perf_counter() - start
+    end_ts = (START + timedelta(days=days)).timestamp()
+    end_recall = [recall_probability(m, end_ts) for m in memory.values()]
+    return {
+        "reviews": sum(daily),
+        "correct": correct,
+        "daily": daily,
+        "introduced": len(session.cards),
+        "end_retention": statistics.fmean(end_recall) if end_recall else 0.0,
+        "seconds": elapsed,
+    }
+
+
+def summarise(results, wall):
+    reviews = sum(r["reviews"] for r in results)
+    per_day = [n for r in results for n in r["daily"]]
+    ordered = sorted(per_day)
+    return {
+        "learners": len(results),
+        "reviews": reviews,
+        "reviews_per_day_mean": statistics.fmean(per_day),
+        "reviews_per_day_p90": ordered[int(0.9 * (len(ordered) - 1))],
+        "reviews_per_day_max": ordered[-1],
+        "observed_retention": sum(r["correct"] for r in results) / reviews if reviews else 0.0,
+        "end_retention": statistics.fmean(r["end_retention"] for r in results),
+        "wall_seconds": wall,
+        "reviews_per_second": reviews / wall if wall else 0.0,
+        "engine_reviews_per_second": reviews / sum(r["seconds"] for r in results) if reviews else 0.0,
+    }
+
+
+def run(scheduler, params, args):
+    jobs = [(scheduler, params, args.seed + i, args.days, args.deck_size, args.new_per_day, args.max_reviews)
+            for i in range(args.learners)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(simulate_learner, jobs))
+    return summarise(results, time.perf_counter() - start)
+
+
+def parse_params(values, names, parser):
+    """{scheduler name: params} from repeated --params NAME:JSON (or one bare JSON for a single scheduler)"""
+    params = {}
+    for value in values:
+        name, sep, text = value.partition(":")
+        if not sep or name.lstrip().startswith("{"):
+            if len(names) != 1:
+                parser.error(f"--params {value!r} needs a scheduler name (NAME:JSON) when simulating "
+                             f"{', '.join(names)}")
+            name, text = names[0], value
+        name = name.strip()
+        if name not in names:
+            parser.error(f"--params given for '{name}', which is not being simulated ({', '.join(names)})")
+        try:
+            params[name] = json.loads(text)
+        except json.JSONDecodeError as e:
+            parser.error(f"--params for '{name}' is not valid JSON: {e}")
+        if not isinstance(params[name], dict):
+            parser.error(f"--params for '{name}' must be a JSON object")
+    for name in names:
+        try:
+            get_scheduler(name, params.get(name, {}))    # fail here, not in every worker
+        except ValueError as e:
+            parser.error(str(e))
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate learners to compare schedulers")
+    parser.add_argument("--scheduler", action="append", help="scheduler to simulate (repeatable; default classic)")
+    parser.add_argument("--params", action="append", default=[],
+                        help="scheduler parameters as NAME:JSON (repeatable; bare JSON for a single scheduler)")
+    parser.add_argument("--learners", type=int, default=8)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--deck-size", type=int, default=1000)
+    parser.add_argument("--new-per-day", type=int, default=10)
+    parser.add_argument("--max-reviews", type=int, default=200, help="reviews per learner per day")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+    names = args.scheduler or ["classic"]
+    params = parse_params(args.params, names, parser)
+
+    report = {"days": args.days, "deck_size": args.deck_size, "new_per_day": args.new_per_day,
+              "max_reviews": args.max_reviews, "schedulers": {}}
+    for name in names:
+        r = run(name, params.get(name, {}), args)
+        r["params"] = params.get(name, {})
+        report["schedulers"][name] = r
+        print(f"{name:<8} {r['reviews_per_day_mean']:6.1f} reviews/day (p90 {r['reviews_per_day_p90']}, "
+              f"max {r['reviews_per_day_max']})  retention {r['observed_retention']:.1%} observed, "
+              f"{r['end_retention']:.1%} at end  |  {r['reviews']} reviews in {r['wall_seconds']:.1f} s "
+              f"({r['reviews_per_second']:.0f}/s)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Synthetic decks in the flashcards.json schema for benchmarks.
+
+    python benchmarks/synthetic.py 100000 -o /tmp/deck100k.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+INITIALS = ["b", "p", "m", "f", "d", "t", "n", "l", "g", "k", "h", "j", "q", "x",
+            "zh", "ch", "sh", "r", "z", "c", "s", "y", "w", ""]
+FINALS = ["a", "o", "e", "i", "u", "ai", "ei", "ao", "ou", "an", "en", "ang", "eng", "ong",
+          "ia", "ie", "iao", "iu", "ian", "in", "iang", "ing", "ua", "uo", "uai", "ui", "uan", "un"]
+TONES = {"a": "āáǎà", "e": "ēéěè", "i": "īíǐì", "o": "ōóǒò", "u": "ūúǔù"}
+WORDS = ("apple book car dog eat family green house ink jump kite lamp moon noodle ocean park "
+         "quiet river school tea umbrella village water young zoo friend teacher travel city "
+         "morning evening swim read write study music movie train ticket doctor market").split()
+CATEGORIES = ["Family", "School", "Travel", "Daily Life", "Hobbies", "Places", "Food", "Weather",
+              "Health", "Work", "Sport", "Nature", "Shopping", "Time", "Colours", "Animals"]
+
+
+def _syllable(rng):
+    final = rng.choice(FINALS)
+    tone = rng.randrange(5)
+    if tone < 4:
+        for vowel in "aeoiu":
+            if vowel in final:
+                final = final.replace(vowel, TONES[vowel][tone], 1)
+                break
+    return rng.choice(INITIALS) + final
+
+
+def make_card(i, rng, now):
+    length = rng.choice((1, 2, 2, 2, 3, 4))
+    word = "".join(chr(rng.randrange(0x4E00, 0x9FA5)) for _ in range(length))
+    return {
+        "word": word,
+        "pinyin": "".join(_syllable(rng) for _ in range(length)),
+        # The index suffix keeps meanings mostly unique, like a real word list
+        "meaning": " ".join(rng.sample(WORDS, rng.choice((1, 1, 2, 3)))) + f" {i}",
+        "category": rng.choice(CATEGORIES),
+        "ease": rng.randint(1, 5),
+        "next_review": (now + timedelta(days=rng.uniform(-30, 30))).replace(microsecond=0).isoformat(),
+    }
+
+
+def make_deck(size, seed=0, now=None):
+    """A reproducible deck of `size` cards, roughly half of them due"""
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    return [make_card(i, rng, now) for i in range(size)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic flashcard deck")
+    parser.add_argument("size", type=int)
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(make_deck(args.size, args.seed), f, indent=2)
+    print(f"Wrote {args.size} cards to {args.output}")
@@ -0,0 +1,59 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Fast-start build: a folder (dist/flashcards/) instead of a single EXE.
+# Nothing is unpacked to a temp directory on launch, modules ship as loose
+# precompiled bytecode, and binaries are left uncompressed (no UPX) so they
+# load straight from disk. Progress is kept in the per-user data directory
+# (see flashcards.user_data_dir), not next to the bundled deck.
+#
+#   pyinstaller flashcards_onedir.spec
+#   python benchmarks/bench_startup.py --exe dist/flashcards.exe --label onefile \
+#       --exe dist/flashcards/flashcards.exe --label onedir
+import os
+
+datas = [('mainapp/flashcards.json', 'mainapp'), ('mainapp/stats.json', 'mainapp')]
+for optional in ('mainapp/audio.fcpack', 'mainapp/flashcards.fcdeck'):
+    if os.path.exists(optional):
+        datas.append((optional, 'mainapp'))
+
+a = Analysis(
+    ['mainapp\\flashcards.py'],
+    pathex=['mainapp'],
+    binaries=[],
+    datas=datas,
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=True,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='flashcards',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='flashcards',
+)
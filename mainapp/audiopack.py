@@ -0,0 +1,73 @@
+import json
+import mmap
+import os
+import struct
+
+# Layout: MAGIC, clip bytes back to back, JSON index, u64 offset of the index.
+# The index maps cache key -> [offset, length, format].
+MAGIC = b"FCAUDIO1"
+FOOTER = struct.Struct("<Q")
+
+
+class PackWriter:
+    """Streams clips into a pack file; the index is written on close()"""
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp = path + ".part"
+        self._file = open(self._tmp, 'wb')
+        self._file.write(MAGIC)
+        self.index = {}
+
+    def add(self, key, data, fmt="mp3"):
+        if key in self.index:
+            return
+        self.index[key] = [self._file.tell(), len(data), fmt]
+        self._file.write(data)
+
+    def close(self):
+        index_offset = self._file.tell()
+        self._file.write(json.dumps(self.index, separators=(',', ':')).encode('utf-8'))
+        self._file.write(FOOTER.pack(index_offset))
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp)
+
+
+class AudioPack:
+    """Read-only, memory-mapped view of a pack built by prerender.py"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an audio pack")
+        (index_offset,) = FOOTER.unpack_from(self._map, len(self._map) - FOOTER.size)
+        self.index = json.loads(self._map[index_offset:len(self._map) - FOOTER.size].decode('utf-8'))
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, key):
+        """(bytes, format) for a clip, or None if the pack does not have it"""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length, fmt = entry
+        return self._map[offset:offset + length], fmt
+
+    def close(self):
+        self._map.close()
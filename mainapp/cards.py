@@ -0,0 +1,178 @@
+"""
+Compact in-memory card records.
+
+A Card holds the same data as a flashcards.json entry but in a slotted
+object: the category string is interned (one copy per category, not per
+card) and next_review is kept as integer epoch seconds, so due checks are
+plain integer compares. Cards still read like the dicts the rest of the
+code expects (card['word'], card.get('ease', 2), card['next_review'] = ...)
+and convert back to the exact JSON entry they were loaded from.
+"""
+import math
+import sys
+from datetime import datetime
+
+# Due time used for unparseable next_review values: always due
+ALWAYS_DUE = -(2 ** 62)
+EPOCH = "1970-01-01T00:00:00"
+_ABSENT = object()
+_TEXT_FIELDS = ("word", "pinyin", "meaning", "category")
+FIELDS = _TEXT_FIELDS + ("ease", "next_review")
+_FIELD_SET = frozenset(FIELDS)
+
+
+def parse_review(text):
+    """
+    (epoch seconds, raw) for a next_review string. raw is None when the
+    seconds turn back into exactly the same string, which is the usual case;
+    otherwise the original text is kept so nothing is lost on save.
+    """
+    try:
+        ts = datetime.fromisoformat(text).timestamp()
+    except (ValueError, TypeError, OverflowError, OSError):
+        return ALWAYS_DUE, text
+    due = math.floor(ts)
+    if due == ts:
+        try:
+            if datetime.fromtimestamp(due).isoformat() == text:
+                return due, None
+        except (OverflowError, OSError, ValueError):
+            pass
+    return due, text
+
+
+_EPOCH_DUE = parse_review(EPOCH)[0]
+
+
+class Card:
+    """One flashcard; see the module docstring"""
+
+    __slots__ = ("word", "pinyin", "meaning", "category", "ease", "due", "_raw", "extra")
+
+    def __init__(self, word, pinyin, meaning, category, ease=None, next_review=_ABSENT, extra=None):
+        self.word = word
+        self.pinyin = pinyin
+        self.meaning = meaning
+        self.category = sys.intern(category)
+        self.ease = ease            # None when the JSON entry had no ease
+        self.extra = extra or None  # any other keys, kept for the round trip
+        if next_review is _ABSENT:
+            self.due, self._raw = _EPOCH_DUE, _ABSENT
+        else:
+            self.due, self._raw = parse_review(next_review)
+
+    @classmethod
+    def from_dict(cls, entry):
+        extra = None
+        if not _FIELD_SET.issuperset(entry):
+            extra = {k: v for k, v in entry.items() if k not in _FIELD_SET}
+        return cls(entry['word'], entry['pinyin'], entry['meaning'], entry['category'],
+                   entry.get('ease'), entry.get('next_review', _ABSENT), extra)
+
+    def to_dict(self):
+        """The flashcards.json entry for this card"""
+        entry = {"word": self.word, "pinyin": self.pinyin, "meaning": self.meaning, "category": self.category}
+        if self.ease is not None:
+            entry["ease"] = self.ease
+        if self._raw is not _ABSENT:
+            entry["next_review"] = self.next_review
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    @property
+    def next_review(self):
+        if self._raw is _ABSENT:
+            return EPOCH
+        if self._raw is not None:
+            return self._raw
+        return datetime.fromtimestamp(self.due).isoformat()
+
+    @next_review.setter
+    def next_review(self, text):
+        self.due, self._raw = parse_review(text)
+
+    def copy(self):
+        """A separate Card with the same text and scheduling (the strings are shared)"""
+        card = Card.__new__(Card)
+        card.word, card.pinyin, card.meaning, card.category = self.word, self.pinyin, self.meaning, self.category
+        card.ease, card.due, card._raw = self.ease, self.due, self._raw
+        card.extra = dict(self.extra) if self.extra else None
+        return card
+
+    def set_due(self, due):
+        """Reschedule to whole epoch seconds without going through a string"""
+        self.due = int(due)
+        self._raw = None
+
+    # Mapping-style access so code written for card dicts keeps working
+
+    def __getitem__(self, key):
+        if key in _TEXT_FIELDS:
+            return getattr(self, key)
+        if key == "ease" and self.ease is not None:
+            return self.ease
+        if key == "next_review" and self._raw is not _ABSENT:
+            return self.next_review
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "category":
+            self.category = sys.intern(value)
+        elif key in FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, fields=(), **more):
+        for key, value in dict(fields, **more).items():
+            self[key] = value
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __repr__(self):
+        return f"Card({self.to_dict()!r})"
+
+
+def set_dues(cards, dues):
+    """
+    New due times (int epoch seconds) for many cards without a call per card;
+    dict cards get a next_review string
+    """
+    for card, due in zip(cards, dues):
+        try:
+            card.due = due
+        except AttributeError:
+            card["next_review"] = datetime.fromtimestamp(due).isoformat()
+            continue
+        card._raw = None
+
+
+def compact(entries):
+    """Cards for a list of flashcards.json entries"""
+    return [Card.from_dict(entry) for entry in entries]
+
+
+def to_json(obj):
+    """json.dump default= hook: serialise Cards as their JSON entries"""
+    if isinstance(obj, Card):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
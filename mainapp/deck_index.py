@@ -0,0 +1,720 @@
+import bisect
+import heapq
+import itertools
+import random
+import re
+import unicodedata
+from datetime import datetime
+from operator import itemgetter
+
+ALL = "All"
+EPOCH = "1970-01-01T00:00:00"
+
+
+def parse_due(card):
+    """Return a card's next review time as a timestamp (bad dates are always due)"""
+    due = getattr(card, "due", None)
+    if due is not None:
+        # Compact cards carry it pre-parsed as epoch seconds
+        return due
+    try:
+        return datetime.fromisoformat(card.get("next_review", EPOCH)).timestamp()
+    except (ValueError, TypeError, OverflowError, OSError):
+        return float('-inf')
+
+
+def _choose(cards, exclude=None):
+    """A random element of a list other than exclude, in O(1), or None"""
+    if not cards:
+        return None
+    i = random.randrange(len(cards))
+    if cards[i] is exclude:
+        if len(cards) == 1:
+            return None
+        # Any other position, uniformly
+        i = (i + 1 + random.randrange(len(cards) - 1)) % len(cards)
+    return cards[i]
+
+
+class _Bucket:
+    """Cards of one category split into a heap of upcoming cards and a pool of due ones"""
+
+    def __init__(self):
+        self.size = 0
+        self.upcoming = []   # heap of (due, seq, card)
+        self.due = []        # cards whose review time has passed
+        self._due_pos = {}   # id(card) -> position in self.due (None: not built yet)
+        self.run = ((), ())  # dues and cards in due order from a rebuild...
+        self.run_at = 0      # ...of which those before run_at have been taken
+        self.run_mark = 0    # seqs from here on are newer than the run
+
+    @property
+    def due_pos(self):
+        # After a rebuild, built the first time a due card moves: rebuilding
+        # again before then (as when trying out schedulers) costs nothing
+        if self._due_pos is None:
+            self._due_pos = dict(zip(map(id, self.due), range(len(self.due))))
+        return self._due_pos
+
+    def add_due(self, card):
+        self.due_pos[id(card)] = len(self.due)
+        self.due.append(card)
+
+    def remove_due(self, card):
+        pos = self.due_pos.pop(id(card), None)
+        if pos is None:
+            return
+        last = self.due.pop()
+        if last is not card:
+            self.due[pos] = last
+            self.due_pos[id(last)] = pos
+
+
+class DueIndex:
+    """
+    Index of cards by next review time, kept per category and for "All".
+    Timestamps are parsed once when a card is added; rescheduling is O(log n)
+    and picking a random due card is O(1) amortised.
+    """
+
+    def __init__(self, cards=()):
+        self._seq = itertools.count()
+        self._latest = {}    # id(card) -> seq of its current heap entry
+        self._buckets = {ALL: _Bucket()}
+
+        # Bulk load: heapify once instead of pushing card by card
+        for card in cards:
+            self._track(card, parse_due(card), push=list.append)
+        for bucket in self._buckets.values():
+            heapq.heapify(bucket.upcoming)
+
+    def _track(self, card, due, push=heapq.heappush):
+        seq = next(self._seq)
+        self._latest[id(card)] = seq
+        for key in (ALL, card['category']):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            bucket.size += 1
+            push(bucket.upcoming, (due, seq, card))
+
+    def add(self, card, due=None):
+        """Start tracking a new card"""
+        self._track(card, parse_due(card) if due is None else due)
+
+    def remove(self, card):
+        """Stop tracking a card; its heap entries go stale"""
+        if self._latest.pop(id(card), None) is None:
+            return
+        for key in (ALL, card['category']):
+            bucket = self._buckets[key]
+            bucket.size -= 1
+            bucket.remove_due(card)
+
+    def reschedule(self, card, due):
+        """Move a card to a new review time (a timestamp)"""
+        if id(card) not in self._latest:
+            self.add(card, due)
+            return
+        # The old heap entry goes stale and is skipped when it surfaces
+        seq = next(self._seq)
+        self._latest[id(card)] = seq
+        for key in (ALL, card['category']):
+            bucket = self._buckets[key]
+            bucket.remove_due(card)
+            heapq.heappush(bucket.upcoming, (due, seq, card))
+            if len(bucket.upcoming) > 2 * bucket.size + 64:
+                self._compact(bucket)
+
+    def rebuild(self, cards, now=None):
+        """
+        Re-sort every bucket after most cards' due times changed at once (a
+        change of scheduler). Rather than a heap entry per card, each bucket
+        gets its cards due by now as its due pool and the rest as a run in
+        due order, which _advance() reads from the front; only reschedules
+        after this go onto the heap. cards must be every card the index tracks.
+        """
+        now = datetime.now().timestamp() if now is None else now
+        try:
+            dues = [card.due for card in cards]
+            categories = [card.category for card in cards]
+        except AttributeError:
+            # Dict cards
+            dues = list(map(parse_due, cards))
+            categories = [card['category'] for card in cards]
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        # (name, due pool, run) per bucket. The pools are in deck order, which
+        # is far kinder to the CPU cache than due order for a million cards
+        names = list(dict.fromkeys(categories))
+        if np is not None:
+            codes = list(map({name: code for code, name in enumerate(names)}.__getitem__, categories))
+            at = np.array(dues)
+            code = np.array(codes, dtype=np.int32)
+            objects = np.fromiter(cards, dtype=object, count=len(cards))
+            due = at <= now
+            upcoming = np.flatnonzero(~due)
+            upcoming = upcoming[np.argsort(at[upcoming], kind="stable")]
+            by_code = upcoming[np.argsort(code[upcoming], kind="stable")]
+            ends = np.cumsum(np.bincount(code[upcoming], minlength=len(names))).tolist()
+            rows = [(ALL, np.flatnonzero(due), upcoming)]
+            rows += [(name, np.flatnonzero(due & (code == c)), by_code[ends[c - 1] if c else 0:ends[c]])
+                     for c, name in enumerate(names)]
+            groups = [(name, objects[pool].tolist(), (at[run].tolist(), objects[run].tolist()))
+                      for name, pool, run in rows]
+        else:
+            pools = {name: [] for name in [ALL] + names}
+            runs = {name: ([], []) for name in pools}
+            for i, card in enumerate(cards):
+                if dues[i] <= now:
+                    pools[ALL].append(card)
+                    pools[categories[i]].append(card)
+            for i in sorted(range(len(cards)), key=dues.__getitem__):
+                if dues[i] > now:
+                    for name in (ALL, categories[i]):
+                        runs[name][0].append(dues[i])
+                        runs[name][1].append(cards[i])
+            groups = [(name, pools[name], runs[name]) for name in pools]
+
+        # Cards keep their seqs: one rescheduled from here on gets a newer
+        # seq than any in the runs, which is how its run entry goes stale
+        mark = next(self._seq)
+        self._buckets = {}
+        for name, pool, run in groups:
+            bucket = self._buckets[name] = _Bucket()
+            bucket.size = len(pool) + len(run[1])
+            bucket.due, bucket._due_pos = pool, None
+            bucket.run, bucket.run_mark = run, mark
+
+    def _compact(self, bucket):
+        """Drop stale heap entries left behind by rescheduling"""
+        bucket.upcoming = [e for e in bucket.upcoming if self._latest.get(id(e[2])) == e[1]]
+        heapq.heapify(bucket.upcoming)
+
+    def _advance(self, bucket, now):
+        """Move every card whose review time has passed into the due pool"""
+        heap = bucket.upcoming
+        while heap and heap[0][0] <= now:
+            due, seq, card = heapq.heappop(heap)
+            if self._latest.get(id(card)) == seq and id(card) not in bucket.due_pos:
+                bucket.add_due(card)
+        dues, cards = bucket.run
+        if bucket.run_at < len(dues) and dues[bucket.run_at] <= now:
+            end = bisect.bisect_right(dues, now, bucket.run_at)
+            for card in cards[bucket.run_at:end]:
+                # Not rescheduled since: then it cannot be in the pool yet either
+                seq = self._latest.get(id(card))
+                if seq is not None and seq < bucket.run_mark:
+                    bucket.add_due(card)
+            bucket.run_at = end
+            if end == len(dues):
+                bucket.run, bucket.run_at = ((), ()), 0
+
+    def pick(self, category=ALL, now=None, exclude=None):
+        """Return a random due card from the category (other than exclude), or None if nothing is due"""
+        bucket = self._buckets.get(category)
+        if bucket is None:
+            return None
+        self._advance(bucket, datetime.now().timestamp() if now is None else now)
+        return _choose(bucket.due, exclude)
+
+    def due_count(self, category=ALL, now=None):
+        """Number of cards currently due in the category"""
+        return len(self.pool(category, now))
+
+    def pool(self, category=ALL, now=None):
+        """Cards currently due in the category (read-only view, do not modify)"""
+        bucket = self._buckets.get(category)
+        if bucket is None:
+            return []
+        self._advance(bucket, datetime.now().timestamp() if now is None else now)
+        return bucket.due
+
+
+class CardIndex:
+    """
+    Cards grouped by category, built once at load and kept up to date as
+    cards are added, edited or rescheduled. Owns the DueIndex so card and
+    due counts per category are always available without a deck scan.
+    """
+
+    def __init__(self, cards=()):
+        self._cards = {ALL: []}
+        self._pos = {}       # (category, id(card)) -> position in its list
+        for card in cards:
+            self._insert(card)
+        self.due = DueIndex(cards)
+        self._categories = None
+
+    def _insert(self, card):
+        for key in (ALL, card['category']):
+            group = self._cards.setdefault(key, [])
+            self._pos[(key, id(card))] = len(group)
+            group.append(card)
+
+    def _delete(self, card):
+        for key in (ALL, card['category']):
+            group = self._cards[key]
+            pos = self._pos.pop((key, id(card)))
+            last = group.pop()
+            if last is not card:
+                group[pos] = last
+                self._pos[(key, id(last))] = pos
+            if not group and key != ALL:
+                del self._cards[key]
+                self._categories = None
+
+    @property
+    def categories(self):
+        """Sorted category names (cached until a category appears or empties)"""
+        if self._categories is None:
+            self._categories = sorted(k for k in self._cards if k != ALL)
+        return self._categories
+
+    def count(self, category=ALL):
+        return len(self._cards.get(category, ()))
+
+    def due_count(self, category=ALL, now=None):
+        return self.due.due_count(category, now)
+
+    def pool(self, category=ALL):
+        """Cards in a category (read-only view, do not modify)"""
+        return self._cards.get(category, [])
+
+    def random_card(self, category=ALL, exclude=None):
+        return _choose(self._cards.get(category, ()), exclude)
+
+    def next_card(self, category=ALL, now=None, exclude=None):
+        """
+        A random due card, falling back to any card in the category. exclude
+        is skipped unless it is the only card in the category.
+        """
+        card = self.due.pick(category, now, exclude) or self.random_card(category, exclude)
+        if card is None and exclude is not None and self._pos.get((category, id(exclude))) is not None:
+            return exclude
+        return card
+
+    def add(self, card):
+        if card['category'] not in self._cards:
+            self._categories = None
+        self._insert(card)
+        self.due.add(card)
+
+    def update(self, card, **fields):
+        """Edit a card in place, moving it between categories if needed"""
+        self.due.remove(card)
+        self._delete(card)
+        card.update(fields)
+        self.add(card)
+
+    def reschedule(self, card, due):
+        self.due.reschedule(card, due)
+
+    def reschedule_all(self, now=None):
+        """Pick up new due times on many cards at once (see DueIndex.rebuild)"""
+        self.due.rebuild(self._cards[ALL], now)
+
+
+class OverlayIndex:
+    """
+    One student's view of a CardIndex shared by many (e.g. a server's
+    students over one deck). The shared cards stand for every card the
+    student has not reviewed, with the deck's default scheduling; the
+    first time the student changes a card, take() gives them a copy of
+    their own, which hides the shared one. Building one costs only the
+    cards the student has, not the deck. The same methods as CardIndex.
+    """
+
+    TRIES = 16      # random draws before falling back to a scan
+
+    def __init__(self, shared, by_key, cards=(), key=None):
+        self.shared = shared
+        self.by_key = by_key            # key -> shared card
+        self.key = key                  # key(card), e.g. journal.card_id
+        self.own = CardIndex(cards)
+        self._own = {}                  # key -> the student's card
+        self._hidden = {}               # key -> shared card the student has a copy of
+        self._hidden_count = {}         # category -> number of hidden shared cards
+        for card in cards:
+            self._own[self.key(card)] = card
+            self._hide(self.key(card))
+
+    def _hide(self, key):
+        card = self.by_key.get(key)
+        if card is not None and key not in self._hidden:
+            self._hidden[key] = card
+            for cat in (ALL, card['category']):
+                self._hidden_count[cat] = self._hidden_count.get(cat, 0) + 1
+
+    def take(self, card):
+        """The student's own copy of a shared card, made the first time (call before changing it)"""
+        key = self.key(card)
+        own = self._own.get(key)
+        if own is None:
+            own = self._own[key] = card.copy()
+            self.own.add(own)
+            self._hide(key)
+        return own
+
+    @property
+    def categories(self):
+        return sorted(set(self.shared.categories).union(self.own.categories))
+
+    def count(self, category=ALL):
+        return self.shared.count(category) - self._hidden_count.get(category, 0) + self.own.count(category)
+
+    def due_count(self, category=ALL, now=None):
+        now = datetime.now().timestamp() if now is None else now
+        hidden = sum(1 for card in self._hidden.values()
+                     if (category == ALL or card['category'] == category) and parse_due(card) <= now)
+        return self.shared.due_count(category, now) - hidden + self.own.due_count(category, now)
+
+    def pool(self, category=ALL):
+        """Cards in a category (a new list)"""
+        return self.own.pool(category) + [c for c in self.shared.pool(category) if self.key(c) not in self._hidden]
+
+    def _choose(self, shared, own, exclude):
+        """A random card from shared (less the hidden ones) and own, other than exclude"""
+        n = len(shared) + len(own)
+        if not n:
+            return None
+        for _ in range(self.TRIES):
+            i = random.randrange(n)
+            card = shared[i] if i < len(shared) else own[i - len(shared)]
+            if card is not exclude and (i >= len(shared) or self.key(card) not in self._hidden):
+                return card
+        # Mostly hidden or excluded: scan instead of drawing forever
+        return _choose([c for c in own if c is not exclude]
+                       + [c for c in shared if c is not exclude and self.key(c) not in self._hidden])
+
+    def random_card(self, category=ALL, exclude=None):
+        return self._choose(self.shared.pool(category), self.own.pool(category), exclude)
+
+    def next_card(self, category=ALL, now=None, exclude=None):
+        """As CardIndex.next_card"""
+        now = datetime.now().timestamp() if now is None else now
+        card = (self._choose(self.shared.due.pool(category, now), self.own.due.pool(category, now), exclude)
+                or self.random_card(category, exclude))
+        if card is None and exclude is not None and self.count(category):
+            return exclude
+        return card
+
+    def add(self, card):
+        self.own.add(card)
+
+    def update(self, card, **fields):
+        self.own.update(self.take(card), **fields)
+
+    def reschedule(self, card, due):
+        self.own.reschedule(card, due)
+
+    def reschedule_all(self, now=None):
+        # The shared cards keep the deck's default scheduling
+        self.own.reschedule_all(now)
+
+
+class _MeaningPool:
+    """Distinct meanings with reference counts; O(1) add, remove and random pick"""
+
+    def __init__(self):
+        self.items = []
+        self.pos = {}        # meaning -> position in items
+        self.refs = {}       # meaning -> number of cards with it
+
+    def add(self, meaning):
+        refs = self.refs.get(meaning, 0)
+        self.refs[meaning] = refs + 1
+        if not refs:
+            self.pos[meaning] = len(self.items)
+            self.items.append(meaning)
+
+    def remove(self, meaning):
+        refs = self.refs.get(meaning, 0)
+        if refs > 1:
+            self.refs[meaning] = refs - 1
+            return
+        if not refs:
+            return
+        del self.refs[meaning]
+        pos = self.pos.pop(meaning)
+        last = self.items.pop()
+        if last != meaning:
+            self.items[pos] = last
+            self.pos[last] = pos
+
+    def sample(self, k, exclude):
+        """Up to k random meanings not in exclude"""
+        items = self.items
+        available = len(items) - sum(1 for m in exclude if m in self.pos)
+        if available <= 0:
+            return []
+        k = min(k, available)
+        if available < 4 * k:
+            # Small pool: filter and sample directly
+            return random.sample([m for m in items if m not in exclude], k)
+        # Large pool: rejection sampling touches only a handful of entries
+        chosen = []
+        while len(chosen) < k:
+            m = items[random.randrange(len(items))]
+            if m not in exclude and m not in chosen:
+                chosen.append(m)
+        return chosen
+
+
+def length_bucket(meaning):
+    """Rough shape of a meaning: one word, two words, or a longer phrase"""
+    return min(len(meaning.split()), 3)
+
+
+class DistractorIndex:
+    """
+    Unique card meanings grouped by category and by length bucket, for
+    picking wrong quiz answers without copying or shuffling the deck.
+    Built from cards the first time a question needs it, so loading a deck
+    file does not read every meaning up front; until then cards must be the
+    live list (add() and remove() only keep an index that exists in step).
+    """
+
+    def __init__(self, cards=()):
+        self._cards = cards
+        self._all = None
+        self._by_category = {}
+        self._by_length = {}
+
+    def _built(self):
+        if self._all is None:
+            self._all = _MeaningPool()
+            for card in self._cards:
+                self._add(card)
+            self._cards = None
+        return self
+
+    def _pools(self, card, meaning):
+        category = self._by_category.setdefault(card['category'], _MeaningPool())
+        length = self._by_length.setdefault(length_bucket(meaning), _MeaningPool())
+        return self._all, category, length
+
+    def _add(self, card):
+        meaning = card['meaning']
+        for pool in self._pools(card, meaning):
+            pool.add(meaning)
+
+    def add(self, card):
+        if self._all is not None:
+            self._add(card)
+
+    def remove(self, card):
+        """Forget a card (call before editing its meaning or category)"""
+        if self._all is None:
+            return
+        meaning = card['meaning']
+        for pool in self._pools(card, meaning):
+            pool.remove(meaning)
+
+    def __len__(self):
+        return len(self._built()._all.items)
+
+    def sample(self, correct, k=3, category=None, prefer_category=False):
+        """
+        k distinct wrong meanings for a card whose answer is `correct`.
+        With prefer_category, same-category meanings come first, then ones of
+        a similar length, then anything, which makes questions harder.
+        """
+        self._built()
+        chosen = []
+        exclude = {correct}
+        pools = []
+        if prefer_category:
+            pools.append(self._by_category.get(category))
+            pools.append(self._by_length.get(length_bucket(correct)))
+        pools.append(self._all)
+        for pool in pools:
+            if pool is None or len(chosen) >= k:
+                continue
+            picked = pool.sample(k - len(chosen), exclude)
+            chosen.extend(picked)
+            exclude.update(picked)
+        return chosen
+
+
+_SPLIT = re.compile(r"[\s'\-·]+")
+_HANZI = re.compile(r"[\u3400-\u9fff\uf900-\ufaff\U00020000-\U0002fa1f]")
+
+
+def _fold_table():
+    """One translate() table: tone-marked letters to plain ones, case folded, tone numbers and separators dropped"""
+    table = {ord(c): None for c in "0123456789 '-·"}
+    for code in range(0x41, 0x250):
+        base = unicodedata.normalize("NFD", chr(code))[0].lower()
+        if base.isascii() and base.isalpha():
+            table[code] = base
+    for c in "vVǖǘǚǜǕǗǙǛüÜ":
+        table[ord(c)] = "u"
+    return table
+
+
+_FOLD = _fold_table()
+_MARKS = str.maketrans("", "", "".join(map(chr, range(0x300, 0x370))))
+MAX_TOKENS = 6          # meaning words indexed per card (long glosses are cut)
+MAX_SYLLABLES = 8       # pinyin syllables indexed per card
+# One folded syllable: optional initial, then the longest final that fits
+_SYLLABLE = re.compile(r"(?:[zcs]h|[bpmfdtnlgkhjqxrzcsyw])?"
+                       r"(?:iang|iong|uang|ang|eng|ing|ong|uai|iao|ian|uan|ai|ei|ao|ou|an|en|in|un"
+                       r"|ia|ie|iu|ua|uo|ui|ue|er|a|o|e|i|u)")
+MAX_SCAN = 5000         # index entries looked at per lookup when filtering by category
+
+
+def fold_pinyin(text):
+    """Pinyin as typed on a plain keyboard: 'Nǐ hǎo' -> 'nihao', 'ni3hao3' -> 'nihao', 'lǜ'/'lv' -> 'lu'"""
+    folded = text.translate(_FOLD)
+    if not folded.isascii():
+        # Combining tone marks or letters outside the table
+        folded = unicodedata.normalize("NFD", folded).translate(_MARKS).translate(_FOLD)
+    return folded
+
+
+def _pinyin_keys(pinyin):
+    """Folded pinyin from each syllable on: 'nǐ hǎo' -> {'nihao', 'hao'}, 'xuéxiào' -> {'xuexiao', 'xiao'}"""
+    if " " not in pinyin and "'" not in pinyin and "-" not in pinyin:
+        folded = fold_pinyin(pinyin)
+        starts = [m.start() for m in _SYLLABLE.finditer(folded)]
+        if not starts or starts[0]:
+            starts.insert(0, 0)
+        return [folded[i:] for i in starts[:MAX_SYLLABLES]] if folded else ()
+    folded, starts = "", []
+    for group in _SPLIT.split(pinyin):
+        group = fold_pinyin(group)
+        if group:
+            # Separators always start a syllable (xī'ān is xi + an, not xian)
+            starts.append(len(folded))
+            starts.extend(len(folded) + m.start() for m in _SYLLABLE.finditer(group))
+            folded += group
+    return [folded[i:] for i in sorted(set(starts))[:MAX_SYLLABLES]]
+
+
+def _meaning_keys(meaning):
+    """Lower-cased meaning from each word on: 'older brother' -> {'older brother', 'brother'}"""
+    if " " not in meaning:
+        return (meaning.casefold(),) if meaning else ()
+    tokens = meaning.casefold().split()
+    # Suffixes get strictly shorter, so there are no repeats to remove
+    return [" ".join(tokens[i:]) for i in range(min(len(tokens), MAX_TOKENS))]
+
+
+class _SortedKeys:
+    """Sorted (key, card) entries for prefix lookups by binary search"""
+
+    def __init__(self, entries):
+        entries.sort(key=itemgetter(0))
+        self.keys = [key for key, _ in entries]
+        self.cards = [card for _, card in entries]
+
+    def add(self, key, card):
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.cards.insert(i, card)
+
+    def remove(self, key, card):
+        i = bisect.bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.cards[i] is card:
+                del self.keys[i]
+                del self.cards[i]
+                return
+            i += 1
+
+    def prefix(self, prefix):
+        """Cards whose key starts with prefix, lazily and in key order (so an exact match comes first)"""
+        keys, cards = self.keys, self.cards
+        i = bisect.bisect_left(keys, prefix)
+        n = len(keys)
+        while i < n and keys[i].startswith(prefix):
+            yield cards[i]
+            i += 1
+
+
+class SearchIndex:
+    """
+    Type-ahead search over word, pinyin and meaning.
+
+    Pinyin is folded to plain letters (fold_pinyin) and indexed from every
+    syllable on, so "baba", "ba4ba", "hao" and "xiao" find bàba, nǐ hǎo and
+    xuéxiào.
+    Meanings are indexed from every word on, lower-cased. Both are sorted
+    arrays searched by prefix with bisect. Hanzi queries find any word
+    containing them, through a per-character index.
+    """
+
+    def __init__(self, cards=()):
+        pinyin, meaning = [], []
+        chars = self._chars = {}
+        for card in cards:
+            for key in _pinyin_keys(card['pinyin']):
+                pinyin.append((key, card))
+            for key in _meaning_keys(card['meaning']):
+                meaning.append((key, card))
+            for ch in set(card['word']):
+                group = chars.get(ch)
+                if group is None:
+                    chars[ch] = [card]
+                else:
+                    group.append(card)
+        self._pinyin = _SortedKeys(pinyin)
+        self._meaning = _SortedKeys(meaning)
+
+    def add(self, card):
+        for key in _pinyin_keys(card['pinyin']):
+            self._pinyin.add(key, card)
+        for key in _meaning_keys(card['meaning']):
+            self._meaning.add(key, card)
+        for ch in set(card['word']):
+            self._chars.setdefault(ch, []).append(card)
+
+    def remove(self, card):
+        """Forget a card (call before editing its text)"""
+        for key in _pinyin_keys(card['pinyin']):
+            self._pinyin.remove(key, card)
+        for key in _meaning_keys(card['meaning']):
+            self._meaning.remove(key, card)
+        for ch in set(card['word']):
+            group = self._chars.get(ch)
+            if group is not None:
+                group[:] = [c for c in group if c is not card]
+                if not group:
+                    del self._chars[ch]
+
+    def search(self, query, limit=20, category=ALL):
+        """Up to limit cards matching query (hanzi, pinyin with or without tones, or meaning), best first"""
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        if _HANZI.search(query):
+            matches = self._hanzi(query.replace(" ", ""), category)
+        else:
+            folded = fold_pinyin(query)
+            sources = [self._pinyin.prefix(folded)] if folded else []
+            sources.append(self._meaning.prefix(" ".join(query.casefold().split())))
+            matches = itertools.chain.from_iterable(sources)
+            if category != ALL:
+                matches = (c for c in itertools.islice(matches, MAX_SCAN) if c['category'] == category)
+
+        results, seen = [], set()
+        for card in matches:
+            if id(card) not in seen:
+                seen.add(id(card))
+                results.append(card)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _hanzi(self, query, category):
+        # Scan the cards holding the query's rarest character
+        groups = [self._chars.get(ch, ()) for ch in set(query)]
+        candidates = min(groups, key=len)
+        found = [c for c in candidates if query in c['word'] and (category == ALL or c['category'] == category)]
+        # Exact word, then words starting with the query, then shorter words
+        found.sort(key=lambda c: (c['word'] != query, not c['word'].startswith(query), len(c['word'])))
+        return found
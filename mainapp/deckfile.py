@@ -0,0 +1,229 @@
+"""
+Binary deck format for very large decks.
+
+    python mainapp/deckfile.py to-binary flashcards.json flashcards.fcdeck
+    python mainapp/deckfile.py to-json flashcards.fcdeck flashcards.json
+
+Layout: HEADER, a fixed-width record per card, a string heap and a JSON
+list of category names. A record holds the card's due time, ease and
+category number plus (offset, length) references into the heap for its
+word, pinyin, meaning and any extra keys.
+
+Opening a deck memory-maps the file and reads only the records' due,
+ease and category columns, which is all the due index needs. The text of
+a card is decoded from the map each time it is read, so pages are touched
+only for cards that are actually shown or quizzed.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+
+from cards import _ABSENT, _EPOCH_DUE, Card
+
+SUFFIX = ".fcdeck"
+MAGIC = b"FCDECK01"
+# MAGIC, card count, records offset, heap offset, categories offset, categories length
+HEADER = struct.Struct("<8sIQQQI")
+# due, word, pinyin, meaning, extra (offset, length pairs), category, ease, flags
+RECORD = struct.Struct("<q8IHbB")
+_TEXT_OFFSETS = {"word": 8, "pinyin": 16, "meaning": 24}
+_PAIR = struct.Struct("<II")
+
+HAS_REVIEW = 1
+RAW_REVIEW = 2      # next_review kept verbatim in the extra blob
+HAS_EXTRA = 4       # the extra blob is not empty
+NO_EASE = -1
+
+
+class DeckCard(Card):
+    """A Card whose text stays in the deck file until it is changed"""
+
+    __slots__ = ("_deck", "_row")
+
+    def __getattr__(self, name):
+        # Only called for slots that have not been set: the lazy fields
+        if name in _TEXT_OFFSETS:
+            return self._deck.text(self._row, _TEXT_OFFSETS[name])
+        if name in ("extra", "_raw"):
+            extra = self._deck.extra(self._row)
+            if "next_review" in extra:
+                self._raw = extra.pop("next_review")
+            self.extra = extra or None
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def materialize(self):
+        """Copy the text out of the deck file into the card itself"""
+        for name in ("word", "pinyin", "meaning", "extra"):
+            setattr(self, name, getattr(self, name))
+
+
+class DeckFile:
+    """Read-only, memory-mapped view of a deck written by write_deck()"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()   # reads vs. close() from the writer thread
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._records, self._heap, cat_offset, cat_length = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a deck file")
+        self.categories = json.loads(self._map[cat_offset:cat_offset + cat_length].decode('utf-8'))
+        self.cards = None
+
+    def load(self):
+        """The deck as DeckCards; only due, ease and category are read now"""
+        if self.cards is not None:
+            return self.cards
+        categories = [sys.intern(c) for c in self.categories]
+        end = self._records + self.count * RECORD.size
+        cards = []
+        new = DeckCard.__new__
+        with self._lock:
+            for row, rec in enumerate(RECORD.iter_unpack(memoryview(self._map)[self._records:end])):
+                card = new(DeckCard)
+                card._deck = self
+                card._row = row
+                card.category = categories[rec[9]]
+                card.ease = None if rec[10] == NO_EASE else rec[10]
+                flags = rec[11]
+                card.due = rec[0] if flags & HAS_REVIEW else _EPOCH_DUE
+                # Otherwise read from the extra blob on first use
+                if not flags & RAW_REVIEW:
+                    card._raw = None if flags & HAS_REVIEW else _ABSENT
+                if not flags & HAS_EXTRA:
+                    card.extra = None
+                cards.append(card)
+        self.cards = cards
+        return cards
+
+    def _pair(self, row, offset):
+        return _PAIR.unpack_from(self._map, self._records + row * RECORD.size + offset)
+
+    def text(self, row, offset):
+        with self._lock:
+            start, length = self._pair(row, offset)
+            start += self._heap
+            return self._map[start:start + length].decode('utf-8')
+
+    def extra(self, row):
+        with self._lock:
+            start, length = self._pair(row, 32)
+            start += self._heap
+            return json.loads(self._map[start:start + length].decode('utf-8')) if length else {}
+
+    def detach(self):
+        """Copy every card's text into memory and unmap the file (so it can be replaced)"""
+        for card in self.cards or ():
+            card.materialize()
+        with self._lock:
+            self._map.close()
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+
+
+_open = {}      # path -> DeckFiles mapping it, so a rewrite can release them first
+
+
+def load_deck(path, default=None):
+    """Open a deck file and return its cards (default if the file does not exist)"""
+    if not os.path.exists(path):
+        return default
+    deck = DeckFile(path)
+    _open.setdefault(os.path.abspath(path), weakref.WeakSet()).add(deck)
+    return deck.load()
+
+
+def write_deck(path, cards):
+    """Write cards (Cards or flashcards.json entries) as a deck file, atomically"""
+    categories = {}
+    records = bytearray()
+    heap = bytearray()
+
+    def put(text):
+        data = text.encode('utf-8')
+        heap.extend(data)
+        return len(heap) - len(data), len(data)
+
+    for card in cards:
+        if not isinstance(card, Card):
+            card = Card.from_dict(card)
+        extra = dict(card.extra or {})
+        flags = 0
+        if card._raw is not _ABSENT:
+            flags |= HAS_REVIEW
+            if card._raw is not None:
+                flags |= RAW_REVIEW
+                extra["next_review"] = card._raw
+        if extra:
+            flags |= HAS_EXTRA
+            extra_ref = put(json.dumps(extra, ensure_ascii=False))
+        else:
+            extra_ref = (0, 0)
+        category = categories.setdefault(card.category, len(categories))
+        records.extend(RECORD.pack(card.due, *put(card.word), *put(card.pinyin), *put(card.meaning), *extra_ref,
+                                   category, NO_EASE if card.ease is None else card.ease, flags))
+
+    names = json.dumps(list(categories), ensure_ascii=False).encode('utf-8')
+    count = len(records) // RECORD.size
+    records_offset = HEADER.size
+    heap_offset = records_offset + len(records)
+    cat_offset = heap_offset + len(heap)
+
+    # Windows cannot replace a file that is still mapped; elsewhere the old
+    # mapping stays readable after the rename
+    if os.name == "nt":
+        for deck in list(_open.pop(os.path.abspath(path), ())):
+            deck.detach()
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with open(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, count, records_offset, heap_offset, cat_offset, len(names)))
+            f.write(records)
+            f.write(heap)
+            f.write(names)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def main(argv=None):
+    import argparse
+    from storage import load_json, save_json
+
+    parser = argparse.ArgumentParser(description="Convert decks between JSON and the binary deck format")
+    sub = parser.add_subparsers(dest="command", required=True)
+    to_binary = sub.add_parser("to-binary", help="flashcards.json -> .fcdeck")
+    to_binary.add_argument("source")
+    to_binary.add_argument("target")
+    to_json = sub.add_parser("to-json", help=".fcdeck -> flashcards.json")
+    to_json.add_argument("source")
+    to_json.add_argument("target")
+    args = parser.parse_args(argv)
+
+    if args.command == "to-binary":
+        cards = load_json(args.source, None)
+        if cards is None:
+            parser.error(f"could not read {args.source}")
+        write_deck(args.target, cards)
+    else:
+        cards = load_deck(args.source)
+        if cards is None:
+            parser.error(f"could not read {args.source}")
+        save_json(args.target, cards)
+    print(f"Wrote {len(cards)} cards to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Bulk import and export of decks as CSV, TSV or Anki plain-text notes.
+
+    python mainapp/deckio.py import hsk-2025.csv                     # into the app's deck
+    python mainapp/deckio.py import notes.txt --format anki --category HSK1
+    python mainapp/deckio.py export deck.tsv --deck mainapp/flashcards.json
+
+Rows are read one at a time, so a word list of any length is streamed
+rather than loaded. Each row is matched on (word, pinyin) against a hash
+index of the deck: a known card keeps its ease and next review and only
+takes the row's meaning and category (its own category stays when the
+row has none), an unknown one is added, due now, in the row's category
+or --category.
+Later rows repeating a (word, pinyin) already seen in the file are
+counted and ignored, so importing the same list twice changes nothing
+the second time. CSV and TSV
+use a header row naming the columns (word, pinyin, meaning, category,
+ease, next_review) or, without one, that order. Anki exports are read as
+word, pinyin, meaning fields, with the category taken from the first tag
+or the deck name. Run it while the app is closed, since both write the
+deck file.
+"""
+import csv
+import html
+import io
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from cards import Card
+from instrument import timed
+from storage import load_data, save_data
+
+log = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FORMATS = ("csv", "tsv", "anki")
+SUFFIXES = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".txt": "anki"}
+DEFAULT_CATEGORY = "Imported"
+PROGRESS_EVERY = 50000     # rows between progress reports
+
+# Header names accepted for each column
+COLUMNS = {
+    "word": ("word", "hanzi", "simplified", "chinese", "front"),
+    "pinyin": ("pinyin", "reading"),
+    "meaning": ("meaning", "english", "definition", "translation", "back"),
+    "category": ("category", "tags", "tag"),
+    "ease": ("ease",),
+    "next_review": ("next_review", "due"),
+}
+_HEADER = {alias: field for field, aliases in COLUMNS.items() for alias in aliases}
+_TAG = re.compile(r"<[^>]*>")
+
+
+def detect_format(path):
+    return SUFFIXES.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def default_deck():
+    """The deck the app opens: the binary deck if there is one, else flashcards.json"""
+    deck = os.path.join(HERE, "flashcards.fcdeck")
+    return deck if os.path.exists(deck) else os.path.join(HERE, "flashcards.json")
+
+
+class _Source:
+    """A text file read through a byte counter, for progress by position"""
+
+    def __init__(self, path):
+        self.raw = open(path, 'rb')
+        self.size = os.fstat(self.raw.fileno()).st_size
+        self.text = io.TextIOWrapper(self.raw, encoding='utf-8-sig', newline='')
+
+    def position(self):
+        # The text layer reads ahead, so this is a close estimate
+        return self.raw.tell()
+
+    def close(self):
+        self.text.close()
+
+
+def _anki_rows(lines, layout):
+    """Rows of an Anki notes export, reading its '#key:value' header lines into layout"""
+    for line in lines:
+        if line.startswith("#") and ":" in line:
+            key, _, value = line[1:].rstrip("\r\n").partition(":")
+            layout[key.strip().lower()] = value.strip()
+            continue
+        yield line
+
+
+def read_rows(source, fmt):
+    """
+    (line number, field dict) for every row of a file, or (line, None) for
+    rows without a word, pinyin and meaning. source is a text file object.
+    """
+    if fmt == "anki":
+        layout = {}
+        lines = _anki_rows(source, layout)
+        # Header lines come first; look at the first note to learn the layout
+        first = next(lines, None)
+        if first is None:
+            return
+        sep = {"tab": "\t", "comma": ",", "semicolon": ";", "pipe": "|", "space": " "}.get(
+            layout.get("separator", "tab").lower(), layout.get("separator", "\t"))
+        reader = csv.reader(_chain(first, lines), delimiter=sep)
+        strip = layout.get("html", "false").lower() == "true"
+        positions = _anki_positions(layout)
+    else:
+        reader = csv.reader(source, delimiter="\t" if fmt == "tsv" else ",")
+        strip = False
+        positions = None
+    anki = fmt == "anki"
+
+    for row in reader:
+        if not row or not any(row):
+            continue
+        if positions is None:
+            # CSV/TSV: a header row names the columns, otherwise they are positional
+            fields = [_HEADER.get(name.strip().lower()) for name in row]
+            if "word" in fields and "meaning" in fields:
+                positions = {f: i for i, f in enumerate(fields) if f is not None}
+                continue
+            positions = {f: i for i, f in enumerate(COLUMNS)}
+        yield reader.line_num, _fields(row, positions, anki, strip)
+
+
+def _chain(first, lines):
+    yield first
+    yield from lines
+
+
+def _anki_positions(layout):
+    """Field positions for an Anki export: word, pinyin, meaning, then its tag/deck columns"""
+    columns = layout.get("columns")
+    if columns:
+        names = [_HEADER.get(n.strip().lower()) for n in re.split(r"[\t,;|]", columns)]
+        positions = {f: i for i, f in enumerate(names) if f is not None}
+    else:
+        skip = {int(layout[k]) - 1 for k in ("guid column", "notetype column", "deck column", "tags column")
+                if layout.get(k, "").isdigit()}
+        data = (i for i in range(len(skip) + 3) if i not in skip)
+        positions = dict(zip(("word", "pinyin", "meaning"), data))
+    if layout.get("tags column", "").isdigit():
+        positions["category"] = int(layout["tags column"]) - 1
+    if layout.get("deck column", "").isdigit():
+        positions["deck"] = int(layout["deck column"]) - 1
+    return positions
+
+
+def _fields(row, positions, anki, strip):
+    fields = {}
+    for field, i in positions.items():
+        if i < len(row):
+            value = row[i]
+            if strip:
+                value = html.unescape(_TAG.sub(" ", value))
+            fields[field] = " ".join(value.split()) if strip else value.strip()
+    if not (fields.get("word") and fields.get("pinyin") and fields.get("meaning")):
+        return None
+    if anki:
+        # Anki: the first tag (underscores for spaces) or the innermost deck name
+        tags = fields.get("category", "").split()
+        deck = fields.pop("deck", "").split("::")[-1].strip()
+        fields["category"] = tags[0].replace("_", " ") if tags else deck
+    return fields
+
+
+class ImportResult:
+    """Counts for one import, filled in as it runs"""
+
+    def __init__(self):
+        self.rows = 0
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return dict(vars(self), rows_per_second=self.rows / self.seconds if self.seconds else 0.0)
+
+
+@timed("deckio.import")
+def import_rows(cards, rows, category=DEFAULT_CATEGORY, progress=None, now=None):
+    """
+    Merge rows from read_rows() into a list of cards in place. category is
+    given to new cards whose row has none. Returns an ImportResult;
+    progress(result) is called every PROGRESS_EVERY rows.
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    now_ts = int((now or datetime.now()).timestamp())
+    default_category = sys.intern(category)
+    # Card text is read once per card to build the index (deck-file cards decode lazily)
+    index = {(card['word'], card['pinyin']): card for card in cards}
+    seen = set()
+
+    for line, fields in rows:
+        result.rows += 1
+        if result.rows % PROGRESS_EVERY == 0 and progress:
+            result.seconds = time.perf_counter() - start
+            progress(result)
+        if fields is None:
+            result.skipped += 1
+            log.debug("Skipping line %d: needs a word, pinyin and meaning", line)
+            continue
+
+        key = (fields["word"], fields["pinyin"])
+        if key in seen:
+            result.duplicates += 1
+            continue
+        seen.add(key)
+        card = index.get(key)
+        if card is not None:
+            # Known card: new text, same scheduling state; it keeps its
+            # category unless the row names one
+            cat = fields.get("category") or card['category']
+            if card['meaning'] == fields["meaning"] and card['category'] == cat:
+                result.unchanged += 1
+            else:
+                card['meaning'] = fields["meaning"]
+                card['category'] = sys.intern(cat)
+                result.updated += 1
+            continue
+
+        cat = fields.get("category") or default_category
+        card = Card(fields["word"], fields["pinyin"], fields["meaning"], cat, _ease(fields.get("ease")))
+        review = fields.get("next_review")
+        if review:
+            card.next_review = review
+        else:
+            card.set_due(now_ts)
+        cards.append(card)
+        result.added += 1
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _ease(text):
+    try:
+        ease = int(text)
+    except (TypeError, ValueError):
+        return 2
+    return ease if 1 <= ease <= 5 else 2
+
+
+def import_file(deck_path, path, fmt=None, category=DEFAULT_CATEGORY, progress=None, dry_run=False):
+    """Import a word list into a deck file (JSON or .fcdeck); returns the ImportResult"""
+    cards = load_data(deck_path, [])
+    if not isinstance(cards, list):
+        cards = list(cards)
+    source = _Source(path)
+    try:
+        report = None
+        if progress:
+            report = lambda result: progress(result, source.position(), source.size)
+        result = import_rows(cards, read_rows(source.text, fmt or detect_format(path)), category, report)
+    finally:
+        source.close()
+    if not dry_run and (result.added or result.updated):
+        save_data(deck_path, cards)
+    return result
+
+
+@timed("deckio.export")
+def export_cards(cards, path, fmt=None, progress=None):
+    """Write cards as CSV, TSV or an Anki notes file; returns the number written"""
+    fmt = fmt or detect_format(path)
+    n = 0
+    start = time.perf_counter()
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == "anki":
+            f.write("#separator:tab\n#html:false\n#tags column:4\n")
+            writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        else:
+            writer = csv.writer(f, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+            writer.writerow(COLUMNS)
+        for card in cards:
+            if fmt == "anki":
+                writer.writerow((card['word'], card['pinyin'], card['meaning'], card['category'].replace(" ", "_")))
+            else:
+                ease = card.get('ease')
+                writer.writerow((card['word'], card['pinyin'], card['meaning'], card['category'],
+                                 "" if ease is None else ease, card.get('next_review', '')))
+            n += 1
+            if progress and n % PROGRESS_EVERY == 0:
+                progress(n, time.perf_counter() - start)
+    return n
+
+
+def _print_progress(result, position, size):
+    done = f" {position / size:4.0%}" if size else ""
+    print(f"\r{result.rows:>12,} rows{done}  {result.rows / result.seconds:>10,.0f} rows/s",
+          end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import or export decks as CSV, TSV or Anki text")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="merge a word list into the deck")
+    imp.add_argument("source")
+    imp.add_argument("--deck", default=default_deck(), help="deck file, JSON or .fcdeck (default: the app's deck)")
+    imp.add_argument("--format", choices=FORMATS, help="default: by file suffix (.csv, .tsv, .txt = anki)")
+    imp.add_argument("--category", default=DEFAULT_CATEGORY, help="for new cards whose row has none")
+    imp.add_argument("--dry-run", action="store_true", help="report what would change without saving")
+    exp = sub.add_parser("export", help="write the deck as a word list")
+    exp.add_argument("target")
+    exp.add_argument("--deck", default=default_deck(), help="deck file, JSON or .fcdeck (default: the app's deck)")
+    exp.add_argument("--format", choices=FORMATS, help="default: by file suffix (.csv, .tsv, .txt = anki)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        if not os.path.exists(args.source):
+            parser.error(f"no such file: {args.source}")
+        result = import_file(args.deck, args.source, args.format, args.category,
+                             progress=_print_progress, dry_run=args.dry_run)
+        if result.rows >= PROGRESS_EVERY:
+            print(file=sys.stderr)
+        r = result.as_dict()
+        print(f"{r['rows']:,} rows in {r['seconds']:.2f} s ({r['rows_per_second']:,.0f}/s): "
+              f"{r['added']:,} added, {r['updated']:,} updated, {r['unchanged']:,} unchanged, "
+              f"{r['duplicates']:,} repeated, {r['skipped']:,} skipped" + (" (dry run, nothing saved)" if args.dry_run else f" -> {args.deck}"))
+    else:
+        cards = load_data(args.deck, None)
+        if cards is None:
+            parser.error(f"could not read {args.deck}")
+        n = export_cards(cards, args.target, args.format)
+        print(f"Wrote {n:,} cards to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
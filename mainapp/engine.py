@@ -0,0 +1,273 @@
+"""
+GUI-free study engine: card scheduling, quiz generation and stats.
+
+    session = StudySession(cards, stats)
+    card = session.next_card("Family")
+    question = session.build_question(card)
+    session.prefetch("Family", after=card)          # while the student thinks
+    result = session.submit_answer(card, question["options"][0])
+    question = session.take_prefetched("Family")    # None if it went stale
+    session.get_stats("Family")
+
+FlashcardApp and quiz.py are views over a StudySession; batch jobs,
+servers and benchmarks can drive one directly without importing tkinter.
+"""
+import random
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from cards import Card
+from deck_index import ALL, CardIndex, DistractorIndex, SearchIndex
+from instrument import count, timed
+from journal import card_id
+from scheduler import ScheduleColumns, get_scheduler, numpy, reschedule
+from storage import default_stats
+from studystats import StudyStats
+
+
+class ReviewPace:
+    """Answers per minute over a sliding window (shorter while a session is young)"""
+
+    def __init__(self, window=60):
+        self.window = window
+        self._times = deque()
+        self._start = None
+
+    def tick(self, now):
+        if self._start is None:
+            self._start = now
+        self._times.append(now)
+        self._trim(now)
+
+    def _trim(self, now):
+        while self._times and self._times[0] <= now - self.window:
+            self._times.popleft()
+
+    def per_minute(self, now):
+        if self._start is None:
+            return 0.0
+        self._trim(now)
+        elapsed = min(self.window, now - self._start)
+        return len(self._times) / elapsed * 60 if elapsed >= 1 else 0.0
+
+
+class StudySession:
+    """One student's study session over a deck"""
+
+    def __init__(self, cards, stats=None, save_stats=None, save_cards=None, record_review=None, scheduler=None,
+                 distractors=None, make_index=CardIndex):
+        self.cards = cards if cards else []
+        self.stats = stats if stats else default_stats()
+        self.save_stats = save_stats
+        self.save_cards = save_cards    # save_cards(changed): the cards whose fields just changed
+        self.record_review = record_review
+        self.progress = StudyStats(self.stats)
+        self._prefetched = None
+        self._version = 0    # bumped whenever cards are added, edited or rescheduled in bulk
+        self.pace = ReviewPace()
+        # Built on first search (about two seconds per 100k cards), possibly from another thread
+        self._search = None
+        self._search_lock = threading.Lock()
+
+        # Indexes built once and kept current as cards change. Sessions over
+        # the same deck text (e.g. a server's students) can share distractors,
+        # and index only their own cards over a shared one (deck_index.OverlayIndex)
+        self.index = make_index(self.cards)
+        self.distractors = distractors if distractors is not None else DistractorIndex(self.cards)
+        if self.progress.needs_backfill():
+            self.progress.backfill(self.cards, card_id)
+
+        # Scheduling inputs by card position, built the first time the
+        # scheduler changes (with NumPy) and kept current after that
+        self._columns = None
+
+        # The algorithm the student last used, unless a different one is asked for
+        recorded = self.stats.get("scheduler") or {"name": "classic", "params": {}}
+        self.scheduler = get_scheduler(recorded["name"], recorded["params"])
+        if scheduler is not None and scheduler.config() != self.scheduler.config():
+            self.set_scheduler(scheduler)
+
+    @property
+    def categories(self):
+        return self.index.categories
+
+    @timed("engine.next_card")
+    def next_card(self, category=ALL, now=None):
+        """A random due card in the category (any card if none are due), or None"""
+        now = now.timestamp() if isinstance(now, datetime) else now
+        return self.index.next_card(category, now)
+
+    @timed("engine.build_question")
+    def build_question(self, card, prefer_category=False):
+        """
+        Multiple choice question for a card:
+        {"card", "prompt", "answer", "options"}, where options is None when
+        the deck is too small for three wrong answers.
+        """
+        answer = card['meaning']
+        wrong = self.distractors.sample(answer, 3, card['category'], prefer_category=prefer_category)
+        options = None
+        if len(wrong) >= 3:
+            options = [answer] + wrong[:3]
+            random.shuffle(options)
+        return {
+            "card": card,
+            "prompt": f"What does '{card['word']}' ({card['pinyin']}) mean?",
+            "answer": answer,
+            "options": options,
+        }
+
+    @timed("engine.prefetch")
+    def prefetch(self, category=ALL, after=None, prefer_category=False, now=None):
+        """
+        Pick and build the question to show after the current card (after,
+        which is skipped) while that card is still being answered. Answering
+        it cannot change which other cards are due, so the choice stays good;
+        take_prefetched() hands it over. Returns the question or None.
+        """
+        now = now.timestamp() if isinstance(now, datetime) else now
+        card = self.index.next_card(category, now, exclude=after)
+        if card is None:
+            self._prefetched = None
+            return None
+        question = self.build_question(card, prefer_category=prefer_category)
+        self._prefetched = (self._version, category, prefer_category, question)
+        return question
+
+    def take_prefetched(self, category=ALL, prefer_category=False):
+        """The prefetched question, or None if there is none or it no longer fits"""
+        prefetched, self._prefetched = self._prefetched, None
+        if prefetched is None:
+            return None
+        if prefetched[:3] != (self._version, category, prefer_category):
+            count("prefetch.stale")
+            return None
+        count("prefetch.hit")
+        return prefetched[3]
+
+    @timed("engine.submit_answer")
+    def submit_answer(self, card, choice, now=None):
+        """Grade an answer, update stats and reschedule the card"""
+        now = now or datetime.now()
+        is_correct = choice == card['meaning']
+        count("answers.correct" if is_correct else "answers.wrong")
+        self.pace.tick(now.timestamp())
+
+        # Update stats
+        counters = self.progress.record(card_id(card), card['word'], card['category'], is_correct,
+                                        now.isoformat(timespec='seconds'))
+
+        # Update spaced repetition
+        ease = self.scheduler.next_ease(card.get("ease", 2), is_correct)
+        days = self.scheduler.interval(ease, counters["streak"], counters["lapses"])
+
+        # Whole seconds, so compact cards hold it as a plain integer
+        next_review = (now + timedelta(days=days)).replace(microsecond=0)
+        card['ease'] = ease
+        card['next_review'] = next_review.isoformat()
+        self.index.reschedule(card, next_review.timestamp())
+        if self._columns is not None:
+            self._columns.record(card, ease, counters)
+
+        # Save data (one journal append when available, else full saves)
+        if self.record_review:
+            self.record_review(card, is_correct)
+        else:
+            if self.save_stats:
+                self.save_stats()
+            if self.save_cards:
+                self.save_cards([card])
+
+        return {"correct": is_correct, "answer": card['meaning'], "ease": ease, "next_review": card['next_review']}
+
+    @timed("engine.set_scheduler")
+    def set_scheduler(self, scheduler):
+        """
+        Switch algorithm or parameters and move every reviewed card to the
+        due time the new scheduler would have given it. Returns the number of
+        cards rescheduled.
+        """
+        self.scheduler = scheduler
+        self.stats["scheduler"] = scheduler.config()
+        np = numpy()
+        if np is None:
+            changed = reschedule(self.cards, self.stats["cards"], scheduler, card_id)
+        else:
+            # Cards appended to self.cards directly (the server's copies of shared cards) have no row
+            if self._columns is None or len(self._columns) != len(self.cards):
+                self._columns = ScheduleColumns(np, self.cards, self.stats["cards"], card_id)
+            changed = self._columns.reschedule(self.cards, scheduler)
+        self.index.reschedule_all()
+        self._version += 1
+        # Not journaled, so write full snapshots. No card is listed as changed:
+        # from here on they only change through reviews, which are journaled
+        if self.save_cards:
+            self.save_cards(())
+        if self.save_stats:
+            self.save_stats()
+        return changed
+
+    def get_stats(self, category=ALL):
+        """Accuracy, learned words, lapses and card/due counts for a category or "All" """
+        stats = self.progress.summary(category)
+        stats.update(category=category, cards=self.index.count(category), due=self.index.due_count(category))
+        return stats
+
+    def search_index(self):
+        """The word/pinyin/meaning search index, built the first time it is needed"""
+        with self._search_lock:
+            if self._search is None:
+                self._search = SearchIndex(self.cards)
+            return self._search
+
+    @timed("engine.search")
+    def search(self, query, limit=20, category=ALL):
+        """
+        Cards matching a hanzi, pinyin (tone marks optional) or meaning
+        query, best matches first; see deck_index.SearchIndex.
+        """
+        return self.search_index().search(query, limit, category)
+
+    def reviews_per_minute(self, now=None):
+        """How fast answers have been coming in over the last minute"""
+        now = now or datetime.now()
+        return self.pace.per_minute(now.timestamp())
+
+    def card_stats(self, card):
+        """Attempts, lapses, streak and last_seen for a card (None if never answered)"""
+        return self.progress.card(card_id(card))
+
+    def add_card(self, card):
+        """Add a new card (a Card or a flashcards.json entry) to the deck and every index; returns the Card"""
+        if not isinstance(card, Card):
+            card = Card.from_dict(card)
+        # Under the lock, so a search index being built sees the card exactly once
+        with self._search_lock:
+            self.cards.append(card)
+            if self._search is not None:
+                self._search.add(card)
+        self.index.add(card)
+        self.distractors.add(card)
+        if self._columns is not None:
+            self._columns.add(card)
+        self._version += 1
+        if self.save_cards:
+            self.save_cards([card])
+        return card
+
+    def edit_card(self, card, **fields):
+        """Edit an existing card, keeping the indexes in step"""
+        with self._search_lock:
+            if self._search is not None:
+                self._search.remove(card)
+            self.distractors.remove(card)
+            self.index.update(card, **fields)
+            self.distractors.add(card)
+            if self._search is not None:
+                self._search.add(card)
+        if self._columns is not None:
+            self._columns.edit(card)
+        self._version += 1
+        if self.save_cards:
+            self.save_cards([card])
@@ -1,31 +1,112 @@
-import tkinter as tk, json, os, sys
+import tkinter as tk, os, sys, atexit, json, time, shutil
+import instrument
 from ui import FlashcardApp
+from scheduler import get_scheduler
+from storage import JsonStorage, SqliteStorage, load_data, save_json
 
 def resource_path(rel):
     try: return os.path.join(sys._MEIPASS, rel)
     except: return os.path.join(os.path.abspath("."), rel)
 
-CARDS_FILE = resource_path("mainapp/flashcards.json")
-STATS_FILE = resource_path("mainapp/stats.json")
+def user_data_dir():
+    """Writable per-user folder for progress (FLASHCARDS_DATA_DIR overrides)"""
+    if os.environ.get("FLASHCARDS_DATA_DIR"):
+        return os.environ["FLASHCARDS_DATA_DIR"]
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "MandarinFlashcards")
 
-def load_json(path, default):
-    if os.path.exists(path):
-        try:
-            return json.load(open(path, encoding='utf-8'))
-        except:
-            pass
-    return default
+def bundled_path(name):
+    return resource_path(os.path.join("mainapp", name))
 
-def save_json(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+def progress_path(name):
+    """
+    Where a progress file is read and written. From source this is mainapp/
+    as before; in a frozen build the bundle is read-only (and a one-file
+    build's copy is deleted on exit), so progress lives in the user data
+    directory, starting from the bundled file's contents if there is one.
+    """
+    if not USER_DIR:
+        return bundled_path(name)
+    os.makedirs(USER_DIR, exist_ok=True)
+    path = os.path.join(USER_DIR, name)
+    if not os.path.exists(path) and os.path.exists(bundled_path(name)):
+        shutil.copyfile(bundled_path(name), path)
+    return path
 
-cards = load_json(CARDS_FILE, [])
-stats = load_json(STATS_FILE, {"correct":0,"total":0,"learned":[],"per_category":{}})
+def migrate_copied_deck(storage):
+    """
+    Earlier builds copied the whole deck into the user directory and kept
+    scheduling in it; turn such a copy into the changes file, once (the copy
+    is left where it is, unused, as a backup).
+    """
+    for name in ("flashcards.fcdeck", "flashcards.json"):
+        old = os.path.join(USER_DIR, name)
+        if os.path.exists(old) and not os.path.exists(storage.cards_path):
+            save_json(storage.cards_path, storage.changes(load_data(old, [])))
+
+USER_DIR = user_data_dir() if getattr(sys, "frozen", False) or os.environ.get("FLASHCARDS_DATA_DIR") else None
+
+# A binary deck (see deckfile.py) opens without parsing every card. An
+# installed app reads it from the bundle, so a new release's deck takes
+# effect, and saves only the user's changes to it (see storage.JsonStorage)
+DECK_FILE = bundled_path("flashcards.fcdeck")
+if not os.path.exists(DECK_FILE):
+    DECK_FILE = bundled_path("flashcards.json")
+CARDS_FILE = progress_path("card_changes.json") if USER_DIR else DECK_FILE
+STATS_FILE = progress_path("stats.json")
+JOURNAL_FILE = progress_path("reviews.jsonl")
+
+# Seconds to let answers pile up before the background writer saves
+SAVE_DELAY = float(os.environ.get("FLASHCARDS_SAVE_DELAY", "2.0"))
+
+# Optional SQLite database (see storage.py) and the student profile to use
+DB_FILE = os.environ.get("FLASHCARDS_DB")
+PROFILE = os.environ.get("FLASHCARDS_PROFILE", "default")
+
+# Switch the student to another scheduling algorithm (see scheduler.py);
+# unset keeps whichever one their stats.json last used
+SCHEDULER = os.environ.get("FLASHCARDS_SCHEDULER")
+
+# Start in keyboard rapid-review mode, and how long (ms, 0 for none) it shows right/wrong
+RAPID = os.environ.get("FLASHCARDS_RAPID", "") not in ("", "0")
+FEEDBACK_MS = int(os.environ.get("FLASHCARDS_FEEDBACK_MS", "300"))
+
+def open_storage():
+    """SQLite when FLASHCARDS_DB is set, otherwise the JSON files"""
+    if DB_FILE:
+        return SqliteStorage(DB_FILE, PROFILE)
+    if not USER_DIR:
+        return JsonStorage(CARDS_FILE, STATS_FILE, JOURNAL_FILE, save_delay=SAVE_DELAY)
+    storage = JsonStorage(CARDS_FILE, STATS_FILE, JOURNAL_FILE, save_delay=SAVE_DELAY, deck_path=DECK_FILE)
+    migrate_copied_deck(storage)
+    return storage
+
+storage = open_storage()
+cards, stats = storage.load()
 
 if __name__=="__main__":
+    instrument.configure()
+    atexit.register(storage.close)
     root = tk.Tk()
-    FlashcardApp(root, cards, stats, lambda: save_json(STATS_FILE,stats), lambda: save_json(CARDS_FILE,cards))
+    FlashcardApp(root, cards, stats, lambda: storage.save_stats(stats), lambda changed: storage.save_cards(cards, changed),
+                 record_review=storage.record_review, scheduler=get_scheduler(SCHEDULER) if SCHEDULER else None,
+                 rapid=RAPID, rapid_feedback_ms=FEEDBACK_MS)
+    
+    probe = os.environ.get("FLASHCARDS_STARTUP_PROBE")
+    if probe:
+        # Startup benchmark: record when the first card is on screen, then quit
+        def first_card_shown():
+            root.update()
+            heavy = [m for m in ("pygame", "gtts", "quiz", "speak", "sqlite3") if m in sys.modules]
+            with open(probe, 'w', encoding='utf-8') as f:
+                json.dump({"shown_at": time.time(), "loaded": heavy}, f)
+            root.destroy()
+        root.after_idle(first_card_shown)
     root.mainloop()
 
 
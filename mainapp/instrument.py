@@ -0,0 +1,153 @@
+"""
+Logging setup and lightweight timing spans.
+
+Logging goes through the standard logging module (FLASHCARDS_LOG_LEVEL,
+default WARNING, so the per-question debug lines cost nothing). Timing is
+off unless FLASHCARDS_METRICS names a JSON file: then every span records a
+latency histogram and the file is written at exit (or on export()),
+together with any gauges modules have registered (e.g. the audio cache).
+
+    @timed("load_next")
+    def load_next(self): ...
+
+    with span("save_json"):
+        ...
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+_enabled = False
+_path = None
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}        # name -> function returning a dict of current values
+
+
+def configure_logging(level=None):
+    """Set up console logging from FLASHCARDS_LOG_LEVEL (or an explicit level)"""
+    level = level or os.environ.get("FLASHCARDS_LOG_LEVEL", "WARNING")
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.WARNING),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def enable_metrics(path=None):
+    """Start recording spans and counters; written to path at exit if given"""
+    global _enabled, _path
+    _enabled = True
+    if path and _path is None:
+        atexit.register(export)
+    _path = path or _path
+
+
+def configure():
+    """Logging plus metrics from the environment; call once at startup"""
+    configure_logging()
+    if os.environ.get("FLASHCARDS_METRICS"):
+        enable_metrics(os.environ["FLASHCARDS_METRICS"])
+
+
+def enabled():
+    return _enabled
+
+
+def count(name, n=1):
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name, read):
+    """Report read()'s current values under name in every snapshot"""
+    with _lock:
+        _gauges[name] = read
+
+
+def observe(name, seconds):
+    """Record one duration for a span"""
+    ms = seconds * 1000
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = {"count": 0, "sum_ms": 0.0, "max_ms": 0.0,
+                                     "buckets": [0] * (len(BUCKETS_MS) + 1)}
+        h["count"] += 1
+        h["sum_ms"] += ms
+        h["max_ms"] = max(h["max_ms"], ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                h["buckets"][i] += 1
+                break
+        else:
+            h["buckets"][-1] += 1
+
+
+@contextmanager
+def span(name):
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of span(); a single flag check when metrics are off"""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return inner
+    return wrap
+
+
+def snapshot():
+    """Counters, histograms and gauges as plain data"""
+    with _lock:
+        gauges = dict(_gauges)
+    gauges = {name: read() for name, read in gauges.items()}
+    with _lock:
+        return {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "buckets_ms": BUCKETS_MS + ["inf"],
+            "counters": dict(_counters),
+            "spans": {name: dict(h, buckets=list(h["buckets"]),
+                                 mean_ms=h["sum_ms"] / h["count"] if h["count"] else 0.0)
+                      for name, h in _histograms.items()},
+            "gauges": gauges,
+        }
+
+
+def export(path=None):
+    """Write the metrics snapshot as JSON"""
+    path = path or _path
+    if not path:
+        return
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot(), f, indent=2)
+    except OSError as e:
+        log.warning("Could not write metrics to %s: %s", path, e)
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """
+    Background writer for the JSON files.
+    mark_dirty() only records that a file needs saving; a worker thread waits
+    for the coalescing window to pass and then writes each dirty file once,
+    so repeated saves within the window cost a single write.
+    """
+
+    def __init__(self, write, delay=2.0):
+        self.write = write          # write(path, data), e.g. flashcards.save_json
+        self.delay = delay
+        self._dirty = {}            # path -> data
+        self._cond = threading.Condition()
+        self.io_lock = threading.Lock()   # held while writing; shared with journal compaction
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, path, data):
+        """Queue data to be written to path (never blocks on disk); data must not change afterwards"""
+        with self._cond:
+            self._dirty[path] = data
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Let more changes pile up before writing
+                deadline = time.monotonic() + self.delay
+                while not self._closed and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+            self.flush()
+
+    def flush(self):
+        """Write everything pending now and wait for it to land"""
+        with self.io_lock:
+            with self._cond:
+                batch, self._dirty = self._dirty, {}
+            for path, data in batch.items():
+                try:
+                    self.write(path, data)
+                except Exception as e:
+                    log.error("Save error (%s): %s", path, e)
+
+    def close(self):
+        """Flush pending writes and stop the worker"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,103 @@
+"""
+Pre-render pronunciation audio for every word in a deck into one audio pack.
+
+    python mainapp/prerender.py mainapp/flashcards.json -o mainapp/audio.fcpack
+    python mainapp/prerender.py deck.json -o deck.fcpack --engine pyttsx3 --workers 8
+    python mainapp/prerender.py mainapp/flashcards.fcdeck -o mainapp/audio.fcpack
+
+speak.py plays straight from mainapp/audio.fcpack (or any pack listed in
+FLASHCARDS_AUDIO_PACKS), so classrooms without network still get audio.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import tts
+from audiopack import AudioPack, PackWriter
+from storage import load_data
+
+
+def _render(job):
+    """Synthesise one word in a worker process: returns (key, data, format, error)"""
+    text, lang, voice, engine_name = job
+    key = tts.clip_key(text, lang, voice)
+    fd, path = tempfile.mkstemp(suffix=".clip")
+    os.close(fd)
+    try:
+        fmt = tts.get_engine(engine_name)(text, lang, voice, path)
+        with open(path, 'rb') as f:
+            return key, f.read(), fmt, None
+    except Exception as e:
+        return key, None, None, f"{text}: {e}"
+    finally:
+        os.remove(path)
+
+
+def prerender(deck_path, out_path, engine="gtts", lang="zh", voice=None, workers=None, reuse=None):
+    """Render every unique word in the deck into out_path; returns a summary dict"""
+    words = list(dict.fromkeys(card['word'] for card in load_data(deck_path, [])))
+
+    # Clips already in an earlier pack are copied instead of re-rendered
+    old = AudioPack(reuse) if reuse and os.path.exists(reuse) else None
+    jobs, copied, failed = [], 0, []
+    start = time.perf_counter()
+
+    with PackWriter(out_path) as pack:
+        for word in words:
+            clip = old.get(tts.clip_key(word, lang, voice)) if old else None
+            if clip is not None:
+                pack.add(tts.clip_key(word, lang, voice), clip[0], clip[1])
+                copied += 1
+            else:
+                jobs.append((word, lang, voice, engine))
+
+        done = 0
+        step = max(1, len(jobs) // 10)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for key, data, fmt, error in pool.map(_render, jobs, chunksize=max(1, len(jobs) // 256)):
+                done += 1
+                if error:
+                    failed.append(error)
+                else:
+                    pack.add(key, data, fmt)
+                if done % step == 0 or done == len(jobs):
+                    rate = done / (time.perf_counter() - start)
+                    print(f"  {done}/{len(jobs)} rendered ({rate:.1f} words/s)")
+
+    if old:
+        old.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "words": len(words),
+        "rendered": len(jobs) - len(failed),
+        "copied": copied,
+        "failed": failed,
+        "seconds": elapsed,
+        "bytes": os.path.getsize(out_path),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render deck audio into an audio pack")
+    parser.add_argument("deck", help="deck (flashcards.json format or a .fcdeck file)")
+    parser.add_argument("-o", "--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio.fcpack"))
+    parser.add_argument("--engine", default=tts.DEFAULT_ENGINE, choices=sorted(tts.ENGINES))
+    parser.add_argument("--lang", default="zh")
+    parser.add_argument("--voice", help="gTTS tld or pyttsx3 voice id (default: the engine's own)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--reuse", help="existing pack to copy unchanged clips from")
+    args = parser.parse_args(argv)
+
+    summary = prerender(args.deck, args.output, args.engine, args.lang, args.voice, args.workers, args.reuse)
+    print(f"Wrote {args.output}: {summary['rendered']} rendered, {summary['copied']} copied, "
+          f"{len(summary['failed'])} failed, {summary['bytes'] / 1024:.0f} KB in {summary['seconds']:.1f}s")
+    for error in summary["failed"][:10]:
+        print(f"  failed: {error}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,111 +1,59 @@
-import random
+import logging
 import tkinter as tk
-from tkinter import ttk
 
-def run_quiz(app, card, callback):
+from instrument import timed
+
+log = logging.getLogger(__name__)
+
+CHOICE_STYLE = {
+    'font': ('Helvetica', 11),
+    'bg': '#e3f2fd',
+    'fg': '#1976d2',
+    'activebackground': '#bbdefb',
+    'relief': 'raised',
+    'bd': 2,
+    'padx': 10,
+    'pady': 8,
+    'cursor': 'hand2'
+}
+
+class QuizView:
     """
-    Generate a multiple choice quiz for a flashcard
-    Robust error handling for offline use
+    The quiz widgets for one app, created once and reconfigured per question.
+    Choice buttons are referenced directly by position, so answering never
+    has to search the frame's children or compare button text.
     """
-    try:
-        # Clear previous widgets
-        for widget in app.choices_frame.winfo_children():
-            widget.destroy()
-        
-        # Debug: Print the card data to understand structure
-        print(f"DEBUG: Card data = {card}")
-        
-        # Set question with better formatting
-        question_text = f"What does '{card['word']}' ({card['pinyin']}) mean?"
-        app.question.config(text=question_text)
-        
-        # Get correct answer
-        correct_answer = card['meaning']
-        print(f"DEBUG: Correct answer = '{correct_answer}'")
-        
-        # Check if we have enough cards for multiple choice
-        available_cards = [c for c in app.cards if c['meaning'] != correct_answer]
-        print(f"DEBUG: Available cards for wrong answers: {len(available_cards)}")
-        
-        if len(available_cards) < 3:
-            # Not enough cards for multiple choice - show direct answer
-            print("DEBUG: Not enough cards, showing direct answer")
-            _show_direct_answer(app, card, callback)
-            return
-        
-        # Generate wrong answers - improved logic
-        wrong_answers = []
-        shuffled_cards = available_cards.copy()
-        random.shuffle(shuffled_cards)
-        
-        # Take first 3 unique meanings
-        for wrong_card in shuffled_cards:
-            if wrong_card['meaning'] not in wrong_answers and wrong_card['meaning'] != correct_answer:
-                wrong_answers.append(wrong_card['meaning'])
-                if len(wrong_answers) >= 3:
-                    break
-        
-        print(f"DEBUG: Wrong answers = {wrong_answers}")
-        
-        # Fallback if we still don't have enough wrong answers
-        if len(wrong_answers) < 3:
-            print("DEBUG: Still not enough wrong answers, showing direct answer")
-            _show_direct_answer(app, card, callback)
-            return
-        
-        # Create options list with exactly 4 choices
-        options = [correct_answer] + wrong_answers[:3]  # Ensure exactly 3 wrong answers
-        random.shuffle(options)
-        
-        # Debug print
-        print(f"Quiz for: {card['word']} ({card['pinyin']})")
-        print(f"Correct answer: '{correct_answer}'")
-        print(f"All options: {options}")
-        print(f"Correct answer in options: {correct_answer in options}")
-        
-        # Verify correct answer is in options (safety check)
-        if correct_answer not in options:
-            print("ERROR: Correct answer not in options! Fixing...")
-            options[0] = correct_answer
-            random.shuffle(options)
-        
-        # Create choice buttons with better styling
-        button_style = {
-            'font': ('Helvetica', 11),
-            'bg': '#e3f2fd',
-            'fg': '#1976d2',
-            'activebackground': '#bbdefb',
-            'relief': 'raised',
-            'bd': 2,
-            'padx': 10,
-            'pady': 8,
-            'cursor': 'hand2'
-        }
+    
+    def __init__(self, app):
+        self.app = app
+        self.frame = app.choices_frame
+        self.card = None
+        self.callback = None
+        self.options = []
+        self.correct = None     # index of the right option
+        self.answered = False
         
         # Create buttons in a 2x2 grid
-        for i, option in enumerate(options):
-            row = i // 2
-            col = i % 2
-            
+        self.choice_buttons = []
+        for i in range(4):
             btn = tk.Button(
-                app.choices_frame,
-                text=option,
-                command=lambda opt=option: _handle_answer(app, opt, card, callback),
+                self.frame,
+                command=lambda i=i: self.choose(i),
                 wraplength=200,  # Wrap long text
                 justify='center',
-                **button_style
+                **CHOICE_STYLE
             )
-            btn.grid(row=row, column=col, padx=5, pady=5, sticky='ew')
+            self.choice_buttons.append(btn)
         
         # Configure grid weights for responsive layout
-        app.choices_frame.grid_columnconfigure(0, weight=1)
-        app.choices_frame.grid_columnconfigure(1, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(1, weight=1)
         
         # Add a "Show Answer" button for learning
-        show_answer_btn = tk.Button(
-            app.choices_frame,
+        self.show_answer_btn = tk.Button(
+            self.frame,
             text="💡 Show Answer",
-            command=lambda: _show_correct_answer(app, correct_answer),
+            command=self.show_correct_answer,
             font=('Helvetica', 10),
             bg='#fff3e0',
             fg='#f57c00',
@@ -115,19 +63,104 @@ def run_quiz(app, card, callback):
             pady=5,
             cursor='hand2'
         )
-        show_answer_btn.grid(row=2, column=0, columnspan=2, pady=10)
         
+        # Panel for the direct-answer and error messages
+        self.panel = tk.Frame(self.frame, bg='#f0f8ff')
+    
+    def alive(self):
+        return self.panel.winfo_exists()
+    
+    def show_choices(self, card, options, callback):
+        """Reconfigure the pooled buttons for a new question"""
+        self.card = card
+        self.callback = callback
+        self.options = options
+        self.correct = options.index(card['meaning'])
+        self.answered = False
+        self.panel.grid_remove()
+        
+        for i, (btn, option) in enumerate(zip(self.choice_buttons, options)):
+            btn.config(text=option, state='normal', bg=CHOICE_STYLE['bg'], fg=CHOICE_STYLE['fg'])
+            btn.grid(row=i // 2, column=i % 2, padx=5, pady=5, sticky='ew')
+        self.show_answer_btn.grid(row=2, column=0, columnspan=2, pady=10)
+    
+    def show_panel(self):
+        """Hide the choices and return an empty message panel"""
+        self.answered = True    # nothing for the number keys to choose
+        for btn in self.choice_buttons:
+            btn.grid_remove()
+        self.show_answer_btn.grid_remove()
+        for widget in self.panel.winfo_children():
+            widget.destroy()
+        self.panel.grid(row=0, column=0, columnspan=2, sticky='ew')
+        return self.panel
+    
+    def choose(self, index):
+        """Answer with the option at index (0-3), from a click or a number key"""
+        if self.answered or index >= len(self.options):
+            return
+        self.answered = True
+        _handle_answer(self, index, self.card, self.callback)
+    
+    def show_correct_answer(self):
+        """Highlight the correct answer"""
+        if self.correct is not None:
+            self.choice_buttons[self.correct].config(bg='#4caf50', fg='white')
+
+def _get_view(app):
+    """The app's quiz view, (re)built if missing or destroyed by a fallback"""
+    view = getattr(app, 'quiz_view', None)
+    if view is None or not view.alive():
+        for widget in app.choices_frame.winfo_children():
+            widget.destroy()
+        view = app.quiz_view = QuizView(app)
+    return view
+
+@timed("run_quiz")
+def run_quiz(app, card, callback, question=None):
+    """
+    Generate a multiple choice quiz for a flashcard (or show a prefetched one)
+    Robust error handling for offline use
+    """
+    view = None
+    try:
+        view = _get_view(app)
+        
+        log.debug("Card data = %s", card)
+        
+        # The engine builds the question; this view only draws it
+        if question is None:
+            question = app.session.build_question(card, prefer_category=app.harder_quiz.get())
+        app.question.config(text=question['prompt'])
+        
+        correct_answer = question['answer']
+        options = question['options']
+        log.debug("Correct answer = %r", correct_answer)
+        
+        if options is None:
+            # Not enough cards for multiple choice - show direct answer
+            log.debug("Not enough cards, showing direct answer")
+            _show_direct_answer(view, card, callback)
+            return
+        
+        log.debug("Quiz for %s (%s), options %s", card['word'], card['pinyin'], options)
+        
+        view.show_choices(card, options, callback)
+    
     except Exception as e:
-        print(f"Quiz generation error: {e}")
-        import traceback
-        traceback.print_exc()
-        _show_error_fallback(app, card, callback)
+        log.exception("Quiz generation error: %s", e)
+        if view is None:
+            raise
+        _show_error_fallback(view, card, callback)
 
-def _show_direct_answer(app, card, callback):
+def _show_direct_answer(view, card, callback):
     """Show answer directly when not enough cards for multiple choice"""
+    panel = view.show_panel()
+    view.correct = None
+    
     # Create info label
     info_label = tk.Label(
-        app.choices_frame,
+        panel,
         text=f"'{card['word']}' ({card['pinyin']}) means:",
         font=('Helvetica', 12),
         bg='#f0f0f0',
@@ -136,7 +169,7 @@ def _show_direct_answer(app, card, callback):
     info_label.pack(pady=10)
     
     # Create answer display
-    answer_frame = tk.Frame(app.choices_frame, bg='#e8f5e8', relief='raised', bd=2)
+    answer_frame = tk.Frame(panel, bg='#e8f5e8', relief='raised', bd=2)
     answer_frame.pack(pady=10, padx=20, fill='x')
     
     answer_label = tk.Label(
@@ -151,7 +184,7 @@ def _show_direct_answer(app, card, callback):
     
     # Continue button
     continue_btn = tk.Button(
-        app.choices_frame,
+        panel,
         text="✅ Continue",
         command=lambda: callback(card['meaning'], card),
         font=('Helvetica', 12),
@@ -165,50 +198,37 @@ def _show_direct_answer(app, card, callback):
     )
     continue_btn.pack(pady=10)
 
-def _handle_answer(app, selected_option, card, callback):
-    """Handle quiz answer selection"""
+def _handle_answer(view, index, card, callback):
+    """Handle quiz answer selection (index is the chosen option's position)"""
+    selected_option = view.options[index]
     try:
         # Disable all buttons to prevent multiple clicks
-        for widget in app.choices_frame.winfo_children():
-            if isinstance(widget, tk.Button) and "Show Answer" not in widget.cget('text'):
-                widget.config(state='disabled')
+        for btn in view.choice_buttons:
+            btn.config(state='disabled')
         
         # Visual feedback
-        correct_answer = card['meaning']
-        is_correct = selected_option == correct_answer
+        is_correct = index == view.correct
         
-        print(f"Selected: {selected_option}")
-        print(f"Correct: {correct_answer}")
-        print(f"Is correct: {is_correct}")
+        log.debug("Selected %r, correct %r, is correct: %s", selected_option, card['meaning'], is_correct)
         
         # Update button colors
-        for widget in app.choices_frame.winfo_children():
-            if isinstance(widget, tk.Button) and "Show Answer" not in widget.cget('text'):
-                button_text = widget.cget('text')
-                if button_text == correct_answer:
-                    widget.config(bg='#4caf50', fg='white')  # Green for correct
-                elif button_text == selected_option and not is_correct:
-                    widget.config(bg='#f44336', fg='white')  # Red for wrong selection
-        
-        # Small delay before proceeding
-        app.root.after(1500, lambda: callback(selected_option, card))
+        view.choice_buttons[view.correct].config(bg='#4caf50', fg='white')  # Green for correct
+        if not is_correct:
+            view.choice_buttons[index].config(bg='#f44336', fg='white')  # Red for wrong selection
         
+        # Leave the colours up for the app's feedback delay (rapid review may make it 0)
+        view.app.after_feedback(lambda: callback(selected_option, card))
+    
     except Exception as e:
-        print(f"Answer handling error: {e}")
+        log.exception("Answer handling error: %s", e)
         callback(selected_option, card)
 
-def _show_correct_answer(app, correct_answer):
-    """Highlight the correct answer"""
-    for widget in app.choices_frame.winfo_children():
-        if isinstance(widget, tk.Button) and widget.cget('text') == correct_answer:
-            widget.config(bg='#4caf50', fg='white')
-            # Don't modify the text to avoid confusion
-            break
-
-def _show_error_fallback(app, card, callback):
+def _show_error_fallback(view, card, callback):
     """Show error message and continue button"""
+    panel = view.show_panel()
+    
     error_label = tk.Label(
-        app.choices_frame,
+        panel,
         text=f"Quiz Error!\n{card['word']} ({card['pinyin']}) = {card['meaning']}",
         font=('Helvetica', 12),
         bg='#ffebee',
@@ -219,7 +239,7 @@ def _show_error_fallback(app, card, callback):
     error_label.pack(pady=20)
     
     continue_btn = tk.Button(
-        app.choices_frame,
+        panel,
         text="Continue",
         command=lambda: callback(card['meaning'], card),
         font=('Helvetica', 12),
@@ -229,4 +249,3 @@ def _show_error_fallback(app, card, callback):
         pady=8
     )
     continue_btn.pack(pady=10)
-    
\ No newline at end of file
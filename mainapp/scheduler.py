@@ -0,0 +1,281 @@
+"""
+Spaced-repetition schedulers.
+
+A scheduler turns an answer into a new ease level and an interval in days:
+
+    ease = scheduler.next_ease(card.get("ease", 2), correct)
+    days = scheduler.interval(ease, streak, lapses)
+
+ease is the 1..5 level already stored on every card; streak and lapses are
+the per-card counters from studystats. Nothing else is stored, so any
+scheduler can take over an existing deck, and reschedule() recomputes every
+reviewed card's due time in one vectorised pass when the algorithm or its
+parameters change. NumPy is used for that pass when it is installed; the
+interval formulas are written so the same code runs on arrays or numbers.
+
+    FLASHCARDS_SCHEDULER=sm2 FLASHCARDS_SCHEDULER_PARAMS='{"max_days": 365}' python mainapp/flashcards.py
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from itertools import compress
+from operator import itemgetter
+
+from cards import set_dues
+
+DAY = 86400
+_EPOCH = datetime(1970, 1, 1)
+
+
+class _Scalar:
+    """The NumPy functions the interval formulas use, for plain numbers"""
+
+    @staticmethod
+    def where(cond, a, b):
+        return a if cond else b
+
+    @staticmethod
+    def clip(x, lo, hi):
+        return min(max(x, lo), hi)
+
+    maximum = staticmethod(max)
+
+
+class Scheduler:
+    """Base class: classic ease +/- 1 updates, subclasses supply interval()"""
+
+    name = None
+    defaults = {"max_days": 3650}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown {self.name} parameters: {', '.join(sorted(unknown))}")
+        self.params = dict(self.defaults, **params)
+
+    def config(self):
+        """What stats.json records, so a change of algorithm or parameters can be detected"""
+        return {"name": self.name, "params": self.params}
+
+    def next_ease(self, ease, correct):
+        return min(ease + 1, 5) if correct else max(ease - 1, 1)
+
+    def interval(self, ease, streak, lapses, xp=_Scalar):
+        """Days until the next review; streak and lapses are counted after this answer"""
+        raise NotImplementedError
+
+
+class ClassicScheduler(Scheduler):
+    """The original rule: days = ease ** 2"""
+
+    name = "classic"
+
+    def interval(self, ease, streak, lapses, xp=_Scalar):
+        return xp.clip(ease ** 2, 1, self.params["max_days"])
+
+
+class SM2Scheduler(Scheduler):
+    """
+    SuperMemo 2 with right/wrong grades. ease 1..5 stands for easiness
+    factors min_ef..max_ef (ease 5 is SM-2's starting factor of 2.5). A right
+    answer counts as quality 4, which leaves the factor alone; a wrong one
+    lowers it a step and starts the repetitions again.
+    """
+
+    name = "sm2"
+    defaults = dict(Scheduler.defaults, min_ef=1.3, max_ef=2.5, first_days=1, second_days=6)
+
+    def next_ease(self, ease, correct):
+        return ease if correct else max(ease - 1, 1)
+
+    def interval(self, ease, streak, lapses, xp=_Scalar):
+        p = self.params
+        ef = p["min_ef"] + (ease - 1) * (p["max_ef"] - p["min_ef"]) / 4
+        days = xp.where(streak <= 1, p["first_days"],
+                        p["second_days"] * ef ** xp.maximum(streak - 2, 0))
+        return xp.clip(days, 1, p["max_days"])
+
+
+class FSRSScheduler(Scheduler):
+    """
+    FSRS-style memory model. Difficulty comes from the ease level, stability
+    grows with every correct review in a row (faster for easier cards) and is
+    cut back by each lapse. The interval is chosen so recall probability is
+    still `retention` when the card comes up: 9 * S * (1 / retention - 1).
+    """
+
+    name = "fsrs"
+    defaults = dict(Scheduler.defaults, retention=0.9, initial_stability=1.0, growth=2.0, lapse_factor=0.5)
+
+    def interval(self, ease, streak, lapses, xp=_Scalar):
+        p = self.params
+        difficulty = xp.clip(11 - 2 * ease, 1, 10)
+        stability = (p["initial_stability"]
+                     * (1 + p["growth"] * (11 - difficulty) / 10) ** xp.maximum(streak - 1, 0)
+                     * p["lapse_factor"] ** lapses)
+        days = 9 * stability * (1 / p["retention"] - 1)
+        return xp.clip(days, 1, p["max_days"])
+
+
+SCHEDULERS = {
+    "classic": ClassicScheduler,
+    "sm2": SM2Scheduler,
+    "fsrs": FSRSScheduler,
+}
+
+DEFAULT_SCHEDULER = os.environ.get("FLASHCARDS_SCHEDULER", "classic")
+
+
+def get_scheduler(name=None, params=None):
+    """A scheduler by name (FLASHCARDS_SCHEDULER by default) with optional parameters"""
+    name = name or DEFAULT_SCHEDULER
+    if params is None and name == DEFAULT_SCHEDULER and os.environ.get("FLASHCARDS_SCHEDULER_PARAMS"):
+        params = json.loads(os.environ["FLASHCARDS_SCHEDULER_PARAMS"])
+    try:
+        cls = SCHEDULERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown scheduler '{name}' (choose from {', '.join(SCHEDULERS)})")
+    return cls(**(params or {}))
+
+
+def _utc_offset(wall):
+    """Seconds east of UTC of local time at a wall-clock time given as if it were UTC epoch seconds"""
+    return wall - int((_EPOCH + timedelta(seconds=wall)).timestamp())
+
+
+def numpy():
+    """The numpy module, or None when it is not installed"""
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np
+
+
+def _local_seconds(np, seen):
+    """Epoch seconds (int64 array) of local-time ISO strings"""
+    # NumPy parses them as UTC: shift each by the UTC offset in force at that
+    # time (it differs across DST changes), looked up once per clock hour
+    wall = np.array(seen, dtype="datetime64[s]").astype(np.int64)
+    hours, where = np.unique(wall // 3600, return_inverse=True)
+    offsets = np.array([_utc_offset(int(h) * 3600) for h in hours], dtype=np.int64)
+    return wall - offsets[where.reshape(wall.shape)]
+
+
+def _answered_columns(np, cards, counters, key):
+    """
+    Positions of the answered cards and their ease, streak, lapses and
+    last_seen (epoch seconds) as arrays: a million cards are a few C-level
+    passes, not one Python loop
+    """
+    looked_up = list(map(counters.get, map(key, cards)))
+    found = [c is not None and bool(c.get("last_seen")) for c in looked_up]
+    rows = np.flatnonzero(np.array(found, dtype=bool))
+    stats = list(compress(looked_up, found))
+    # Card.ease is a plain slot; dict cards go through get()
+    ease = [getattr(card, "ease", None) or card.get("ease") or 2 for card in compress(cards, found)]
+    streak = list(map(itemgetter("streak"), stats))
+    lapses = list(map(itemgetter("lapses"), stats))
+    seen = _local_seconds(np, list(map(itemgetter("last_seen"), stats))) if stats else []
+    return rows, ease, streak, lapses, seen
+
+
+def _due_times(np, scheduler, ease, streak, lapses, seen):
+    """Due times (epoch seconds) as a list for set_dues()"""
+    days = scheduler.interval(np.asarray(ease), np.asarray(streak), np.asarray(lapses), xp=np)
+    return (seen + np.rint(np.asarray(days, dtype=float) * DAY).astype(np.int64)).tolist()
+
+
+class ScheduleColumns:
+    """
+    reschedule()'s inputs for a deck as NumPy arrays indexed by card
+    position: ease, streak, lapses, last_seen (epoch seconds) and whether the
+    card has been answered. Building them costs one stats lookup per card;
+    after that record() keeps them current answer by answer, and
+    rescheduling the whole deck again is a handful of array operations.
+    """
+
+    def __init__(self, np, cards, counters, key):
+        self.np = np
+        self.n = n = len(cards)
+        self._pos = dict(zip(map(id, cards), range(n)))   # id(card) -> row
+        size = max(n, 16)
+        self.ease = np.full(size, 2, dtype=np.int64)
+        self.ease[:n] = [getattr(card, "ease", None) or card.get("ease") or 2 for card in cards]
+        self.streak = np.zeros(size, dtype=np.int64)
+        self.lapses = np.zeros(size, dtype=np.int64)
+        self.seen = np.zeros(size, dtype=np.int64)
+        self.answered = np.zeros(size, dtype=bool)
+        rows, _, streak, lapses, seen = _answered_columns(np, cards, counters, key)
+        self.streak[rows] = streak
+        self.lapses[rows] = lapses
+        self.seen[rows] = seen
+        self.answered[rows] = True
+
+    def __len__(self):
+        return self.n
+
+    def add(self, card):
+        """A new, never answered card at the next position"""
+        if self.n == len(self.ease):
+            for name in ("ease", "streak", "lapses", "seen", "answered"):
+                column = getattr(self, name)
+                grown = self.np.zeros(2 * len(column), dtype=column.dtype)
+                grown[:self.n] = column[:self.n]
+                setattr(self, name, grown)
+        self._pos[id(card)] = self.n
+        self.ease[self.n] = card.get("ease") or 2
+        self.n += 1
+
+    def edit(self, card):
+        """Pick up an edited card's ease"""
+        row = self._pos.get(id(card))
+        if row is not None:
+            self.ease[row] = card.get("ease") or 2
+
+    def record(self, card, ease, counters):
+        """Update a card's row after an answer (counters as StudyStats.record returns them)"""
+        row = self._pos.get(id(card))
+        if row is None:
+            return
+        self.ease[row] = ease
+        self.streak[row] = counters["streak"]
+        self.lapses[row] = counters["lapses"]
+        self.seen[row] = int(datetime.fromisoformat(counters["last_seen"]).timestamp())
+        self.answered[row] = True
+
+    def reschedule(self, cards, scheduler):
+        """reschedule() for the cards these columns were built over; returns the number rescheduled"""
+        rows = self.np.flatnonzero(self.answered[:self.n])
+        if not len(rows):
+            return 0
+        due = _due_times(self.np, scheduler, self.ease[rows], self.streak[rows], self.lapses[rows], self.seen[rows])
+        set_dues(cards if len(rows) == len(cards) else [cards[i] for i in rows.tolist()], due)
+        return len(rows)
+
+
+def reschedule(cards, counters, scheduler, key):
+    """
+    Recompute next_review for every card that has been answered: the due
+    time becomes last_seen + interval. counters is the stats "cards" map and
+    key(card) its key for a card. Returns the number of cards rescheduled.
+    A session that reschedules more than once keeps a ScheduleColumns instead.
+    """
+    np = numpy()
+    if np is not None:
+        rows, ease, streak, lapses, seen = _answered_columns(np, cards, counters, key)
+        if not len(rows):
+            return 0
+        set_dues([cards[i] for i in rows.tolist()], _due_times(np, scheduler, ease, streak, lapses, seen))
+        return len(rows)
+
+    rows, due = [], []
+    for card in cards:
+        stats = counters.get(key(card))
+        if stats is None or not stats.get("last_seen"):
+            continue
+        days = scheduler.interval(card.get("ease") or 2, stats["streak"], stats["lapses"])
+        rows.append(card)
+        due.append(int(datetime.fromisoformat(stats["last_seen"]).timestamp() + round(days * DAY)))
+    set_dues(rows, due)
+    return len(rows)
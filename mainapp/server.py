@@ -0,0 +1,359 @@
+"""
+Local study server: many students over HTTP/JSON, one shared deck.
+
+    python mainapp/server.py --deck mainapp/flashcards.json --db classroom.db --port 8080
+
+    GET  /api/categories
+    GET  /api/search?q=baba&limit=20                -> cards by hanzi, pinyin or meaning
+    GET  /api/students/<id>/next?category=Family   -> question (no answer)
+    POST /api/students/<id>/answer                 {"card": "爸爸|bàba", "choice": "father"}
+    GET  /api/students/<id>/stats?category=All
+    GET  /style.css
+
+The deck is read once and shared read-only: its text, categories, quiz
+distractors and card/due index are built a single time, with every card at
+the default scheduling of a card nobody has reviewed. What each student owns
+is only the cards they have answered (a copy made on their first answer)
+and their counters, kept in the SQLite database as one profile per student
+and loaded the first time they ask for a card, so opening a student costs
+their reviews, not the deck. Answers are written by a single
+background thread so the event loop never waits on the disk.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import instrument
+from cards import Card
+from deck_index import ALL, CardIndex, DistractorIndex, OverlayIndex, SearchIndex
+from engine import StudySession
+from instrument import timed
+from journal import card_id
+from storage import DEFAULT_EASE, EPOCH, SqliteStorage, load_data
+
+log = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STUDENT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+DECK_PROFILE = "_deck"      # not a valid student id
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+          413: "Payload Too Large", 500: "Internal Server Error"}
+MAX_BODY = 64 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReviewWriter:
+    """One thread applying answers to SQLite in order, off the event loop"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, storage, card, correct):
+        # A copy, since the student may answer again before this is written
+        self._queue.put(functools.partial(storage.record_review, card.to_dict(), correct))
+
+    def release(self, storage):
+        """Close a student's storage once their queued answers are written"""
+        self._queue.put(storage.close)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                task()
+            except Exception as e:
+                log.exception("Review write error: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """Wait until everything submitted so far is written"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Student:
+    """One student's session over the shared deck"""
+
+    def __init__(self, classroom, student_id):
+        self.classroom = classroom
+        self.storage = SqliteStorage(classroom.db_path, student_id)
+        shared = classroom.by_id
+        self.by_id = {}             # only the cards this student has reviewed
+        for word, pinyin, ease, next_review in self.storage.load_schedule():
+            key = f"{word}|{pinyin}"
+            text = shared.get(key)
+            if text is not None:
+                self.by_id[key] = Card(text.word, text.pinyin, text.meaning, text.category, ease, next_review)
+        self.session = StudySession(
+            list(self.by_id.values()), self.storage.load_stats(), distractors=classroom.distractors,
+            make_index=lambda cards: OverlayIndex(classroom.index, shared, cards, card_id),
+            record_review=lambda card, correct: classroom.writer.submit(self.storage, card, correct))
+
+    def card(self, key):
+        """The student's own card for a key, copied from the shared deck on first use, or None"""
+        card = self.by_id.get(key)
+        if card is None:
+            shared = self.classroom.by_id.get(key)
+            if shared is None:
+                return None
+            card = self.by_id[key] = self.session.index.take(shared)
+            self.session.cards.append(card)
+        return card
+
+
+class Classroom:
+    """The shared deck plus the students currently in memory"""
+
+    def __init__(self, deck_path, db_path, max_students=1000):
+        self.db_path = db_path
+        self.max_students = max_students
+        # Shared cards carry the scheduling of a card a student has not reviewed
+        self.deck = [Card(card['word'], card['pinyin'], card['meaning'], card['category'], DEFAULT_EASE, EPOCH)
+                     for card in load_data(deck_path, [])]
+        self.by_id = {card_id(card): card for card in self.deck}
+        self.categories = sorted({card.category for card in self.deck})
+        self.index = CardIndex(self.deck)
+        self.distractors = DistractorIndex(self.deck)
+        self.search = SearchIndex(self.deck)
+        self.writer = ReviewWriter()
+        self.students = OrderedDict()      # id -> Student, least recently used first
+        self._opening = {}                 # id -> Future while a student is being loaded
+        self._released = set()             # evicted ids whose answers may still be queued
+
+        store = SqliteStorage(db_path, DECK_PROFILE)
+        store.save_deck(self.deck)
+        store.close()
+
+    def _open(self, student_id, evicted):
+        # Answers still queued for a student dropped from memory must land first
+        if evicted:
+            self.writer.drain()
+        return Student(self, student_id)
+
+    async def student(self, student_id):
+        student = self.students.get(student_id)
+        if student is not None:
+            self.students.move_to_end(student_id)
+            return student
+        pending = self._opening.get(student_id)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            evicted = student_id in self._released
+            self._released.discard(student_id)
+            pending = self._opening[student_id] = loop.run_in_executor(None, self._open, student_id, evicted)
+        try:
+            student = await pending
+        finally:
+            self._opening.pop(student_id, None)
+        self.students[student_id] = student
+        while len(self.students) > self.max_students:
+            idle_id, idle = self.students.popitem(last=False)
+            self.writer.release(idle.storage)
+            self._released.add(idle_id)
+        return student
+
+    def close(self):
+        for student in self.students.values():
+            self.writer.release(student.storage)
+        self.writer.close()
+
+
+# Request handlers: each returns a JSON-serialisable dict
+
+def categories(classroom, student, query, body):
+    return {"categories": [ALL] + classroom.categories, "cards": len(classroom.deck)}
+
+
+@timed("server.next")
+def next_question(classroom, student, query, body):
+    category = query.get("category", ALL)
+    card = student.session.next_card(category)
+    if card is None:
+        raise HTTPError(404, f"No cards in category '{category}'")
+    question = student.session.build_question(card)
+    return {
+        "card": card_id(card),
+        "word": card.word,
+        "pinyin": card.pinyin,
+        "category": card.category,
+        "prompt": question["prompt"],
+        "options": question["options"],
+    }
+
+
+@timed("server.answer")
+def answer(classroom, student, query, body):
+    key, choice = body.get("card"), body.get("choice")
+    card = student.card(key) if isinstance(key, str) and isinstance(choice, str) else None
+    if card is None:
+        raise HTTPError(400, 'Expected {"card": "<word>|<pinyin>", "choice": "<meaning>"}')
+    return student.session.submit_answer(card, choice)
+
+
+def search(classroom, student, query, body):
+    try:
+        limit = min(int(query.get("limit", 20)), 100)
+    except ValueError:
+        raise HTTPError(400, "limit must be a number")
+    cards = classroom.search.search(query.get("q", ""), limit, query.get("category", ALL))
+    return {"results": [{"card": card_id(card), "word": card.word, "pinyin": card.pinyin,
+                         "meaning": card.meaning, "category": card.category} for card in cards]}
+
+
+def stats(classroom, student, query, body):
+    return student.session.get_stats(query.get("category", ALL))
+
+
+ROUTES = {
+    ("GET", "next"): next_question,
+    ("POST", "answer"): answer,
+    ("GET", "stats"): stats,
+}
+
+
+class StudyServer:
+    def __init__(self, classroom):
+        self.classroom = classroom
+        with open(os.path.join(HERE, "style.css"), 'rb') as f:
+            self.stylesheet = f.read()
+
+    async def dispatch(self, method, target, body):
+        """(status, content type, payload bytes) for one request"""
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["style.css"] and method == "GET":
+            return 200, "text/css; charset=utf-8", self.stylesheet
+        if parts == ["api", "categories"] and method == "GET":
+            return self._json(200, categories(self.classroom, None, query, None))
+        if parts == ["api", "search"] and method == "GET":
+            return self._json(200, search(self.classroom, None, query, None))
+        if len(parts) == 4 and parts[:2] == ["api", "students"]:
+            handler = ROUTES.get((method, parts[3]))
+            if handler is None:
+                if any(action == parts[3] for _, action in ROUTES):
+                    raise HTTPError(405, f"{method} not allowed here")
+                raise HTTPError(404, f"No such endpoint: {url.path}")
+            if not STUDENT_ID.match(parts[2]):
+                raise HTTPError(400, "Student ids are 1-64 letters, digits, '.', '_' or '-', starting with a letter or digit")
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(400, "Body is not valid JSON")
+            student = await self.classroom.student(parts[2])
+            return self._json(200, handler(self.classroom, student, query, payload))
+        raise HTTPError(404, f"No such endpoint: {url.path}")
+
+    @staticmethod
+    def _json(status, data):
+        return status, "application/json; charset=utf-8", json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    async def handle(self, reader, writer):
+        """One connection; HTTP/1.1 keep-alive until the client closes"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    try:
+                        length = int(headers.get("content-length", 0))
+                    except ValueError:
+                        length = -1
+                    # Either way the body cannot be skipped, so the connection ends here
+                    if length < 0:
+                        keep_alive = False
+                        raise HTTPError(400, "Content-Length must be a whole number of bytes")
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, content_type, payload = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, content_type, payload = self._json(e.status, {"error": str(e)})
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except Exception as e:
+                    log.exception("Request error (%s %s): %s", method, target, e)
+                    status, content_type, payload = self._json(500, {"error": "Internal error"})
+
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+
+async def serve(classroom, host, port, ready=None):
+    server = StudyServer(classroom)
+    listener = await asyncio.start_server(server.handle, host, port, backlog=1024)
+    log.info("Serving %d cards on http://%s:%d", len(classroom.deck), host, port)
+    if ready:
+        ready(listener.sockets[0].getsockname()[1])
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the flashcards to many students over HTTP/JSON")
+    parser.add_argument("--deck", default=os.path.join(HERE, "flashcards.json"),
+                        help="deck file, JSON or .fcdeck (default: mainapp/flashcards.json)")
+    parser.add_argument("--db", default=os.environ.get("FLASHCARDS_DB", "classroom.db"),
+                        help="SQLite database holding every student's progress")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-students", type=int, default=1000, help="students kept in memory")
+    args = parser.parse_args(argv)
+
+    instrument.configure()
+    classroom = Classroom(args.deck, args.db, args.max_students)
+    try:
+        asyncio.run(serve(classroom, args.host, args.port,
+                          ready=lambda port: print(f"Serving on http://{args.host}:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        classroom.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,390 @@
-from gtts import gTTS
-import pygame
-import tempfile
+import io
+import logging
 import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
-def speak(text):
+import tts
+from audiopack import AudioPack
+from instrument import count, gauge, span, timed
+
+log = logging.getLogger(__name__)
+
+# Imported on the audio thread the first time something is spoken
+pygame = None
+
+# Synthesised clips are kept here so each word only goes to the TTS engine
+# once, in a folder per engine so one engine's clips never stand in for another's
+CACHE_DIR = os.environ.get("FLASHCARDS_AUDIO_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "mandarin-flashcards", "audio")
+CACHE_LIMIT = int(os.environ.get("FLASHCARDS_AUDIO_CACHE_MB", "100")) * 1024 * 1024
+
+# Pre-rendered packs from prerender.py are checked before the cache
+PACK_PATHS = os.environ.get("FLASHCARDS_AUDIO_PACKS", "").split(os.pathsep) + [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio.fcpack"),
+    os.path.join(getattr(sys, "_MEIPASS", ""), "mainapp", "audio.fcpack")]
+
+
+AUDIO_FORMATS = ("mp3", "wav")
+
+
+class AudioCache:
+    """
+    On-disk clip cache keyed by a hash of (text, language, voice), each file
+    named for the format its engine wrote (key.mp3, key.wav).
+    Least recently played clips are evicted once the cache passes its size limit.
+    """
+
+    def __init__(self, directory, limit):
+        self.directory = directory
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._formats = {}      # key -> format, for keys not in mp3
+        os.makedirs(directory, exist_ok=True)
+
+        # Rebuild LRU order from earlier sessions (hits touch the file mtime)
+        entries = []
+        for name in os.listdir(directory):
+            key, _, fmt = name.rpartition(".")
+            if fmt in AUDIO_FORMATS:
+                st = os.stat(os.path.join(directory, name))
+                entries.append((st.st_mtime, key, st.st_size))
+                if fmt != "mp3":
+                    self._formats[key] = fmt
+        entries.sort()
+        self._lru = OrderedDict((key, size) for _, key, size in entries)
+        self.size = sum(self._lru.values())
+
+    key = staticmethod(tts.clip_key)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.{self._formats.get(key, 'mp3')}")
+
+    def get(self, key, record=True):
+        """Path of a cached clip (marking it recently used), or None on a miss"""
+        with self._lock:
+            if key not in self._lru:
+                self.misses += record
+                return None
+            self.hits += record
+            self._lru.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back; treat as a miss
+            with self._lock:
+                self.size -= self._lru.pop(key, 0)
+                self._formats.pop(key, None)
+                self.hits -= record
+                self.misses += record
+            return None
+        return path
+
+    def put(self, key, write):
+        """Store a clip produced by write(path) -> its format, and return its cached path"""
+        tmp = os.path.join(self.directory, key + ".part")
+        try:
+            fmt = write(tmp) or "mp3"
+            path = os.path.join(self.directory, f"{key}.{fmt}")
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self.path(key)
+            if old != path and key in self._lru:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+            if fmt == "mp3":
+                self._formats.pop(key, None)
+            else:
+                self._formats[key] = fmt
+            self.size += size - self._lru.pop(key, 0)
+            self._lru[key] = size
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self.size > self.limit and len(self._lru) > 1:
+            old, size = self._lru.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, f"{old}.{self._formats.pop(old, 'mp3')}"))
+            except OSError:
+                pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._lru),
+            "bytes": self.size,
+            "limit": self.limit,
+            "pack_hits": _pack_hits,
+        }
+
+
+_cache = None
+_packs = None
+_pack_hits = 0
+# The playback and prefetch threads both get here first, so setup is locked
+_setup_lock = threading.Lock()
+# Playback and prefetch threads must not synthesise the same clip at once,
+# but a clip being prefetched must not hold up a different one being played
+_synth_locks = {}           # clip key -> [lock, threads using it]
+_synth_locks_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _setup_lock:
+            if _cache is None:
+                _cache = AudioCache(os.path.join(CACHE_DIR, tts.DEFAULT_ENGINE), CACHE_LIMIT)
+                # Hit rate, size and evictions go into the metrics file (FLASHCARDS_METRICS)
+                gauge("audio_cache", _cache.stats)
+    return _cache
+
+
+def cache_stats():
+    """Hit/miss counters for sizing the audio cache"""
+    return get_cache().stats()
+
+
+def get_packs():
+    global _packs
+    if _packs is None:
+        with _setup_lock:
+            if _packs is None:
+                packs = []
+                for path in PACK_PATHS:
+                    if path and os.path.exists(path):
+                        try:
+                            packs.append(AudioPack(path))
+                        except (OSError, ValueError) as e:
+                            log.warning("Audio pack error (%s): %s", path, e)
+                _packs = packs
+    return _packs
+
+
+@contextmanager
+def _synthesising(key):
+    """Hold the lock for one clip key while it is synthesised"""
+    with _synth_locks_lock:
+        entry = _synth_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
     try:
-        # Create temp audio file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-            tts = gTTS(text=text, lang='zh')
-            tts.save(fp.name)
+        with entry[0]:
+            yield
+    finally:
+        with _synth_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _synth_locks[key]
+
+
+def load_pack(path):
+    """Add a pre-rendered audio pack to search before the cache"""
+    get_packs().insert(0, AudioPack(path))
+
+
+def audio_source(text, lang='zh', voice=None):
+    """
+    Where to play text from: (bytes, format) from an audio pack, or the path of
+    a cached clip. Only synthesises (with tts.DEFAULT_ENGINE) when neither has it.
+    """
+    global _pack_hits
+    key = tts.clip_key(text, lang, voice)
+    for pack in get_packs():
+        clip = pack.get(key)
+        if clip is not None:
+            _pack_hits += 1
+            count("audio.pack_hit")
+            return clip
+
+    cache = get_cache()
+    path = cache.get(key)
+    if path is None:
+        count("audio.cache_miss")
+        with _synthesising(key):
+            # The other thread may have made it while this one waited
+            path = cache.get(key, record=False)
+            if path is None:
+                engine = tts.get_engine()
+                with span("speak.synthesize"):
+                    path = cache.put(key, lambda tmp: engine(text, lang, voice, tmp))
+    else:
+        count("audio.cache_hit")
+    return path
+
+
+class AudioPrefetcher:
+    """
+    Warms the audio cache on its own thread, so a word that is about to be
+    shown plays from disk instead of waiting on the TTS engine. Only the
+    most recent requests are kept; playback never waits behind this thread.
+    """
+
+    def __init__(self, maxsize=4):
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+
+    def warm(self, text, lang='zh', voice=None):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audio-prefetch", daemon=True)
+            self._thread.start()
+        while True:
+            try:
+                self._queue.put_nowait((text, lang, voice))
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while True:
+            text, lang, voice = self._queue.get()
+            try:
+                audio_source(text, lang, voice)
+                count("audio.prefetch")
+            except Exception as e:
+                log.warning("TTS prefetch error: %s", e)
+
+
+class AudioEngine:
+    """
+    Plays clips on one worker thread so the Tk thread never waits on
+    synthesis or playback. The mixer is initialised once, pending requests
+    sit in a small bounded queue, and cancel() stops the current clip and
+    drops anything still queued.
+    """
+
+    def __init__(self, maxsize=4):
+        self._queue = queue.Queue(maxsize)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+            self._thread.start()
+
+    def say(self, text, lang='zh', voice=None, replace=True):
+        """Queue text to be spoken; by default it replaces whatever is playing"""
+        self._start()
+        with self._lock:
+            if replace:
+                self._cancel_locked()
+            request = (self._generation, text, lang, voice)
+            while True:
+                try:
+                    self._queue.put_nowait(request)
+                    break
+                except queue.Full:
+                    # Drop the oldest request rather than block the caller
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def cancel(self):
+        """Stop the current clip and forget queued ones"""
+        with self._lock:
+            self._cancel_locked()
+
+    def _cancel_locked(self):
+        self._generation += 1
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def _current(self, generation):
+        return generation == self._generation
+
+    def _run(self):
+        # pygame is slow to import and prints a banner, so it is loaded here on
+        # the audio thread rather than at startup or on the Tk thread
+        global pygame
+        try:
+            os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+            import pygame
+            pygame.mixer.init()
+        except Exception as e:
+            log.warning("TTS Error: %s", e)
+        while True:
+            generation, text, lang, voice = self._queue.get()
+            if not self._current(generation):
+                continue
+            try:
+                source = audio_source(text, lang, voice)
+                if not self._current(generation):
+                    continue
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                if isinstance(source, tuple):
+                    data, fmt = source
+                    pygame.mixer.music.load(io.BytesIO(data), fmt)
+                else:
+                    pygame.mixer.music.load(source)
+                pygame.mixer.music.play()
+                while pygame.mixer.music.get_busy():
+                    if not self._current(generation):
+                        pygame.mixer.music.stop()
+                        break
+                    time.sleep(0.05)
+            except Exception as e:
+                log.warning("TTS Error: %s", e)
+
+
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = AudioEngine()
+    return _engine
+
 
-        # Initialize and play
-        pygame.mixer.init()
-        pygame.mixer.music.load(fp.name)
-        pygame.mixer.music.play()
+@timed("speak")
+def speak(text, lang='zh', voice=None):
+    """Speak text in the background (returns immediately)"""
+    get_engine().say(text, lang, voice)
 
-        # Wait for it to finish playing
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
 
-        # Clean up
-        os.remove(fp.name)
+_prefetcher = None
 
-    except Exception as e:
-        print("TTS Error:", e)
 
+def prefetch(text, lang='zh', voice=None):
+    """Make sure text is synthesised and cached before it is spoken (returns immediately)"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = AudioPrefetcher()
+    _prefetcher.warm(text, lang, voice)
 
 
+def stop_speaking():
+    """Cancel current and pending speech, e.g. when the user moves on"""
+    if _engine is not None:
+        _engine.cancel()
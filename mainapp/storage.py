@@ -0,0 +1,416 @@
+"""
+Storage backends for the deck, scheduling state and stats.
+
+Both backends provide load() -> (cards, stats), save_cards(cards, changed=()), save_stats(),
+record_review(card, correct) and close(). Picking the next card is left to
+the engine's in-memory indexes over the loaded deck. JsonStorage is the
+flashcards.json/stats.json pair; SqliteStorage is one WAL-mode database
+shared by many student profiles, holding schedule rows only for the cards
+each profile has actually been scheduled.
+
+Migrate an existing JSON deck with:
+
+    python mainapp/storage.py migrate flashcards.json stats.json decks.db --profile alice
+"""
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+from cards import Card, compact, to_json
+from deckfile import SUFFIX as DECK_SUFFIX, load_deck, write_deck
+from instrument import timed
+from persist import WriteBehind
+from journal import ReviewJournal, card_id
+
+DEFAULT_STATS = {"correct": 0, "total": 0, "learned": [], "per_category": {}, "cards": {}}
+
+log = logging.getLogger(__name__)
+
+
+def load_json(path, default):
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            # A broken file must not look like an empty deck without a word
+            log.warning("Could not read %s, using defaults: %s", path, e)
+    return default
+
+
+@timed("save_json")
+def save_json(path, data):
+    # Write to a temp file and rename so a crash never leaves a half-written file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, default=to_json)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def load_data(path, default):
+    """A cards or stats file: binary decks (.fcdeck) by suffix, anything else JSON"""
+    if path.endswith(DECK_SUFFIX):
+        return load_deck(path, default)
+    return load_json(path, default)
+
+
+def save_data(path, data):
+    if path.endswith(DECK_SUFFIX):
+        write_deck(path, data)
+    else:
+        save_json(path, data)
+
+
+def default_stats():
+    return json.loads(json.dumps(DEFAULT_STATS))
+
+
+class JsonStorage:
+    """
+    flashcards.json (or a binary .fcdeck deck) + stats.json snapshots with a
+    review journal.
+
+    With deck_path, the deck is read from there and never written (e.g. the
+    copy bundled with the app, so a new release's deck reaches existing
+    installs), and cards_path holds only this user's changes to it: entries
+    for the cards they added, and the word, pinyin and changed fields of deck
+    cards they reviewed or edited.
+    """
+
+    def __init__(self, cards_path, stats_path, journal_path, save_delay=2.0, deck_path=None):
+        self.cards_path = cards_path
+        self.stats_path = stats_path
+        self.deck_path = deck_path
+        self.writer = WriteBehind(self._write, delay=save_delay)
+        self.journal = ReviewJournal(journal_path, cards_path, stats_path, load_data, save_data,
+                                     lock=self.writer.io_lock, sparse=deck_path is not None)
+        self.cards = []
+
+    def load(self):
+        if self.deck_path is not None:
+            self.cards = self._load_cards(self.deck_path)
+            self._apply_changes(self.cards, load_json(self.cards_path, []))
+        else:
+            self.cards = self._load_cards(self.cards_path)
+        stats = load_json(self.stats_path, default_stats())
+        # Reviews since the last snapshot live in the journal
+        self.journal.replay(self.cards, stats)
+        return self.cards, stats
+
+    @staticmethod
+    def _load_cards(path):
+        if path.endswith(DECK_SUFFIX):
+            return load_deck(path, [])
+        return compact(load_json(path, []))
+
+    @staticmethod
+    def _apply_changes(cards, changes):
+        if not changes:
+            return
+        # Matched by word and pinyin, so changes survive a reordered or extended deck
+        by_id = {card_id(card): card for card in cards}
+        for entry in changes:
+            card = by_id.get(card_id(entry))
+            if card is not None:
+                card.update({k: v for k, v in entry.items() if k not in ("word", "pinyin")})
+            elif "meaning" in entry and "category" in entry:
+                cards.append(Card.from_dict(entry))
+            else:
+                log.info("Dropping progress for %s, no longer in the deck", card_id(entry))
+
+    def changes(self, cards):
+        """The entries of cards_path for cards: what differs from the deck at deck_path"""
+        deck = {card_id(card): card for card in self._load_cards(self.deck_path)}
+        changes = []
+        for card in cards:
+            entry = card.to_dict() if isinstance(card, Card) else dict(card)
+            original = deck.get(card_id(card))
+            if original is not None:
+                original = original.to_dict()
+                changed = {k: v for k, v in entry.items() if original.get(k) != v}
+                if not changed:
+                    continue
+                entry = dict(word=entry["word"], pinyin=entry["pinyin"], **changed)
+            changes.append(entry)
+        return changes
+
+    def _write(self, path, data):
+        # On the writer thread, under the lock compaction holds
+        if path == self.stats_path and data.get("journal_seq", 0) < self.journal.compacted:
+            # Stamped before a compaction that saved later reviews, whose
+            # events are now only in the history: writing it would lose them
+            log.debug("Dropping stats snapshot at journal_seq %s, compaction saved %s",
+                      data.get("journal_seq", 0), self.journal.compacted)
+            return
+        # Comparing with the deck reads all its text
+        if path == self.cards_path and self.deck_path is not None:
+            data = self.changes(data)
+        save_data(path, data)
+
+    def save_cards(self, cards, changed=()):
+        # The writer must not read the live list, or cards the UI is still
+        # editing: copy the list and the changed cards here. The others
+        # only change through reviews, which the journal replays
+        copies = {id(card): card.copy() if isinstance(card, Card) else dict(card) for card in changed}
+        self.writer.mark_dirty(self.cards_path, [copies.get(id(card), card) for card in cards] if copies else
+                               list(cards))
+
+    def save_stats(self, stats):
+        # Without the journal position, a reload would replay reviews this already counts
+        self.writer.mark_dirty(self.stats_path, self.journal.stamp(stats))
+
+    def record_review(self, card, correct):
+        self.journal.record(card, correct)
+
+    def close(self):
+        self.journal.close()
+        self.writer.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    word TEXT NOT NULL,
+    pinyin TEXT NOT NULL,
+    meaning TEXT NOT NULL,
+    category TEXT NOT NULL,
+    UNIQUE (word, pinyin)
+);
+CREATE INDEX IF NOT EXISTS cards_category ON cards (category);
+
+CREATE TABLE IF NOT EXISTS schedule (
+    profile TEXT NOT NULL,
+    card_id INTEGER NOT NULL REFERENCES cards (id),
+    category TEXT NOT NULL,
+    ease INTEGER NOT NULL DEFAULT 2,
+    next_review TEXT NOT NULL,
+    PRIMARY KEY (profile, card_id)
+);
+CREATE INDEX IF NOT EXISTS schedule_due ON schedule (profile, category, next_review);
+CREATE INDEX IF NOT EXISTS schedule_due_all ON schedule (profile, next_review);
+
+CREATE TABLE IF NOT EXISTS stats (
+    profile TEXT PRIMARY KEY,
+    correct INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    scheduler TEXT
+);
+CREATE TABLE IF NOT EXISTS category_stats (
+    profile TEXT NOT NULL,
+    category TEXT NOT NULL,
+    correct INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (profile, category)
+);
+CREATE TABLE IF NOT EXISTS learned (
+    profile TEXT NOT NULL,
+    word TEXT NOT NULL,
+    PRIMARY KEY (profile, word)
+);
+CREATE TABLE IF NOT EXISTS card_stats (
+    profile TEXT NOT NULL,
+    card_key TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    last_seen TEXT,
+    PRIMARY KEY (profile, card_key)
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    profile TEXT NOT NULL,
+    card_id INTEGER NOT NULL,
+    at TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    ease INTEGER NOT NULL,
+    due TEXT NOT NULL
+);
+"""
+
+# A card this profile has no schedule row for yet: default ease, due now
+DEFAULT_EASE = 2
+EPOCH = "1970-01-01T00:00:00"
+CARD_COLUMNS = (f"c.word, c.pinyin, c.meaning, c.category, "
+                f"COALESCE(s.ease, {DEFAULT_EASE}), COALESCE(s.next_review, '{EPOCH}')")
+
+
+SCHEDULE_UPSERT = (
+    "INSERT INTO schedule (profile, card_id, category, ease, next_review) "
+    "SELECT ?, id, ?, ?, ? FROM cards WHERE word = ? AND pinyin = ? "
+    "ON CONFLICT (profile, card_id) DO UPDATE SET category = excluded.category, "
+    "ease = excluded.ease, next_review = excluded.next_review")
+
+
+def _card(row):
+    return Card(*row)
+
+
+class SqliteStorage:
+    """One SQLite database holding a shared deck and per-profile progress"""
+
+    def __init__(self, path, profile="default"):
+        import sqlite3     # only needed when this backend is chosen
+        self.path = path
+        self.profile = profile
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        if "scheduler" not in {row[1] for row in self.db.execute("PRAGMA table_info(stats)")}:
+            # Databases from before the scheduler choice was stored
+            self.db.execute("ALTER TABLE stats ADD COLUMN scheduler TEXT")
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO stats (profile) VALUES (?)", (profile,))
+
+    def load(self):
+        """The whole deck with this profile's scheduling (defaults for cards it has no row for)"""
+        cards = [_card(row) for row in self.db.execute(
+            f"SELECT {CARD_COLUMNS} FROM cards c LEFT JOIN schedule s ON s.card_id = c.id AND s.profile = ? "
+            "ORDER BY c.id", (self.profile,))]
+        return cards, self.load_stats()
+
+    def load_schedule(self):
+        """(word, pinyin, ease, next_review) for the cards this profile has been scheduled, without their text"""
+        return self.db.execute(
+            "SELECT c.word, c.pinyin, s.ease, s.next_review FROM cards c JOIN schedule s ON s.card_id = c.id "
+            "WHERE s.profile = ? ORDER BY c.id", (self.profile,)).fetchall()
+
+    def load_stats(self):
+        correct, total, scheduler = self.db.execute(
+            "SELECT correct, total, scheduler FROM stats WHERE profile = ?", (self.profile,)).fetchone()
+        learned = [w for (w,) in self.db.execute(
+            "SELECT word FROM learned WHERE profile = ? ORDER BY rowid", (self.profile,))]
+        per_category = {cat: {"correct": c, "total": t} for cat, c, t in self.db.execute(
+            "SELECT category, correct, total FROM category_stats WHERE profile = ?", (self.profile,))}
+        cards = {key: {"attempts": a, "lapses": l, "streak": s, "last_seen": seen}
+                 for key, a, l, s, seen in self.db.execute(
+                     "SELECT card_key, attempts, lapses, streak, last_seen FROM card_stats WHERE profile = ?",
+                     (self.profile,))}
+        # Per-category learned/lapses totals are rebuilt from these by StudyStats
+        stats = {"correct": correct, "total": total, "learned": learned, "per_category": per_category,
+                 "cards": cards}
+        if scheduler:
+            stats["scheduler"] = json.loads(scheduler)
+        return stats
+
+    def save_cards(self, cards, changed=()):
+        """
+        Save the deck text and this profile's scheduling. Cards still at the
+        unscheduled default get no schedule row (or keep the one they have).
+        """
+        rows = []
+        for card in cards:
+            ease, review = card.get('ease') or DEFAULT_EASE, card.get('next_review') or EPOCH
+            if ease != DEFAULT_EASE or review != EPOCH:
+                rows.append((self.profile, card['category'], ease, review, card['word'], card['pinyin']))
+        with self.db:
+            self._save_text(cards)
+            self.db.executemany(SCHEDULE_UPSERT, rows)
+
+    def save_deck(self, cards):
+        """Add or update the shared deck text only"""
+        with self.db:
+            self._save_text(cards)
+
+    def _save_text(self, cards):
+        self.db.executemany(
+            "INSERT INTO cards (word, pinyin, meaning, category) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (word, pinyin) DO UPDATE SET meaning = excluded.meaning, category = excluded.category",
+            [(card['word'], card['pinyin'], card['meaning'], card['category']) for card in cards])
+
+    def save_stats(self, stats):
+        p = self.profile
+        with self.db:
+            scheduler = stats.get('scheduler')
+            self.db.execute("UPDATE stats SET correct = ?, total = ?, scheduler = ? WHERE profile = ?",
+                            (stats['correct'], stats['total'], json.dumps(scheduler) if scheduler else None, p))
+            self.db.execute("DELETE FROM category_stats WHERE profile = ?", (p,))
+            self.db.executemany(
+                "INSERT INTO category_stats (profile, category, correct, total) VALUES (?, ?, ?, ?)",
+                [(p, cat, s['correct'], s['total']) for cat, s in stats['per_category'].items()])
+            self.db.executemany("INSERT OR IGNORE INTO learned (profile, word) VALUES (?, ?)",
+                                [(p, w) for w in stats['learned']])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO card_stats (profile, card_key, attempts, lapses, streak, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(p, key, c['attempts'], c['lapses'], c['streak'], c['last_seen'])
+                 for key, c in stats.get('cards', {}).items()])
+
+    def record_review(self, card, correct):
+        """Update one card's schedule and the counters in a single small transaction"""
+        p = self.profile
+        grade = 1 if correct else 0
+        now = datetime.now()
+        with self.db:
+            row = self.db.execute("SELECT id FROM cards WHERE word = ? AND pinyin = ?",
+                                  (card['word'], card['pinyin'])).fetchone()
+            if row is None:
+                self._save_text([card])
+                row = self.db.execute("SELECT id FROM cards WHERE word = ? AND pinyin = ?",
+                                      (card['word'], card['pinyin'])).fetchone()
+            cid = row[0]
+            # The first review of a card creates its schedule row
+            self.db.execute(
+                "INSERT INTO schedule (profile, card_id, category, ease, next_review) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (profile, card_id) DO UPDATE SET ease = excluded.ease, next_review = excluded.next_review",
+                (p, cid, card['category'], card['ease'], card['next_review']))
+            self.db.execute("INSERT INTO reviews (profile, card_id, at, grade, ease, due) VALUES (?, ?, ?, ?, ?, ?)",
+                            (p, cid, now.isoformat(), grade, card['ease'], card['next_review']))
+            self.db.execute("UPDATE stats SET correct = correct + ?, total = total + 1 WHERE profile = ?",
+                            (grade, p))
+            self.db.execute(
+                "INSERT INTO category_stats (profile, category, correct, total) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (profile, category) DO UPDATE SET correct = correct + excluded.correct, "
+                "total = total + 1", (p, card['category'], grade))
+            # A lapse is a wrong answer that ends a streak (as in StudyStats.record)
+            self.db.execute(
+                "INSERT INTO card_stats (profile, card_key, attempts, lapses, streak, last_seen) "
+                "VALUES (?, ?, 1, 0, ?, ?) "
+                "ON CONFLICT (profile, card_key) DO UPDATE SET attempts = attempts + 1, "
+                "lapses = lapses + (excluded.streak = 0 AND streak > 0), "
+                "streak = CASE WHEN excluded.streak THEN streak + 1 ELSE 0 END, "
+                "last_seen = excluded.last_seen",
+                (p, card_id(card), grade, now.isoformat(timespec='seconds')))
+            if correct:
+                self.db.execute("INSERT OR IGNORE INTO learned (profile, word) VALUES (?, ?)", (p, card['word']))
+
+    def close(self):
+        self.db.close()
+
+
+def migrate_json(cards_path, stats_path, db_path, profile="default", journal_path=None):
+    """One-shot copy of a JSON deck (and its journal) into an SQLite database"""
+    cards = load_data(cards_path, [])
+    stats = load_json(stats_path, default_stats())
+    if journal_path:
+        ReviewJournal(journal_path, cards_path, stats_path, load_data, save_data).replay(cards, stats)
+    stats.pop("journal_seq", None)
+
+    store = SqliteStorage(db_path, profile)
+    store.save_cards(cards)
+    store.save_stats(stats)
+    store.close()
+    return len(cards)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Flashcard storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="copy flashcards.json/stats.json into an SQLite database")
+    migrate.add_argument("cards")
+    migrate.add_argument("stats")
+    migrate.add_argument("db")
+    migrate.add_argument("--profile", default="default")
+    migrate.add_argument("--journal", help="review journal to replay first (reviews.jsonl)")
+    args = parser.parse_args()
+
+    count = migrate_json(args.cards, args.stats, args.db, args.profile, args.journal)
+    print(f"Migrated {count} cards into {args.db} (profile '{args.profile}')")
@@ -0,0 +1,108 @@
+"""
+Study statistics kept in the stats.json dict.
+
+    {"correct": 12, "total": 20, "learned": ["爸爸", ...],
+     "per_category": {"Family": {"correct": 5, "total": 8, "learned": 3, "lapses": 1}},
+     "cards": {"爸爸|bàba": {"attempts": 4, "lapses": 1, "streak": 2,
+                             "last_seen": "2025-06-20T09:30:00"}}}
+
+StudyStats updates that dict in place, so it is saved exactly as before,
+and keeps a set of the learned words next to the list so membership
+checks do not scan it. Files from before per-card counters load as they
+are: "cards" starts empty and the per-category learned/lapses totals are
+rebuilt once from the deck (see backfill()).
+"""
+ALL = "All"
+
+
+def _category(data, category):
+    cat = data["per_category"].get(category)
+    if cat is None:
+        cat = data["per_category"][category] = {"correct": 0, "total": 0, "learned": 0, "lapses": 0}
+    return cat
+
+
+class StudyStats:
+    """Counters for one student; see the module docstring for the layout"""
+
+    def __init__(self, data):
+        self.data = data
+        data.setdefault("learned", [])
+        data.setdefault("per_category", {})
+        data.setdefault("cards", {})
+        self._learned = set(data["learned"])
+
+    def needs_backfill(self):
+        """True when per-category learned/lapses totals are missing (older stats.json)"""
+        return any("learned" not in cat or "lapses" not in cat for cat in self.data["per_category"].values())
+
+    def backfill(self, cards, card_id):
+        """Rebuild per-category learned/lapses totals from the deck"""
+        per_category = self.data["per_category"]
+        for cat in per_category.values():
+            cat["learned"] = cat["lapses"] = 0
+        learned = set(self._learned)
+        for card in cards:
+            counters = self.data["cards"].get(card_id(card))
+            if counters is None and card['word'] not in learned:
+                continue
+            cat = _category(self.data, card['category'])
+            if counters is not None:
+                cat["lapses"] += counters["lapses"]
+            if card['word'] in learned:
+                learned.discard(card['word'])
+                cat["learned"] += 1
+
+    def is_learned(self, word):
+        return word in self._learned
+
+    def card(self, key):
+        """A card's counters, or None if it has never been answered"""
+        return self.data["cards"].get(key)
+
+    def record(self, key, word, category, correct, at):
+        """Count one answer to a card (key as journal.card_id, at an ISO time)"""
+        data = self.data
+        cat = _category(data, category)
+        data["total"] += 1
+        cat["total"] += 1
+
+        counters = data["cards"].get(key)
+        if counters is None:
+            counters = data["cards"][key] = {"attempts": 0, "lapses": 0, "streak": 0, "last_seen": None}
+        counters["attempts"] += 1
+        counters["last_seen"] = at
+
+        if correct:
+            data["correct"] += 1
+            cat["correct"] += 1
+            counters["streak"] += 1
+            if word not in self._learned:
+                self._learned.add(word)
+                data["learned"].append(word)
+                cat["learned"] = cat.get("learned", 0) + 1
+        else:
+            # A lapse is forgetting a card that was being answered correctly
+            if counters["streak"]:
+                counters["lapses"] += 1
+                cat["lapses"] = cat.get("lapses", 0) + 1
+            counters["streak"] = 0
+        return counters
+
+    def summary(self, category=ALL):
+        """Precomputed totals for a category or "All" """
+        if category == ALL:
+            data = self.data
+            correct, total, learned = data["correct"], data["total"], len(data["learned"])
+            lapses = sum(cat.get("lapses", 0) for cat in data["per_category"].values())
+        else:
+            cat = self.data["per_category"].get(category, {})
+            correct, total = cat.get("correct", 0), cat.get("total", 0)
+            learned, lapses = cat.get("learned", 0), cat.get("lapses", 0)
+        return {
+            "correct": correct,
+            "total": total,
+            "percentage": (correct / total * 100) if total > 0 else 0,
+            "learned": learned,
+            "lapses": lapses,
+        }
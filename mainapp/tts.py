@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+# A few frames of silent MPEG-1 Layer III, enough for pygame to load and play
+SILENT_MP3 = (b'\xff\xfb\x90\x64' + b'\x00' * 413) * 4
+
+
+def clip_key(text, lang, voice):
+    """Content address of a clip, shared by the audio cache and audio packs (voice None: the default)"""
+    return hashlib.sha256(f"{lang}\0{voice or ''}\0{text}".encode('utf-8')).hexdigest()
+
+
+def gtts_engine(text, lang, voice, path):
+    """Google TTS (needs network); voice is the gTTS tld, e.g. 'com.tw', or None for 'com'"""
+    from gtts import gTTS
+    gTTS(text=text, lang=lang, tld=voice or "com").save(path)
+    return "mp3"
+
+
+def pyttsx3_engine(text, lang, voice, path):
+    """Offline system voices via pyttsx3; voice is a voice id or None for the default"""
+    import pyttsx3
+    engine = pyttsx3.init()
+    if voice:
+        engine.setProperty('voice', voice)
+    engine.save_to_file(text, path)
+    engine.runAndWait()
+    return "wav"
+
+
+def stub_engine(text, lang, voice, path):
+    """Silent clip, for benchmarks and machines with no TTS at all"""
+    with open(path, 'wb') as f:
+        f.write(SILENT_MP3)
+    return "mp3"
+
+
+ENGINES = {
+    "gtts": gtts_engine,
+    "pyttsx3": pyttsx3_engine,
+    "stub": stub_engine,
+}
+
+DEFAULT_ENGINE = os.environ.get("FLASHCARDS_TTS_ENGINE", "gtts")
+
+
+def get_engine(name=None):
+    """Look up a synthesis function: engine(text, lang, voice, path) -> audio format"""
+    name = name or DEFAULT_ENGINE
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS engine '{name}' (choose from {', '.join(ENGINES)})")
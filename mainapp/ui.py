@@ -1,45 +1,81 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-from datetime import datetime, timedelta
-import random
-import traceback
+import logging
+import sys
+import threading
 
-# Import with error handling
-try:
-    from speak import speak
-except ImportError:
-    def speak(text):
-        print(f"🔊 Would speak: {text}")
-        print("TTS module not available")
+from engine import StudySession
+from instrument import timed
 
-try:
-    from quiz import run_quiz
-except ImportError:
-    def run_quiz(app, card, callback):
-        print("Quiz module not available")
+log = logging.getLogger(__name__)
+
+# Speech and quiz modules are imported on first use, so the first card
+# is on screen before any optional subsystem loads
+def speak(text):
+    try:
+        from speak import speak as speak_text
+    except ImportError:
+        log.warning("TTS module not available, would speak: %s", text)
+        return
+    speak_text(text)
+
+def prefetch_speech(text):
+    # Best effort: the word still plays (just later) if this fails
+    try:
+        from speak import prefetch
+    except ImportError:
+        return
+    prefetch(text)
+
+def stop_speaking():
+    # Nothing can be playing if speech was never loaded
+    speak_module = sys.modules.get('speak')
+    if speak_module is not None:
+        speak_module.stop_speaking()
+
+def run_quiz(app, card, callback, question=None):
+    try:
+        from quiz import run_quiz as show_quiz
+    except ImportError:
+        log.warning("Quiz module not available")
         callback(card['meaning'], card)
+        return
+    show_quiz(app, card, callback, question)
+
+# Milliseconds the right/wrong colours stay up, then before the next card.
+# Rapid review replaces both with its own (configurable, possibly zero) delay
+FEEDBACK_MS = 1500
+NEXT_CARD_MS = 1000
+RAPID_FEEDBACK_MS = 300
+
+KEY_HELP = "Keys: 1-4 answer · Space flip · S speak · Enter next"
+SEARCH_RESULTS = 8
 
 class FlashcardApp:
-    def __init__(self, root, cards, stats, save_stats, save_cards):
+    def __init__(self, root, cards, stats, save_stats, save_cards, record_review=None, scheduler=None,
+                 rapid=False, rapid_feedback_ms=RAPID_FEEDBACK_MS):
         self.root = root
         self.root.title("🀄 Mandarin Flashcards")
         self.root.configure(bg='#f0f8ff')
         self.root.geometry("600x700")
         
-        # Data
-        self.cards = cards if cards else []
-        self.stats = stats if stats else {"correct": 0, "total": 0, "learned": [], "per_category": {}}
-        self.save_stats = save_stats
-        self.save_cards = save_cards
+        # Data (scheduling, quizzes and stats live in the headless engine)
+        self.session = StudySession(cards, stats, save_stats, save_cards, record_review, scheduler)
+        self.cards = self.session.cards
+        self.stats = self.session.stats
         
         # State
-        self.categories = sorted(set(card['category'] for card in self.cards)) if self.cards else []
+        self.harder_quiz = tk.BooleanVar(value=False)
         self.current_category = tk.StringVar(value="All")
         self.current = None
         self.front_visible = True
+        self.rapid = tk.BooleanVar(value=rapid)
+        self.rapid_feedback_ms = rapid_feedback_ms
+        self._pending = None    # (after id, callback) of the answer flow's current wait
         
         # Create UI
         self._create_ui()
+        self._bind_keys()
         
         # Initialize
         if not self.cards:
@@ -71,16 +107,38 @@ class FlashcardApp:
             fg='#555'
         ).pack(side='left', padx=5)
         
-        if self.categories:
-            category_menu = ttk.Combobox(
-                category_frame,
-                textvariable=self.current_category,
-                values=["All"] + self.categories,
-                state="readonly",
-                font=("Helvetica", 11)
-            )
-            category_menu.pack(side='left', padx=5)
-            category_menu.bind('<<ComboboxSelected>>', self._on_category_change)
+        self.category_menu = ttk.Combobox(
+            category_frame,
+            textvariable=self.current_category,
+            values=["All"] + self.session.categories,
+            state="readonly",
+            font=("Helvetica", 11)
+        )
+        if self.session.categories:
+            self.category_menu.pack(side='left', padx=5)
+        self.category_menu.bind('<<ComboboxSelected>>', self._on_category_change)
+        
+        tk.Checkbutton(
+            category_frame,
+            text="Harder quiz",
+            variable=self.harder_quiz,
+            font=("Helvetica", 11),
+            bg='#f0f8ff',
+            activebackground='#f0f8ff'
+        ).pack(side='left', padx=10)
+        
+        tk.Checkbutton(
+            category_frame,
+            text="⚡ Rapid review",
+            variable=self.rapid,
+            command=self._on_rapid_toggle,
+            font=("Helvetica", 11),
+            bg='#f0f8ff',
+            activebackground='#f0f8ff'
+        ).pack(side='left', padx=10)
+        
+        # Search
+        self._create_search_box()
         
         # Flashcard display
         self.card_frame = tk.Frame(self.root, bg='#f0f8ff')
@@ -164,6 +222,142 @@ class FlashcardApp:
             **speak_style
         )
         self.speak_btn.pack(side='left', padx=5)
+        
+        self.key_help = tk.Label(
+            self.root,
+            text=KEY_HELP,
+            font=("Helvetica", 10),
+            bg='#f0f8ff',
+            fg='#7f8c8d'
+        )
+        if self.rapid.get():
+            self.key_help.pack(after=button_frame)
+    
+    def _create_search_box(self):
+        """Type-ahead search by hanzi, pinyin (tones optional) or meaning"""
+        search_frame = tk.Frame(self.root, bg='#f0f8ff')
+        search_frame.pack(pady=5)
+        
+        tk.Label(
+            search_frame,
+            text="🔍 Find:",
+            font=("Helvetica", 12),
+            bg='#f0f8ff',
+            fg='#555'
+        ).pack(side='left', padx=5)
+        
+        self.search_text = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_text, font=("Helvetica", 12), width=30)
+        self.search_entry.pack(side='left', padx=5)
+        self.search_entry.bind('<FocusIn>', self._warm_search)
+        self.search_entry.bind('<KeyRelease>', self._on_search)
+        self.search_entry.bind('<Return>', lambda e: self._open_result(0))
+        self.search_entry.bind('<Down>', self._focus_results)
+        self.search_entry.bind('<Escape>', self._close_search)
+        
+        # Drop-down list over the card, shown only while there are matches
+        self.search_results = tk.Listbox(self.root, font=("Helvetica", 12), height=SEARCH_RESULTS,
+                                         activestyle='dotbox')
+        self.search_results.bind('<Return>', lambda e: self._open_result())
+        self.search_results.bind('<Double-Button-1>', lambda e: self._open_result())
+        self.search_results.bind('<Escape>', self._close_search)
+        self._matches = []
+        self._search_query = ""
+        self._search_warmed = False
+    
+    def _warm_search(self, event=None):
+        # Build the search index off the Tk thread while the student starts typing
+        if not self._search_warmed:
+            self._search_warmed = True
+            threading.Thread(target=self.session.search_index, name="search-index", daemon=True).start()
+    
+    def _on_search(self, event=None):
+        """Refresh the matches as the query changes"""
+        query = self.search_text.get()
+        if query == self._search_query:
+            return
+        self._search_query = query
+        try:
+            self._matches = self.session.search(query, SEARCH_RESULTS)
+        except Exception as e:
+            log.exception("Search error: %s", e)
+            self._matches = []
+        
+        self.search_results.delete(0, 'end')
+        if not self._matches:
+            self.search_results.place_forget()
+            return
+        for card in self._matches:
+            self.search_results.insert('end', f"{card['word']}  {card['pinyin']}  —  {card['meaning']}")
+        self.search_results.config(height=len(self._matches))
+        self.search_results.place(in_=self.search_entry, x=0, rely=1.0, relwidth=1.5)
+        self.search_results.lift()
+    
+    def _focus_results(self, event=None):
+        if self._matches:
+            self.search_results.focus_set()
+            self.search_results.selection_clear(0, 'end')
+            self.search_results.selection_set(0)
+            self.search_results.activate(0)
+        return "break"
+    
+    def _close_search(self, event=None):
+        self.search_results.place_forget()
+        self.search_text.set("")
+        self._search_query = ""
+        self._matches = []
+        self.root.focus_set()
+        return "break"
+    
+    def _open_result(self, index=None):
+        """Study the chosen match (the selected one, or the first from the search box)"""
+        if index is None:
+            selected = self.search_results.curselection()
+            index = selected[0] if selected else 0
+        if index >= len(self._matches):
+            return "break"
+        card = self._matches[index]
+        self._close_search()
+        try:
+            self.show_card(card)
+        except Exception as e:
+            log.exception("Show card error: %s", e)
+        return "break"
+    
+    def show_card(self, card):
+        """Put a particular card on screen with its quiz, as if it had come up next"""
+        stop_speaking()
+        if self._pending is not None:
+            # Record an answer still showing its feedback before moving away
+            self.advance()
+        self.current = card
+        self.front_visible = True
+        self.update_card()
+        self.run_quiz()
+        self.update_stats_display()
+        self.root.after_idle(self._prefetch_next)
+    
+    def _bind_keys(self):
+        """Keyboard shortcuts for the whole review loop"""
+        for i in range(4):
+            self.root.bind(f'<Key-{i + 1}>', lambda e, i=i: self._on_key(e, self.choose, i))
+        for key in ('<space>', 'f', 'F'):
+            self.root.bind(key, lambda e: self._on_key(e, self._safe_flip_card))
+        for key in ('s', 'S'):
+            self.root.bind(key, lambda e: self._on_key(e, self._safe_speak))
+        for key in ('<Return>', '<Right>', 'n', 'N'):
+            self.root.bind(key, lambda e: self._on_key(e, self._safe_load_next))
+    
+    def _on_key(self, event, action, *args):
+        # A focused button, list or text box already handles its own keys. The
+        # category menu is a readonly Combobox (an Entry subclass) that takes no
+        # typing, so the review keys still work while it has focus
+        widget = event.widget
+        if isinstance(widget, (tk.Button, tk.Checkbutton, tk.Entry, tk.Listbox)) and not (
+                isinstance(widget, ttk.Combobox) and str(widget.cget('state')) == 'readonly'):
+            return
+        action(*args)
+        return "break"
     
     def _create_quiz_section(self):
         """Create quiz section"""
@@ -236,24 +430,74 @@ class FlashcardApp:
     def _on_category_change(self, event=None):
         """Handle category change"""
         try:
-            self.load_next()
+            stop_speaking()
+            # Hand focus back from the menu so the review keys work again
+            self.root.focus_set()
+            self.advance()
         except Exception as e:
-            print(f"Category change error: {e}")
+            log.exception("Category change error: %s", e)
     
     def _safe_flip_card(self):
         """Safely flip card with error handling"""
         try:
             self.flip_card()
         except Exception as e:
-            print(f"Flip card error: {e}")
+            log.exception("Flip card error: %s", e)
             messagebox.showerror("Error", "Failed to flip card")
     
+    def _on_rapid_toggle(self):
+        """Show the key help and pace only while rapid review is on"""
+        if self.rapid.get():
+            self.key_help.pack(after=self.flip_btn.master)
+        else:
+            self.key_help.pack_forget()
+        self.update_stats_display()
+    
+    def delays(self):
+        """(ms the answer feedback stays up, ms before the next card)"""
+        if self.rapid.get():
+            return self.rapid_feedback_ms, 0
+        return FEEDBACK_MS, NEXT_CARD_MS
+    
+    def later(self, delay, func):
+        """Run func after delay ms, or straight away for 0; advance() can cut the wait short"""
+        if delay <= 0:
+            func()
+            return
+        def run():
+            self._pending = None
+            func()
+        self._pending = (self.root.after(delay, run), func)
+    
+    def after_feedback(self, func):
+        """Run func once the answer feedback has been shown"""
+        self.later(self.delays()[0], func)
+    
+    def advance(self):
+        """Go to the next card, finishing (not dropping) an answer still showing its feedback"""
+        if self._pending is None:
+            self.load_next()
+            return
+        # The answer is recorded and the next card loaded without waiting
+        while self._pending is not None:
+            after_id, func = self._pending
+            self._pending = None
+            self.root.after_cancel(after_id)
+            func()
+    
+    def choose(self, index):
+        """Answer the quiz with choice index (0-3)"""
+        view = getattr(self, 'quiz_view', None)
+        if view is not None and view.alive():
+            view.choose(index)
+    
     def _safe_load_next(self):
         """Safely load next card with error handling"""
         try:
-            self.load_next()
+            stop_speaking()
+            self.advance()
         except Exception as e:
-            print(f"Load next error: {e}")
+            log.exception("Load next error: %s", e)
             messagebox.showerror("Error", "Failed to load next card")
     
     def _safe_speak(self):
@@ -261,21 +505,18 @@ class FlashcardApp:
         try:
             self.speak_word()
         except Exception as e:
-            print(f"Speak error: {e}")
+            log.exception("Speak error: %s", e)
             messagebox.showwarning("TTS Error", "Text-to-speech not available")
     
+    @timed("load_next")
     def load_next(self):
         """Load next flashcard"""
         if not self.cards:
             return
         
         # Get cards for current category
-        if self.current_category.get() == "All":
-            pool = self.cards
-        else:
-            pool = [c for c in self.cards if c['category'] == self.current_category.get()]
-        
-        if not pool:
+        category = self.current_category.get()
+        if not self.session.index.count(category):
             self.card_canvas.itemconfig(
                 self.card_text,
                 text="⚠️ No cards in this category",
@@ -284,23 +525,32 @@ class FlashcardApp:
             )
             return
         
-        # Select random card (prioritize due cards)
-        now = datetime.now()
-        due_cards = []
-        
-        for card in pool:
-            try:
-                next_review = datetime.fromisoformat(card.get("next_review", "1970-01-01T00:00:00"))
-                if next_review <= now:
-                    due_cards.append(card)
-            except ValueError:
-                due_cards.append(card)  # Include cards with invalid dates
-        
-        self.current = random.choice(due_cards if due_cards else pool)
+        # Use the card prepared while the last one was on screen, if it still fits
+        question = self.session.take_prefetched(category, self.harder_quiz.get())
+        if question is not None:
+            self.current = question['card']
+        else:
+            # Select random card (prioritize due cards)
+            self.current = self.session.next_card(category)
         self.front_visible = True
         self.update_card()
-        self.run_quiz()
+        self.run_quiz(question)
         self.update_stats_display()
+        
+        # Prepare the following card once this one is drawn
+        self.root.after_idle(self._prefetch_next)
+    
+    def _prefetch_next(self):
+        """Pick the next card, build its quiz and warm its audio while this one is answered"""
+        try:
+            question = self.session.prefetch(self.current_category.get(), after=self.current,
+                                             prefer_category=self.harder_quiz.get())
+            if question is not None:
+                # A moment later, so loading the speech module never holds up the first card
+                word = question['card']['word']
+                self.root.after(250, lambda: prefetch_speech(word))
+        except Exception as e:
+            log.warning("Prefetch error: %s", e)
     
     def update_card(self):
         """Update card display"""
@@ -339,17 +589,17 @@ class FlashcardApp:
         try:
             speak(self.current['word'])
         except Exception as e:
-            print(f"Speech error: {e}")
+            log.warning("Speech error: %s", e)
     
-    def run_quiz(self):
-        """Run quiz for current card"""
+    def run_quiz(self, question=None):
+        """Run quiz for current card (question: one already built for it)"""
         if not self.current:
             return
         
         try:
-            run_quiz(self, self.current, self.check_answer)
+            run_quiz(self, self.current, self.check_answer, question)
         except Exception as e:
-            print(f"Quiz error: {e}")
+            log.exception("Quiz error: %s", e)
             # Fallback: show simple continue button
             for widget in self.choices_frame.winfo_children():
                 widget.destroy()
@@ -364,75 +614,61 @@ class FlashcardApp:
             )
             fallback_btn.pack(pady=10)
     
+    def add_card(self, card):
+        """Add a new card to the deck and the category index"""
+        self.session.add_card(card)
+        self._refresh_categories()
+    
+    def edit_card(self, card, **fields):
+        """Edit an existing card, keeping the category index in step"""
+        self.session.edit_card(card, **fields)
+        self._refresh_categories()
+    
+    def _refresh_categories(self):
+        """Sync the category combobox with the index"""
+        self.category_menu.config(values=["All"] + self.session.categories)
+        if self.session.categories and not self.category_menu.winfo_ismapped():
+            self.category_menu.pack(side='left', padx=5)
+    
+    @timed("check_answer")
     def check_answer(self, choice, card):
         """Check quiz answer and update stats"""
         try:
-            is_correct = choice == card['meaning']
-            category = card['category']
-            
-            # Update stats
-            self.stats['total'] += 1
-            if category not in self.stats['per_category']:
-                self.stats['per_category'][category] = {"correct": 0, "total": 0}
+            result = self.session.submit_answer(card, choice)
             
-            self.stats['per_category'][category]['total'] += 1
-            
-            if is_correct:
-                self.stats['correct'] += 1
-                self.stats['per_category'][category]['correct'] += 1
-                
-                # Add to learned words
-                if card['word'] not in self.stats['learned']:
-                    self.stats['learned'].append(card['word'])
-                
+            if result['correct']:
                 # Speak correct answer
                 try:
                     speak(card['word'])
                 except:
                     pass
             
-            # Update spaced repetition
-            ease = card.get("ease", 2)
-            ease = min(ease + 1, 5) if is_correct else max(ease - 1, 1)
-            days = ease ** 2
-            
-            card['ease'] = ease
-            card['next_review'] = (datetime.now() + timedelta(days=days)).isoformat()
-            
-            # Save data
-            self.save_stats()
-            self.save_cards()
-            
             # Load next card after short delay
-            self.root.after(1000, self.load_next)
+            self.later(self.delays()[1], self.load_next)
             
         except Exception as e:
-            print(f"Answer check error: {e}")
-            traceback.print_exc()
+            log.exception("Answer check error: %s", e)
     
     def update_stats_display(self):
         """Update stats display"""
         try:
-            category = self.current_category.get()
+            stats = self.session.get_stats(self.current_category.get())
             
-            if category == "All":
-                total_correct = self.stats['correct']
-                total_attempts = self.stats['total']
-                percentage = (total_correct / total_attempts * 100) if total_attempts > 0 else 0
-                
-                text = f"Overall: {total_correct}/{total_attempts} correct ({percentage:.1f}%)"
-                if self.stats['learned']:
-                    text += f"\nWords learned: {len(self.stats['learned'])}"
+            if stats['category'] == "All":
+                text = f"Overall: {stats['correct']}/{stats['total']} correct ({stats['percentage']:.1f}%)"
+                if stats['learned']:
+                    text += f"\nWords learned: {stats['learned']}"
             else:
-                cat_stats = self.stats['per_category'].get(category, {"correct": 0, "total": 0})
-                correct = cat_stats['correct']
-                total = cat_stats['total']
-                percentage = (correct / total * 100) if total > 0 else 0
-                
-                text = f"{category}: {correct}/{total} correct ({percentage:.1f}%)"
+                text = f"{stats['category']}: {stats['correct']}/{stats['total']} correct ({stats['percentage']:.1f}%)"
+                if stats['learned']:
+                    text += f"\nWords learned: {stats['learned']}"
+            
+            text += f"\nCards: {stats['cards']} | Due now: {stats['due']}"
+            if self.rapid.get():
+                text += f" | Pace: {self.session.reviews_per_minute():.0f} reviews/min"
             
             self.stats_label.config(text=text)
             
         except Exception as e:
-            print(f"Stats update error: {e}")
+            log.exception("Stats update error: %s", e)
             self.stats_label.config(text="Stats unavailable")
\ No newline at end of file
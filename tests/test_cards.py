@@ -0,0 +1,63 @@
+import json
+import sys
+from datetime import datetime
+
+from cards import ALWAYS_DUE, EPOCH, Card, compact, set_dues, to_json
+
+
+ENTRIES = [
+    {"word": "爸爸", "pinyin": "bàba", "meaning": "father", "category": "Family", "ease": 3,
+     "next_review": "2030-01-01T09:30:00"},
+    {"word": "妈妈", "pinyin": "māma", "meaning": "mother", "category": "Family", "ease": 2,
+     "next_review": EPOCH},
+    {"word": "你好", "pinyin": "nǐhǎo", "meaning": "hello", "category": "Phrases"},
+    {"word": "一", "pinyin": "yī", "meaning": "one", "category": "Numbers", "next_review": "2030-01-01T09:30:00.250000",
+     "note": "kept", "tags": ["hsk1"]},
+    {"word": "二", "pinyin": "èr", "meaning": "two", "category": "Numbers", "next_review": "someday"},
+]
+
+
+def test_json_round_trip_is_exact():
+    cards = compact(ENTRIES)
+    assert [card.to_dict() for card in cards] == ENTRIES
+    assert json.loads(json.dumps(cards, default=to_json, ensure_ascii=False)) == ENTRIES
+    # Key order as loaded, extra keys after the known ones
+    assert list(cards[3].to_dict()) == list(ENTRIES[3])
+
+
+def test_due_is_integer_epoch_seconds():
+    father, mother, hello, one, two = compact(ENTRIES)
+    assert father.due == int(datetime(2030, 1, 1, 9, 30).timestamp()) and father._raw is None
+    # The epoch default is a real timestamp, not a special value
+    assert mother.due == int(datetime(1970, 1, 1).timestamp()) and mother['next_review'] == EPOCH
+    # Never scheduled: due like the epoch, but nothing is written back
+    assert hello.due == mother.due and "next_review" not in hello and hello.get("ease", 2) == 2
+    assert hello.next_review == EPOCH
+    # Text that seconds cannot reproduce is kept verbatim
+    assert one.due == father.due and one['next_review'] == "2030-01-01T09:30:00.250000"
+    assert two.due == ALWAYS_DUE and two['next_review'] == "someday"
+
+
+def test_mapping_access_and_updates():
+    card = Card.from_dict(ENTRIES[2])
+    card['ease'] = 4
+    card['next_review'] = "2031-02-03T04:05:06"
+    card.update(category="Greetings", level=1)
+    assert card.due == int(datetime(2031, 2, 3, 4, 5, 6).timestamp())
+    # Categories are interned, one string per category
+    assert card.category is sys.intern("Greet" + "ings") and card['level'] == 1
+    assert card.to_dict() == dict(ENTRIES[2], category="Greetings", ease=4, next_review="2031-02-03T04:05:06",
+                                  level=1)
+
+    copy = card.copy()
+    copy['ease'] = 1
+    copy['level'] = 2
+    assert (card['ease'], card['level']) == (4, 1)
+
+
+def test_set_dues_for_cards_and_dicts():
+    card, entry = Card.from_dict(ENTRIES[1]), dict(ENTRIES[1])
+    due = int(datetime(2030, 6, 1, 12).timestamp())
+    set_dues([card, entry], [due, due])
+    assert card.due == due and card['next_review'] == "2030-06-01T12:00:00"
+    assert entry['next_review'] == "2030-06-01T12:00:00"
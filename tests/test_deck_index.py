@@ -0,0 +1,290 @@
+import sys
+from datetime import datetime
+
+import pytest
+
+from cards import Card
+from deck_index import ALL, CardIndex, DistractorIndex, DueIndex, OverlayIndex, SearchIndex
+from journal import card_id
+from storage import EPOCH
+
+NOW = 2_000_000_000
+
+
+def shared_deck(n=40):
+    deck = [Card(f"字{i}", f"zi{i}", f"meaning {i}", "A" if i % 2 else "B", 2, EPOCH) for i in range(n)]
+    return deck, {card_id(card): card for card in deck}
+
+
+def test_overlay_take_copies_and_hides_the_shared_card():
+    deck, by_key = shared_deck()
+    shared = CardIndex(deck)
+    index = OverlayIndex(shared, by_key, key=card_id)
+    assert (index.count(), index.due_count(ALL, NOW), index.count("A")) == (40, 40, 20)
+
+    own = index.take(deck[1])
+    assert own is not deck[1] and card_id(own) == card_id(deck[1])
+    assert index.take(deck[1]) is own and index.take(own) is own
+    own['next_review'] = "2040-01-01T00:00:00"
+    index.reschedule(own, own.due)
+    assert deck[1]['next_review'] == EPOCH        # the shared deck is untouched
+    assert (index.count(), index.due_count(ALL, NOW), index.due_count("A", NOW)) == (40, 39, 19)
+    assert (shared.count(), shared.due_count(ALL, NOW)) == (40, 40)
+
+    for _ in range(200):
+        card = index.next_card("A", NOW)
+        assert card is not deck[1] and card is not own
+
+
+def test_overlay_falls_back_when_most_cards_are_hidden():
+    deck, by_key = shared_deck(6)
+    index = OverlayIndex(CardIndex(deck), by_key, key=card_id)
+    for card in deck[:5]:
+        own = index.take(card)
+        own['next_review'] = "2040-01-01T00:00:00"
+        index.reschedule(own, own.due)
+    # Only deck[5] is due; everything else is the student's and not due yet
+    assert all(index.next_card(ALL, NOW) is deck[5] for _ in range(50))
+    assert index.next_card("B", NOW, exclude=deck[5]) is not deck[5]
+    assert len(index.pool(ALL)) == 6
+
+
+def test_overlay_loads_a_students_cards():
+    deck, by_key = shared_deck()
+    mine = deck[3].copy()
+    mine['ease'] = 4
+    index = OverlayIndex(CardIndex(deck), by_key, [mine], key=card_id)
+    assert index.take(deck[3]) is mine
+    assert index.count("A") == 20
+
+
+def test_distractors_built_on_first_question_from_the_live_list():
+    from deck_index import DistractorIndex
+    cards = [Card(f"字{i}", f"zi{i}", f"meaning {i}", "A") for i in range(3)]
+    distractors = DistractorIndex(cards)
+    cards.append(Card("新", "xīn", "new", "A"))
+    distractors.add(cards[-1])          # before the build: picked up from the list, not twice
+    assert len(distractors) == 4
+    assert sorted(distractors.sample("meaning 0", 3)) == ["meaning 1", "meaning 2", "new"]
+
+
+def test_search_finds_syllables_inside_unspaced_pinyin():
+    school = Card("学校", "xuéxiào", "school", "Places")
+    xian = Card("西安", "Xī'ān", "Xi'an", "Places")
+    index = SearchIndex([school, xian, Card("小", "xiǎo", "small", "Describing")])
+    assert {card['word'] for card in index.search("xiao")} == {"学校", "小"}
+    assert index.search("xuexiao") == [school]
+    assert index.search("an") == [xian]
+
+
+def search_deck():
+    return [
+        Card("爸爸", "bàba", "father", "Family"),
+        Card("哥哥", "gēge", "older brother", "Family"),
+        Card("绿色", "lǜsè", "green", "Colours"),
+        Card("旅游", "lǚyóu", "travel", "Activities"),
+        Card("你好", "nǐ hǎo", "hello", "Greetings"),
+        Card("好吃", "hǎochī", "tasty", "Food"),
+        Card("吃饭", "chīfàn", "to eat a meal", "Food"),
+    ]
+
+
+def words(cards):
+    return [card['word'] for card in cards]
+
+
+def test_search_pinyin_without_tones_or_with_tone_numbers():
+    index = SearchIndex(search_deck())
+    assert words(index.search("baba")) == ["爸爸"]
+    assert words(index.search("ba4ba")) == ["爸爸"]
+    assert words(index.search("Ni3 hao3")) == ["你好"]
+    assert words(index.search("BÀBA")) == ["爸爸"]
+
+
+def test_search_folds_v_and_u_umlaut():
+    index = SearchIndex(search_deck())
+    assert set(words(index.search("lv"))) == {"绿色", "旅游"}
+    assert words(index.search("lvse")) == ["绿色"]
+    assert words(index.search("lüyou")) == ["旅游"]
+
+
+def test_search_hanzi_substring():
+    index = SearchIndex(search_deck())
+    # The exact word first, then words starting with the query
+    assert words(index.search("好")) == ["好吃", "你好"]
+    assert words(index.search("吃")) == ["吃饭", "好吃"]
+    assert words(index.search("饭")) == ["吃饭"]
+
+
+def test_search_meaning_prefix():
+    index = SearchIndex(search_deck())
+    assert words(index.search("fath")) == ["爸爸"]
+    assert words(index.search("Brother")) == ["哥哥"]
+    assert words(index.search("eat a")) == ["吃饭"]
+    assert index.search("xyz") == [] and index.search("  ") == []
+
+
+def test_search_by_category_and_limit():
+    index = SearchIndex(search_deck())
+    assert words(index.search("hao", category="Food")) == ["好吃"]
+    assert words(index.search("好", category="Greetings")) == ["你好"]
+    # "chi" is a whole key of hǎochī and only the start of chīfàn
+    assert words(index.search("chi")) == ["好吃", "吃饭"]
+    assert words(index.search("chi", limit=1)) == ["好吃"]
+
+
+def test_search_add_and_remove():
+    deck = search_deck()
+    index = SearchIndex(deck)
+    index.remove(deck[0])
+    assert index.search("baba") == [] and index.search("爸") == []
+    deck[0].meaning = "dad"
+    index.add(deck[0])
+    assert words(index.search("dad")) == ["爸爸"] and index.search("father") == []
+
+
+def due_deck():
+    # Cards 0-3 due before NOW, 4-7 after; even ones in category A, odd ones in B
+    return [Card(f"字{i}", f"zi{i}", f"meaning {i}", "AB"[i % 2], 2,
+                 datetime.fromtimestamp(NOW + (i - 4) * 3600 + 1).isoformat()) for i in range(8)]
+
+
+def test_due_index_picks_only_due_cards_per_category():
+    deck = due_deck()
+    due = DueIndex(deck)
+    assert due.pick(ALL, NOW - 10 * 3600) is None
+    assert (due.due_count(ALL, NOW), due.due_count("A", NOW), due.due_count("B", NOW)) == (4, 2, 2)
+    assert due.due_count("C", NOW) == 0 and due.pick("C", NOW) is None
+    for _ in range(50):
+        assert due.pick(ALL, NOW) in deck[:4]
+        assert due.pick("A", NOW) in (deck[0], deck[2])
+    # exclude is never returned while another card is due
+    assert all(due.pick("B", NOW, exclude=deck[1]) is deck[3] for _ in range(20))
+    # Later on, cards move from the upcoming heap into the due pool
+    assert due.due_count(ALL, NOW + 2 * 3600) == 6
+
+
+def test_due_index_reschedule_add_and_remove():
+    deck = due_deck()
+    due = DueIndex(deck)
+    due.reschedule(deck[0], NOW + 86400)
+    due.reschedule(deck[7], NOW - 1)
+    assert set(due.pool(ALL, NOW)) == {deck[1], deck[2], deck[3], deck[7]}
+    # Many reschedules of one card leave a single live entry
+    for i in range(500):
+        due.reschedule(deck[1], NOW - i)
+    assert due.due_count("B", NOW) == 3 and due.due_count(ALL, NOW) == 4
+    assert len(due._buckets[ALL].upcoming) < 2 * 8 + 64 + 8
+
+    extra = Card("新", "xin", "new", "C", 2, EPOCH)
+    due.add(extra)
+    assert due.pick("C", NOW) is extra
+    due.remove(extra)
+    due.remove(extra)
+    assert due.due_count("C", NOW) == 0 and extra not in due.pool(ALL, NOW)
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_due_index_rebuild_after_every_due_time_changed(with_numpy, monkeypatch):
+    if not with_numpy:
+        monkeypatch.setitem(sys.modules, "numpy", None)      # import numpy now fails
+    deck = due_deck()
+    due = DueIndex(deck)
+    due.pick(ALL, NOW)
+    # Reverse the order: now cards 4-7 are due and 3, 2, 1, 0 come due an hour apart
+    for i, card in enumerate(deck):
+        card['next_review'] = datetime.fromtimestamp(NOW + (3 - i) * 3600 + 1).isoformat()
+    due.rebuild(deck, NOW)
+    assert set(due.pool(ALL, NOW)) == set(deck[4:]) and set(due.pool("A", NOW)) == {deck[4], deck[6]}
+    assert set(due.pool(ALL, NOW + 3600)) == set(deck[3:]) and due.due_count("B", NOW + 3600) == 3
+
+    # Changes after the rebuild win over the cards' places in it
+    due.reschedule(deck[2], NOW + 86400)
+    due.reschedule(deck[5], NOW + 86400)
+    due.remove(deck[0])
+    later = NOW + 4 * 3600
+    assert set(due.pool(ALL, later)) == {deck[1], deck[3], deck[4], deck[6], deck[7]}
+    assert (due.due_count("A", later), due.due_count("B", later)) == (2, 3)
+    assert set(due.pool(ALL, NOW + 2 * 86400)) == set(deck[1:])
+
+
+def test_card_index_counts_categories_and_edits():
+    deck = due_deck()
+    index = CardIndex(deck)
+    assert index.categories == ["A", "B"]
+    assert (index.count(), index.count("A"), index.due_count("A", NOW)) == (8, 4, 2)
+
+    index.update(deck[0], category="C")
+    assert index.categories == ["A", "B", "C"]
+    assert (index.count("A"), index.count("C"), index.due_count("A", NOW)) == (3, 1, 1)
+    assert index.next_card("C", NOW) is deck[0]
+    index.update(deck[0], category="A")
+    assert index.categories == ["A", "B"] and index.count("A") == 4
+
+    card = Card("新", "xin", "new", "B", 2, EPOCH)
+    index.add(card)
+    assert (index.count("B"), index.due_count("B", NOW)) == (5, 3)
+    index.reschedule(card, NOW + 60)
+    assert index.due_count("B", NOW) == 2
+
+
+def test_card_index_next_card_falls_back_to_any_card():
+    deck = due_deck()
+    index = CardIndex(deck)
+    early = NOW - 10 * 3600         # nothing due yet
+    assert all(index.next_card("A", early) in deck[0::2] for _ in range(20))
+    only = CardIndex(deck[:1])
+    # The excluded card comes back when it is the only one
+    assert only.next_card("A", early, exclude=deck[0]) is deck[0]
+    assert only.next_card("B", early) is None
+
+
+def distractor_deck():
+    family = [Card(f"家{i}", f"jia{i}", m, "Family") for i, m in enumerate(
+        ["father", "mother", "older brother", "older sister", "younger brother"])]
+    food = [Card(f"吃{i}", f"chi{i}", m, "Food") for i, m in enumerate(
+        ["rice", "noodles", "tea", "dumplings", "to eat a meal", "fried rice with egg"])]
+    return family + food
+
+
+def test_distractors_are_distinct_wrong_meanings():
+    index = DistractorIndex(distractor_deck())
+    assert len(index) == 11
+    for _ in range(50):
+        wrong = index.sample("tea", 3, "Food")
+        assert len(wrong) == 3 == len(set(wrong)) and "tea" not in wrong
+    # Too few other meanings: as many as there are
+    small = DistractorIndex(distractor_deck()[:3])
+    assert sorted(small.sample("father", 3, "Family")) == ["mother", "older brother"]
+
+
+def test_distractors_prefer_category_then_length():
+    index = DistractorIndex(distractor_deck())
+    family = {"father", "mother", "older brother", "older sister", "younger brother"}
+    for _ in range(50):
+        assert set(index.sample("father", 3, "Family", prefer_category=True)) <= family
+    # Alone in its category: the other one-word meanings, not the phrases
+    index.add(Card("绿", "lǜ", "green", "Colours"))
+    one_word = {"father", "mother", "rice", "noodles", "tea", "dumplings"}
+    for _ in range(50):
+        wrong = index.sample("green", 3, "Colours", prefer_category=True)
+        assert len(wrong) == 3 == len(set(wrong)) and set(wrong) <= one_word
+    # Without prefer_category any meaning can come up
+    seen = set()
+    for _ in range(200):
+        seen.update(index.sample("green", 3, "Colours"))
+    assert seen - one_word
+
+
+def test_distractors_follow_added_and_removed_cards():
+    deck = distractor_deck()
+    index = DistractorIndex(deck)
+    index.sample("tea", 3)
+    twin = Card("爹", "die", "father", "Family")
+    index.add(twin)
+    assert len(index) == 11             # one entry per distinct meaning
+    index.remove(deck[0])
+    assert "father" in index._all.pos   # twin still has it
+    index.remove(twin)
+    assert len(index) == 10
+    assert all("father" not in index.sample("tea", 3) for _ in range(50))
@@ -0,0 +1,54 @@
+import pytest
+
+from cards import Card
+from deckfile import DeckCard, load_deck, write_deck
+
+
+def entries():
+    return [
+        {"word": "爸爸", "pinyin": "bàba", "meaning": "father", "category": "Family", "ease": 4,
+         "next_review": "2030-01-01T09:30:00"},
+        {"word": "妈妈", "pinyin": "māma", "meaning": "mother", "category": "Family",
+         "next_review": "2030-01-01T09:30:00.500000", "note": "kept"},
+        {"word": "一", "pinyin": "yī", "meaning": "one", "category": "Numbers", "ease": 2,
+         "next_review": "not a date"},
+        {"word": "二", "pinyin": "èr", "meaning": "two", "category": "Numbers"},
+    ]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "deck.fcdeck")
+    write_deck(path, entries())
+    cards = load_deck(path)
+    assert all(type(card) is DeckCard for card in cards)
+    assert [card.to_dict() for card in cards] == [Card.from_dict(e).to_dict() for e in entries()]
+    assert cards[1].ease is None and cards[1]["note"] == "kept"
+    assert "next_review" not in cards[3]
+    assert cards[2].next_review == "not a date"
+
+    # Writing the loaded cards again gives the same file
+    again = str(tmp_path / "again.fcdeck")
+    write_deck(again, cards)
+    with open(path, 'rb') as a, open(again, 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_text_is_read_on_demand(tmp_path):
+    path = str(tmp_path / "deck.fcdeck")
+    write_deck(path, entries())
+    card = load_deck(path)[0]
+    assert card.category == "Family" and card.ease == 4
+    # Only the record columns are set when the deck is opened; the text slots stay empty
+    for name in ("word", "pinyin", "meaning"):
+        with pytest.raises(AttributeError):
+            getattr(Card, name).__get__(card)
+    assert card["word"] == "爸爸"
+
+    card.meaning = "dad"
+    card.materialize()
+    card._deck.close()
+    assert (card.word, card.pinyin, card.meaning) == ("爸爸", "bàba", "dad")
+
+
+def test_missing_file(tmp_path):
+    assert load_deck(str(tmp_path / "none.fcdeck"), default=[]) == []
@@ -0,0 +1,59 @@
+import csv
+import io
+
+from cards import Card
+from deckio import export_cards, import_rows, read_rows
+
+
+def rows(text, fmt="csv"):
+    return read_rows(io.StringIO(text), fmt)
+
+
+def test_export_card_never_reviewed(tmp_path):
+    path = str(tmp_path / "deck.csv")
+    cards = [Card("爸爸", "bàba", "father", "Family"), {"word": "妈妈", "pinyin": "māma", "meaning": "mother",
+                                                        "category": "Family"}]
+    assert export_cards(cards, path) == 2
+    with open(path, encoding='utf-8', newline='') as f:
+        written = list(csv.reader(f))
+    assert written[1] == ["爸爸", "bàba", "father", "Family", "", ""]
+    assert written[2] == ["妈妈", "māma", "mother", "Family", "", ""]
+
+
+def deck():
+    known = Card("爸爸", "bàba", "father", "Family", 4)
+    known.next_review = "2030-01-01T00:00:00"
+    return [known, Card("妈妈", "māma", "mother", "Family", 3)]
+
+
+def test_import_rows_keeps_known_cards_category_and_schedule():
+    cards = deck()
+    result = import_rows(cards, rows("word,pinyin,meaning\n爸爸,bàba,dad\n妈妈,māma,mother\n"), category="HSK1")
+    assert (result.updated, result.unchanged, result.added) == (1, 1, 0)
+    assert [c['category'] for c in cards] == ["Family", "Family"]
+    assert cards[0]['meaning'] == "dad"
+    assert (cards[0]['ease'], cards[0]['next_review']) == (4, "2030-01-01T00:00:00")
+
+
+def test_import_rows_category_from_row_or_default():
+    cards = deck()
+    result = import_rows(cards, rows("word,pinyin,meaning,category\n爸爸,bàba,father,Parents\n"
+                                     "你好,nǐhǎo,hello,\n谢谢,xièxie,thanks,Phrases\n"), category="HSK1")
+    assert (result.updated, result.added) == (1, 2)
+    assert cards[0]['category'] == "Parents"
+    assert [(c['word'], c['category']) for c in cards[2:]] == [("你好", "HSK1"), ("谢谢", "Phrases")]
+
+
+def test_import_rows_new_cards_due_now_and_repeats_ignored():
+    cards = deck()
+    text = "你好\tnǐhǎo\thello\n你好\tnǐhǎo\thi\n\tno word\tx\n"
+    result = import_rows(cards, rows(text, "tsv"))
+    assert (result.rows, result.added, result.duplicates, result.skipped) == (3, 1, 1, 1)
+    assert cards[2]['meaning'] == "hello"
+    assert cards[2]['category'] == "Imported"
+    assert cards[2].due is not None
+
+    # The same list again changes nothing
+    again = import_rows(cards, rows(text, "tsv"))
+    assert (again.added, again.updated, again.unchanged) == (0, 0, 1)
+    assert len(cards) == 3
@@ -0,0 +1,118 @@
+import json
+import os
+
+from engine import StudySession
+from journal import ReviewJournal, card_id
+from scheduler import get_scheduler
+from storage import JsonStorage, default_stats, load_json, save_json
+
+DECK = [
+    {"word": w, "pinyin": p, "meaning": m, "category": "Family", "ease": 2, "next_review": "2025-06-20T00:00:00"}
+    for w, p, m in [("爸爸", "bàba", "father"), ("妈妈", "māma", "mother"), ("哥哥", "gēge", "older brother"),
+                    ("姐姐", "jiějie", "older sister"), ("弟弟", "dìdi", "younger brother"),
+                    ("妹妹", "mèimei", "younger sister")]
+]
+
+
+def make_files(tmp_path):
+    cards_path, stats_path = str(tmp_path / "flashcards.json"), str(tmp_path / "stats.json")
+    save_json(cards_path, DECK)
+    save_json(stats_path, default_stats())
+    return cards_path, stats_path, str(tmp_path / "reviews.jsonl")
+
+
+def open_session(paths, **kwargs):
+    storage = JsonStorage(*paths, save_delay=0.01)
+    cards, stats = storage.load()
+    session = StudySession(cards, stats, lambda: storage.save_stats(stats),
+                           lambda changed: storage.save_cards(cards, changed),
+                           record_review=storage.record_review, **kwargs)
+    return storage, session
+
+
+def answer_all(session, n):
+    for card in list(session.cards)[:n]:
+        session.submit_answer(card, card['meaning'])
+
+
+def test_scheduler_switch_does_not_double_count_journaled_reviews(tmp_path):
+    paths = make_files(tmp_path)
+    storage, session = open_session(paths, scheduler=get_scheduler("sm2"))
+    answer_all(session, 5)
+    storage.close()
+
+    storage, session = open_session(paths, scheduler=get_scheduler("sm2"))
+    assert session.stats["total"] == 5
+    assert session.stats["correct"] == 5
+    storage.close()
+
+
+def test_replay_is_idempotent(tmp_path):
+    paths = make_files(tmp_path)
+    storage, session = open_session(paths)
+    answer_all(session, 4)
+    storage.close()
+
+    for _ in range(2):
+        storage, session = open_session(paths)
+        assert session.stats["total"] == 4
+        storage.close()
+
+
+def test_compaction_is_idempotent(tmp_path):
+    cards_path, stats_path, journal_path = make_files(tmp_path)
+    journal = ReviewJournal(journal_path, cards_path, stats_path, load_json, save_json)
+    cards = load_json(cards_path, [])
+    for card in cards[:3]:
+        card["ease"] = 3
+        card["next_review"] = "2030-01-01T00:00:00"
+        journal.record(card, True)
+    journal.close()
+
+    os.replace(journal_path, journal.compacting_path)
+    rotated = open(journal.compacting_path, encoding='utf-8').read()
+    journal.compact()
+    # A crash after the snapshots are saved but before the rotated file is
+    # moved to history folds the same events again
+    with open(journal.compacting_path, 'w', encoding='utf-8') as f:
+        f.write(rotated)
+    journal.compact()
+    assert not os.path.exists(journal.compacting_path)
+
+    cards = load_json(cards_path, None)
+    stats = load_json(stats_path, None)
+    assert stats["total"] == 3
+    assert stats["journal_seq"] == 3
+    assert [c["ease"] for c in cards[:4]] == [3, 3, 3, 2]
+
+    # Nothing left in the journal, so replaying changes nothing
+    ReviewJournal(journal_path, cards_path, stats_path, load_json, save_json).replay(cards, stats)
+    assert stats["total"] == 3
+    assert card_id(cards[0]) == json.loads(open(journal.history_path, encoding='utf-8').readline())["card"]
+
+
+def test_replay_without_events_leaves_cards_unread(tmp_path):
+    cards_path, stats_path, journal_path = make_files(tmp_path)
+    journal = ReviewJournal(journal_path, cards_path, stats_path, load_json, save_json)
+    stats = default_stats()
+    # Anything that tried to read these cards would fail
+    assert journal.replay([object()], stats) == 0
+
+
+def test_stats_snapshot_older_than_compaction_is_dropped(tmp_path):
+    paths = make_files(tmp_path)
+    storage = JsonStorage(*paths, save_delay=60)
+    cards, stats = storage.load()
+    session = StudySession(cards, stats, lambda: storage.save_stats(stats), record_review=storage.record_review)
+    answer_all(session, 2)
+    storage.save_stats(stats)           # stamped at journal_seq 2, still pending
+    answer_all(session, 5)
+    storage.journal.close()
+    os.replace(storage.journal.path, storage.journal.compacting_path)
+    storage.journal.compact()           # saves stats up to journal_seq 7
+    storage.close()
+
+    assert load_json(paths[1], None)["journal_seq"] == 7
+    storage, session = open_session(paths)
+    assert session.stats["total"] == 7
+    storage.close()
@@ -0,0 +1,102 @@
+import sys
+import time
+
+import pytest
+
+from cards import Card
+from deck_index import ALL
+from engine import StudySession
+from journal import card_id
+from scheduler import SCHEDULERS, ScheduleColumns, get_scheduler, reschedule
+from storage import default_stats
+
+pytest.importorskip("numpy")
+
+# Either side of the 2025 DST changes in New York and London, plus midnight and a day's end
+SEEN = ["2025-03-08T23:30:00", "2025-03-09T01:59:59", "2025-03-09T03:00:00", "2025-03-30T00:30:00",
+        "2025-03-30T02:30:00", "2025-07-01T12:00:00", "2025-10-26T01:30:00", "2025-11-02T01:30:00",
+        "2025-11-02T03:00:00", "2025-12-31T23:59:59"]
+
+
+@pytest.fixture(params=["America/New_York", "Europe/London", "UTC"])
+def local_zone(request, monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset")
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def deck_and_counters():
+    cards, counters = [], {}
+    for i, seen in enumerate(SEEN * 3):
+        card = Card(f"字{i}", f"zi{i}", f"meaning {i}", "A", 1 + i % 5)
+        cards.append(card)
+        counters[card_id(card)] = {"attempts": 1 + i % 4, "lapses": i % 3, "streak": i % 7, "last_seen": seen}
+    # Never answered: left alone by both paths
+    cards.append(Card("新", "xīn", "new", "A"))
+    return cards, counters
+
+
+@pytest.mark.parametrize("name", sorted(SCHEDULERS))
+def test_numpy_and_loop_reschedule_agree(name, local_zone, monkeypatch):
+    scheduler = get_scheduler(name)
+    vectorised, counters = deck_and_counters()
+    assert reschedule(vectorised, counters, scheduler, card_id) == len(SEEN) * 3
+
+    looped, counters = deck_and_counters()
+    monkeypatch.setitem(sys.modules, "numpy", None)      # import numpy now fails
+    assert reschedule(looped, counters, scheduler, card_id) == len(SEEN) * 3
+
+    assert [c.get('next_review') for c in vectorised] == [c.get('next_review') for c in looped]
+    assert vectorised[-1].get('next_review') is None
+
+
+def test_reschedule_dict_cards():
+    cards = [{"word": "爸爸", "pinyin": "bàba", "meaning": "father", "category": "Family", "ease": 3}]
+    counters = {"爸爸|bàba": {"attempts": 1, "lapses": 0, "streak": 1, "last_seen": "2025-06-01T10:00:00"}}
+    assert reschedule(cards, counters, get_scheduler("classic"), card_id) == 1
+    assert cards[0]["next_review"] == "2025-06-10T10:00:00"
+
+
+@pytest.mark.parametrize("name", sorted(SCHEDULERS))
+def test_columns_kept_current_agree_with_reschedule(name):
+    import numpy as np
+    scheduler = get_scheduler(name)
+    cards, counters = deck_and_counters()
+    columns = ScheduleColumns(np, cards, counters, card_id)
+    # An answer and a new card after the columns were built
+    answered = {"attempts": 9, "lapses": 2, "streak": 4, "last_seen": "2025-08-01T08:00:00"}
+    cards[0]['ease'] = 5
+    counters[card_id(cards[0])] = answered
+    columns.record(cards[0], 5, answered)
+    new = Card("加", "jiā", "add", "A", 3)
+    cards.append(new)
+    columns.add(new)
+    counters[card_id(new)] = dict(answered, last_seen="2025-08-02T08:00:00")
+    columns.record(new, 3, counters[card_id(new)])
+
+    expected = [card.copy() for card in cards]
+    assert reschedule(expected, counters, scheduler, card_id) == len(SEEN) * 3 + 1
+    assert columns.reschedule(cards, scheduler) == len(SEEN) * 3 + 1
+    assert [c.get('next_review') for c in cards] == [c.get('next_review') for c in expected]
+
+
+def test_set_scheduler_moves_cards_in_the_index():
+    cards, counters = deck_and_counters()
+    stats = default_stats()
+    stats["cards"] = counters
+    session = StudySession(cards, stats)
+    session.set_scheduler(get_scheduler("sm2"))
+    session.submit_answer(cards[0], cards[0]['meaning'])
+    session.edit_card(cards[1], ease=5)
+    assert session.set_scheduler(get_scheduler("fsrs")) == len(SEEN) * 3
+    edited = cards[1].copy()
+    reschedule([edited], counters, get_scheduler("fsrs"), card_id)
+    assert cards[1].due == edited.due
+    now = time.time()
+    assert session.get_stats()["due"] == sum(card.due <= now for card in cards)
+    # The card just answered is not due again until its new interval has passed
+    assert cards[0].due > now and cards[0] not in session.index.due.pool(ALL)
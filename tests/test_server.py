@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+from cards import Card
+from server import Classroom, StudyServer
+from storage import save_json
+
+
+@pytest.fixture
+def classroom(tmp_path):
+    deck = str(tmp_path / "deck.json")
+    save_json(deck, [Card(f"字{i}", f"zi{i}", f"meaning {i}", "Family", 4, "2030-01-01T00:00:00").to_dict()
+                     for i in range(8)])
+    room = Classroom(deck, str(tmp_path / "classroom.db"))
+    yield room
+    room.close()
+
+
+def request(server, raw):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        out = []
+
+        class Writer:
+            def write(self, data):
+                out.append(data)
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                pass
+
+        await server.handle(reader, Writer())
+        return b"".join(out)
+    return asyncio.run(run())
+
+
+def test_bad_content_length_is_a_client_error(classroom):
+    server = StudyServer(classroom)
+    reply = request(server, b"POST /api/students/amy/answer HTTP/1.1\r\nContent-Length: ten\r\n\r\n")
+    assert reply.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in reply
+
+
+def test_students_share_the_deck_until_they_answer(classroom):
+    server = StudyServer(classroom)
+
+    async def run():
+        status, _, payload = await server.dispatch("GET", "/api/students/amy/next", b"")
+        question = json.loads(payload)
+        body = json.dumps({"card": question["card"], "choice": "meaning 0"}).encode()
+        await server.dispatch("POST", "/api/students/amy/answer", body)
+        return question, await classroom.student("amy"), await classroom.student("bob")
+    question, amy, bob = asyncio.run(run())
+
+    assert list(amy.by_id) == [question["card"]] and bob.by_id == {}
+    shared = classroom.by_id[question["card"]]
+    assert amy.by_id[question["card"]] is not shared
+    # Unreviewed cards are due now whatever the deck file said
+    assert (shared['ease'], shared['next_review']) == (2, "1970-01-01T00:00:00")
+    assert bob.session.get_stats()["due"] == 8
+    assert amy.session.get_stats()["due"] == 7
@@ -0,0 +1,99 @@
+import os
+
+import speak
+import tts
+from speak import AudioCache
+
+
+def writer(fmt, size=100):
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(b"\0" * size)
+        return fmt
+    return write
+
+
+def test_cache_keeps_each_clip_in_its_engines_format(tmp_path):
+    cache = AudioCache(str(tmp_path), limit=250)
+    wav = cache.put("a", writer("wav"))
+    mp3 = cache.put("b", writer("mp3"))
+    assert wav.endswith("a.wav") and mp3.endswith("b.mp3")
+
+    # A new session finds both under their own extensions
+    cache = AudioCache(str(tmp_path), limit=250)
+    assert cache.get("a") == wav and cache.get("b") == mp3
+
+    # Evicting the least recently used clip removes the file it was written as
+    cache.get("b")
+    cache.put("c", writer("mp3"))
+    assert not os.path.exists(wav) and cache.get("a") is None
+    assert sorted(os.listdir(tmp_path)) == ["b.mp3", "c.mp3"]
+
+
+def test_cache_folder_per_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(speak, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(speak, "_cache", None)
+    monkeypatch.setattr(speak, "_packs", [])
+    monkeypatch.setattr(tts, "DEFAULT_ENGINE", "stub")
+    path = speak.audio_source("你好")
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), "stub")
+    with open(path, 'rb') as f:
+        assert f.read() == tts.SILENT_MP3
+
+
+def test_cache_stats_go_into_the_metrics_snapshot(tmp_path, monkeypatch):
+    import instrument
+
+    monkeypatch.setattr(instrument, "_gauges", {})
+    monkeypatch.setattr(speak, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(speak, "_cache", None)
+    monkeypatch.setattr(speak, "_packs", [])
+    monkeypatch.setattr(tts, "DEFAULT_ENGINE", "stub")
+    speak.audio_source("你好")
+    speak.audio_source("你好")
+    cache = instrument.snapshot()["gauges"]["audio_cache"]
+    assert (cache["hits"], cache["misses"], cache["entries"]) == (1, 1, 1)
+
+
+def test_synthesis_waits_only_for_the_same_clip(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(speak, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(speak, "_cache", None)
+    monkeypatch.setattr(speak, "_packs", [])
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def engine(text, lang, voice, path):
+        calls.append(text)
+        if text == "slow":
+            started.set()
+            release.wait(5)
+        return tts.stub_engine(text, lang, voice, path)
+    monkeypatch.setattr(tts, "get_engine", lambda name=None: engine)
+
+    slow = [threading.Thread(target=speak.audio_source, args=("slow",)) for _ in range(2)]
+    slow[0].start()
+    assert started.wait(5)
+    slow[1].start()
+    # A different clip goes straight through while "slow" is still being made
+    assert speak.audio_source("fast").endswith(".mp3")
+    release.set()
+    for t in slow:
+        t.join(5)
+    assert calls == ["slow", "fast"]
+    assert speak._synth_locks == {}
+
+
+def test_prerender_reads_binary_decks(tmp_path):
+    from audiopack import AudioPack
+    from deckfile import write_deck
+    from prerender import prerender
+
+    deck = str(tmp_path / "deck.fcdeck")
+    write_deck(deck, [{"word": w, "pinyin": "", "meaning": "", "category": "Test"} for w in ("一", "二", "一")])
+    pack_path = str(tmp_path / "audio.fcpack")
+    summary = prerender(deck, pack_path, engine="stub", workers=1)
+    assert summary["words"] == 2 and not summary["failed"]
+    pack = AudioPack(pack_path)
+    assert pack.get(tts.clip_key("二", "zh", None)) == (tts.SILENT_MP3, "mp3")
+    pack.close()
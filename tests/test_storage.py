@@ -0,0 +1,156 @@
+import os
+
+import pytest
+
+from cards import Card
+from storage import EPOCH, SqliteStorage
+
+
+def deck():
+    return [Card("爸爸", "bàba", "father", "Family"), Card("妈妈", "māma", "mother", "Family"),
+            Card("你好", "nǐhǎo", "hello", "Phrases")]
+
+
+def schedule_rows(store):
+    return store.db.execute("SELECT COUNT(*) FROM schedule WHERE profile = ?", (store.profile,)).fetchone()[0]
+
+
+def test_sqlite_schedule_rows_only_for_reviewed_cards(tmp_path):
+    path = str(tmp_path / "decks.db")
+    store = SqliteStorage(path, "_deck")
+    store.save_deck(deck())
+    store.close()
+
+    store = SqliteStorage(path, "alice")
+    cards, stats = store.load()
+    assert [c['word'] for c in cards] == ["爸爸", "妈妈", "你好"]
+    assert {(c['ease'], c['next_review']) for c in cards} == {(2, EPOCH)}
+    assert schedule_rows(store) == 0
+
+    cards[1]['ease'] = 3
+    cards[1]['next_review'] = "2030-01-01T00:00:00"
+    store.record_review(cards[1], True)
+    assert schedule_rows(store) == 1
+    # Saving the whole deck leaves unscheduled cards without rows
+    store.save_cards(cards)
+    assert schedule_rows(store) == 1
+    store.close()
+
+    store = SqliteStorage(path, "alice")
+    cards, stats = store.load()
+    assert (cards[1]['ease'], cards[1]['next_review']) == (3, "2030-01-01T00:00:00")
+    assert (stats['total'], stats['correct'], stats['learned']) == (1, 1, ["妈妈"])
+    assert store.load_schedule() == [("妈妈", "māma", 3, "2030-01-01T00:00:00")]
+    store.close()
+
+    # Other profiles are untouched
+    store = SqliteStorage(path, "bob")
+    assert store.load_schedule() == []
+    store.close()
+
+
+def test_sqlite_keeps_the_scheduler_choice(tmp_path, monkeypatch):
+    from engine import StudySession
+    from scheduler import get_scheduler
+
+    path = str(tmp_path / "decks.db")
+    store = SqliteStorage(path, "alice")
+    store.save_deck(deck())
+    cards, stats = store.load()
+    StudySession(cards, stats, lambda: store.save_stats(stats), lambda changed: store.save_cards(cards, changed),
+                 record_review=store.record_review, scheduler=get_scheduler("sm2", {"max_days": 90}))
+    store.close()
+
+    store = SqliteStorage(path, "alice")
+    cards, stats = store.load()
+    assert stats["scheduler"] == {"name": "sm2", "params": get_scheduler("sm2", {"max_days": 90}).params}
+    # The same choice on the next launch must not reschedule the deck again
+    monkeypatch.setattr(StudySession, "set_scheduler", lambda self, scheduler: pytest.fail("rescheduled"))
+    session = StudySession(cards, stats, record_review=store.record_review,
+                           scheduler=get_scheduler("sm2", {"max_days": 90}))
+    assert session.scheduler.config() == stats["scheduler"]
+    store.close()
+
+
+def test_sqlite_adds_the_scheduler_column_to_older_databases(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE stats (profile TEXT PRIMARY KEY, correct INTEGER NOT NULL DEFAULT 0, "
+               "total INTEGER NOT NULL DEFAULT 0)")
+    db.execute("INSERT INTO stats (profile, correct, total) VALUES ('alice', 3, 4)")
+    db.commit()
+    db.close()
+    store = SqliteStorage(path, "alice")
+    stats = store.load_stats()
+    assert (stats["correct"], stats["total"]) == (3, 4) and "scheduler" not in stats
+    store.close()
+
+
+def test_progress_kept_apart_from_a_read_only_deck(tmp_path):
+    from engine import StudySession
+    from storage import JsonStorage, load_json, save_json
+
+    deck_path = str(tmp_path / "bundle.json")
+    save_json(deck_path, [c.to_dict() for c in deck()])
+    paths = [str(tmp_path / name) for name in ("changes.json", "stats.json", "reviews.jsonl")]
+
+    def open_session():
+        storage = JsonStorage(*paths, save_delay=0.01, deck_path=deck_path)
+        cards, stats = storage.load()
+        return storage, StudySession(cards, stats, lambda: storage.save_stats(stats),
+                                     lambda changed: storage.save_cards(cards, changed), record_review=storage.record_review)
+
+    storage, session = open_session()
+    session.submit_answer(session.cards[0], "father")
+    session.add_card({"word": "新", "pinyin": "xīn", "meaning": "new", "category": "Mine"})
+    storage.close()
+    assert load_json(deck_path, None) == [c.to_dict() for c in deck()]      # the deck is never written
+    assert [e["word"] for e in load_json(paths[0], None)] == ["爸爸", "新"]
+    assert set(load_json(paths[0], None)[0]) == {"word", "pinyin", "ease", "next_review"}
+
+    # A new release of the deck: a card's meaning fixed, another card added
+    save_json(deck_path, [{"word": "爸爸", "pinyin": "bàba", "meaning": "father, dad", "category": "Family"},
+                          {"word": "妈妈", "pinyin": "māma", "meaning": "mother", "category": "Family"},
+                          {"word": "姐姐", "pinyin": "jiějie", "meaning": "older sister", "category": "Family"}])
+    storage, session = open_session()
+    by_word = {c['word']: c for c in session.cards}
+    assert set(by_word) == {"爸爸", "妈妈", "姐姐", "新"}
+    assert by_word["爸爸"]['meaning'] == "father, dad"
+    assert by_word["爸爸"]['ease'] == 3 and by_word["爸爸"]['next_review'] > "2000"
+    assert session.stats["total"] == 1
+    storage.close()
+
+
+def test_sparse_compaction_adds_reviewed_cards(tmp_path):
+    from journal import ReviewJournal
+    from storage import load_json, save_json
+
+    changes, stats_path, journal_path = (str(tmp_path / n) for n in ("changes.json", "stats.json", "reviews.jsonl"))
+    journal = ReviewJournal(journal_path, changes, stats_path, load_json, save_json, sparse=True)
+    card = deck()[1]
+    card['ease'] = 4
+    card['next_review'] = "2030-01-01T00:00:00"
+    journal.record(card, True)
+    journal.close()
+    os.replace(journal_path, journal.compacting_path)
+    journal.compact()
+    assert load_json(changes, None) == [{"word": "妈妈", "pinyin": "māma", "ease": 4,
+                                         "next_review": "2030-01-01T00:00:00"}]
+    assert load_json(stats_path, None)["total"] == 1
+
+
+def test_json_save_cards_writes_the_cards_as_they_were_saved(tmp_path):
+    from storage import JsonStorage, load_json
+
+    storage = JsonStorage(str(tmp_path / "cards.json"), str(tmp_path / "stats.json"),
+                          str(tmp_path / "reviews.jsonl"), save_delay=60)
+    cards = deck()
+    cards[0].meaning = "dad"
+    storage.save_cards(cards, [cards[0]])
+    # Changes made while the write is still pending belong to a later save
+    cards[0].meaning = "papa"
+    cards.append(Card("哥哥", "gēge", "older brother", "Family"))
+    storage.close()
+    saved = load_json(str(tmp_path / "cards.json"), [])
+    assert [c["meaning"] for c in saved] == ["dad", "mother", "hello"]
@@ -0,0 +1,53 @@
+from cards import Card
+from journal import card_id
+from storage import default_stats
+from studystats import ALL, StudyStats
+
+
+def test_record_counts_answers_learned_words_and_lapses():
+    progress = StudyStats(default_stats())
+    key = "爸爸|bàba"
+    progress.record(key, "爸爸", "Family", False, "2025-06-20T09:00:00")
+    assert progress.card(key) == {"attempts": 1, "lapses": 0, "streak": 0, "last_seen": "2025-06-20T09:00:00"}
+    progress.record(key, "爸爸", "Family", True, "2025-06-20T09:01:00")
+    progress.record(key, "爸爸", "Family", True, "2025-06-21T09:00:00")
+    # Only a wrong answer after a right one is a lapse
+    counters = progress.record(key, "爸爸", "Family", False, "2025-06-22T09:00:00")
+    assert counters == {"attempts": 4, "lapses": 1, "streak": 0, "last_seen": "2025-06-22T09:00:00"}
+    progress.record("妈妈|māma", "妈妈", "Family", True, "2025-06-22T09:01:00")
+    progress.record("你好|nǐhǎo", "你好", "Phrases", True, "2025-06-22T09:02:00")
+
+    assert progress.is_learned("爸爸") and not progress.is_learned("哥哥")
+    assert progress.data["learned"] == ["爸爸", "妈妈", "你好"]
+    assert progress.summary() == {"correct": 4, "total": 6, "percentage": 4 / 6 * 100, "learned": 3, "lapses": 1}
+    assert progress.summary("Family") == {"correct": 3, "total": 5, "percentage": 60.0, "learned": 2, "lapses": 1}
+    assert progress.summary("Colours") == {"correct": 0, "total": 0, "percentage": 0, "learned": 0, "lapses": 0}
+    assert progress.card("哥哥|gēge") is None
+
+
+def test_learning_a_word_again_is_not_counted_twice():
+    progress = StudyStats(default_stats())
+    for correct in (True, False, True):
+        progress.record("爸爸|bàba", "爸爸", "Family", correct, "2025-06-20T09:00:00")
+    assert progress.summary(ALL)["learned"] == 1 and progress.summary("Family")["learned"] == 1
+
+    # A new StudyStats over the same (saved) dict knows what was learned
+    again = StudyStats(progress.data)
+    again.record("爸爸|bàba", "爸爸", "Family", True, "2025-06-21T09:00:00")
+    assert again.data["learned"] == ["爸爸"]
+
+
+def test_backfill_rebuilds_category_totals_from_old_stats():
+    cards = [Card("爸爸", "bàba", "father", "Family"), Card("妈妈", "māma", "mother", "Family"),
+             Card("红", "hóng", "red", "Colours")]
+    # stats.json from before per-category learned/lapses totals
+    data = {"correct": 3, "total": 4, "learned": ["爸爸", "红"],
+            "per_category": {"Family": {"correct": 2, "total": 3}, "Colours": {"correct": 1, "total": 1}},
+            "cards": {"爸爸|bàba": {"attempts": 3, "lapses": 1, "streak": 1, "last_seen": None}}}
+    progress = StudyStats(data)
+    assert progress.needs_backfill()
+    progress.backfill(cards, card_id)
+    assert not progress.needs_backfill()
+    assert data["per_category"]["Family"] == {"correct": 2, "total": 3, "learned": 1, "lapses": 1}
+    assert data["per_category"]["Colours"] == {"correct": 1, "total": 1, "learned": 1, "lapses": 0}
+    assert progress.summary()["lapses"] == 1